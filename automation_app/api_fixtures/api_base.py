@@ -1,17 +1,21 @@
+from __future__ import annotations
+
 import logging
 from json import JSONDecodeError
-
-import jsonschema
-from jsonschema import validate
-from requests import Response
+from typing import TYPE_CHECKING
 
 from utilities import custom_logger
 from utilities.api_utils.requests import Client
+from utilities.api_utils.streaming import extract_fragments, get_stream_limits, spool_response
+
+if TYPE_CHECKING:
+    from requests import Response
 
 
 class ApiBase:
     def __init__(self):
         self.client = Client
+        self.last_error = None  # reason of the last failed request, used to fail the test clearly
 
     log = custom_logger.customlogger(logging.DEBUG)
 
@@ -36,6 +40,31 @@ class ApiBase:
         self.log.info(f"Response Successfully Structured")
         return response
 
+    def structure_streamed(self, response: Response, selector) -> Response:
+        """
+        Structure a response requested with stream=True without holding the whole body in memory.
+        The body is spooled to disk above the memory threshold and only the fragments named by the
+        selector are parsed into the data field.
+
+        :param response: response requested with stream=True
+        :param selector: selector from streaming.build_selector
+        :return: response with "data" holding the kept fragments and "body_size" in bytes
+        """
+        spool_bytes, budget = get_stream_limits()
+        body, size = spool_response(response, spool_bytes)
+        self.log.info(f"Structuring the streamed response of {size} bytes")
+        with body:
+            try:
+                data = extract_fragments(body, selector, budget)
+            except ValueError as e:
+                self.log.error(f"{e}, returning just the response")
+                data = []
+
+        response.data = data
+        response.body_size = size
+        self.log.info(f"Response Successfully Structured")
+        return response
+
     def validate_response_json(self, json_data_to_validate, schema_to_validate_against):
         """
         Validates the Json data against the schema
@@ -44,6 +73,9 @@ class ApiBase:
         :param schema_to_validate_against:
         :return: True if validated successfully
         """
+        import jsonschema
+        from jsonschema import validate
+
         try:
             validate(instance=json_data_to_validate, schema=schema_to_validate_against)
             self.log.info("Response JSON Successfully Validated")
@@ -2,3 +2,7 @@ class RestAPIEndpoints():
     LOGIN = "login"
     ENDPOINT2 = "endpoint2"
     ENDPOINT3 = "endpoint3"
+
+
+class GraphqlEndpoints():
+    GRAPHQL = "graphql"
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import time
+
+import allure
+
+from api_fixtures.api_base import ApiBase
+from api_fixtures.endpoints import GraphqlEndpoints
+from test_data.read_settings_file import get_graphql_settings
+from utilities import custom_logger, reporting
+from utilities.profiler import span
+
+PERSISTED_QUERY_NOT_FOUND = "PersistedQueryNotFound"
+
+
+class GraphqlApi(ApiBase):
+    """
+    GraphQL counterpart of RestApi.
+
+    Several operations can be sent in one HTTP request as a JSON array (query batching).
+    With persisted queries enabled, every operation carries the sha256 hash of its query
+    (Apollo automatic persisted queries). The full document is only sent the first time a
+    hash is used in this process, or when the server answers PersistedQueryNotFound.
+    """
+    log = custom_logger.customlogger(logging.DEBUG)
+
+    # hashes the server is known to have stored, shared by all instances in the process
+    registered_hashes = set()
+
+    def __init__(self):
+        super().__init__()
+        self.url = get_graphql_settings("base_url")
+        self.endpoint = get_graphql_settings("endpoint") or GraphqlEndpoints.GRAPHQL
+        self.persisted_queries = str(get_graphql_settings("persisted_queries")).lower() in ("1", "true", "yes")
+        self.max_batch_size = int(get_graphql_settings("max_batch_size") or 10)
+
+    @staticmethod
+    def query_hash(query: str) -> str:
+        return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+    def build_operation(self, query: str, variables: dict = None, operation_name: str = None, send_query: bool = False) -> dict:
+        """
+        Build the JSON body of a single operation.
+
+        :param query: the GraphQL document
+        :param variables: the operation variables
+        :param operation_name: the operation to run when the document holds several
+        :param send_query: force the full document even if its hash is registered
+        :return: operation dictionary
+        """
+        operation = {"variables": variables or {}}
+        if operation_name:
+            operation["operationName"] = operation_name
+
+        if not self.persisted_queries:
+            operation["query"] = query
+            return operation
+
+        query_hash = self.query_hash(query)
+        operation["extensions"] = {"persistedQuery": {"version": 1, "sha256Hash": query_hash}}
+        if send_query or query_hash not in self.registered_hashes:
+            operation["query"] = query
+        return operation
+
+    @staticmethod
+    def _is_persisted_query_miss(result) -> bool:
+        for error in (result or {}).get("errors") or []:
+            code = (error.get("extensions") or {}).get("code")
+            if error.get("message") == PERSISTED_QUERY_NOT_FOUND or code == "PERSISTED_QUERY_NOT_FOUND":
+                return True
+        return False
+
+    def _post(self, full_url: str, body, header: dict):
+        with span("graphql.network", "network"):
+            response = self.client.request(method="POST", url=full_url, json=body, headers=header)
+        with span("structure_response", "decode"):
+            return self.structure(response)
+
+    def perform_graphql_batch(self, operations: list, base_url: str = "use_env_url", header=None) -> list:
+        """
+        Send the operations in as few HTTP requests as the batch size allows.
+
+        Parameters:
+        -----------
+        operations : list
+            Dictionaries with 'query', 'variables' and optional 'operation_name'.
+
+        base_url : str, optional
+            The API base. If left as "use_env_url", GRAPHQL_API_BASE_URL is used.
+
+        header : dict, optional
+            Request headers. Defaults to {'Content-Type': 'application/json'}.
+
+        Returns:
+        --------
+        list
+            One result dictionary ({"data": ..., "errors": ...}) per operation, in order.
+            An entry is None when its request failed.
+        """
+        header = header if header is not None else {"Content-Type": "application/json"}
+        url = self.url if base_url == "use_env_url" else base_url
+        full_url = f"{url}/{self.endpoint}"
+
+        results = []
+        for start in range(0, len(operations), self.max_batch_size):
+            chunk = operations[start:start + self.max_batch_size]
+            results.extend(self._send_chunk(full_url, chunk, header))
+        return results
+
+    def _send_chunk(self, full_url: str, chunk: list, header: dict) -> list:
+        bodies = [self.build_operation(op["query"], op.get("variables"), op.get("operation_name")) for op in chunk]
+        payload = bodies[0] if len(bodies) == 1 else bodies
+
+        self.log.info(f"Sending {len(bodies)} GraphQL operation(s) in one request to {full_url}")
+        reporting.attach(json.dumps(payload, indent=4), name="GraphQL Request", attachment_type=allure.attachment_type.JSON)
+        start_time = time.time()
+        try:
+            response = self._post(full_url, payload, header)
+            results = response.data if isinstance(response.data, list) else [response.data]
+            if len(results) != len(chunk):
+                raise ValueError(f"{len(results)} result(s) for {len(chunk)} operation(s), cannot match them up")
+
+            # the server lost some persisted queries, resend those with the full document
+            missed = [i for i, result in enumerate(results) if self._is_persisted_query_miss(result)]
+            if missed:
+                self.log.info(f"Persisted query not found for {len(missed)} operation(s), resending documents")
+                retry_bodies = [
+                    self.build_operation(chunk[i]["query"], chunk[i].get("variables"), chunk[i].get("operation_name"), send_query=True)
+                    for i in missed
+                ]
+                retry = self._post(full_url, retry_bodies[0] if len(retry_bodies) == 1 else retry_bodies, header)
+                retry_results = retry.data if isinstance(retry.data, list) else [retry.data]
+                if len(retry_results) != len(missed):
+                    raise ValueError(f"{len(retry_results)} result(s) for the {len(missed)} resent operation(s), "
+                                     f"cannot match them up")
+                for i, result in zip(missed, retry_results):
+                    results[i] = result
+
+            if self.persisted_queries:
+                for op, result in zip(chunk, results):
+                    if result is not None and not self._is_persisted_query_miss(result):
+                        self.registered_hashes.add(self.query_hash(op["query"]))
+
+            response_time = time.time() - start_time
+            api_response_time = f"API Response Time = {response_time} Seconds"
+            reporting.record_request("POST", self.endpoint, full_url, response.status_code, response_time)
+            reporting.attach(json.dumps(results, indent=4), name="GraphQL Response", attachment_type=allure.attachment_type.JSON)
+            reporting.attach("", name=api_response_time, attachment_type=allure.attachment_type.TEXT)
+            self.log.info(f"Response - {results}")
+            return results
+        except Exception as e:
+            self.last_error = f"Request to {full_url} failed: {e}"
+            self.log.error(f"Request failed: {e}")
+            reporting.record_request("POST", self.endpoint, full_url, None, time.time() - start_time)
+            return [None] * len(chunk)
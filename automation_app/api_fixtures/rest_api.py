@@ -1,5 +1,7 @@
+from __future__ import annotations
+
 import logging
-from requests import Response
+from typing import TYPE_CHECKING
 import allure
 import json
 import time
@@ -8,16 +10,20 @@ import os
 from api_fixtures.api_base import ApiBase
 from load_config import ATTACHMENT_PATH
 from test_data.read_settings_file import get_rest_api_settings
-from utilities import custom_logger
+from utilities import custom_logger, reporting
+from utilities.profiler import span
+
+if TYPE_CHECKING:
+    from requests import Response
 
 class RestApi(ApiBase):
     log = custom_logger.customlogger(logging.DEBUG)
 
     def __init__(self):
         super().__init__()
-        self.url = get_rest_api_settings("url")
+        self.url = get_rest_api_settings("base_url")
 
-    def perform_api_request(self,endpoint: str, method: str, request_body: dict, base_url: str="use_env_url", header=None) -> Response:
+    def perform_api_request(self,endpoint: str, method: str, request_body: dict, base_url: str="use_env_url", header=None, timeout=None, stream_selector=None) -> Response:
         """
         Send an HTTP request to the specified workflow endpoint.
 
@@ -45,6 +51,14 @@ class RestApi(ApiBase):
             Additional headers to include in the request. If not provided, defaults to 
             {'Content-Type': 'application/json'}.
 
+        timeout : tuple, optional
+            (connect, read) timeout in seconds. None, or a None part, uses the host/default
+            timeout from the settings.
+
+        stream_selector : dict, optional
+            Streams the response: the body is spooled to disk above the memory threshold and only
+            the fragments named by the selector (see streaming.build_selector) are kept in "data".
+
         Returns:
         --------
         Response
@@ -57,34 +71,54 @@ class RestApi(ApiBase):
         else: 
             full_url = f"{base_url}/{endpoint}"
 
-        self.log.info(f"Sending {method} Request to Endpoint at {full_url}")
-        self.log.info(f"Request Payload: {request_body}")
-        allure.attach(json.dumps(request_body, indent=4), name="Request Payload", attachment_type=allure.attachment_type.JSON)
+        with span("logging.request", "logging"):
+            self.log.info(f"Sending {method} Request to Endpoint at {full_url}")
+            self.log.info(f"Request Payload: {request_body}")
+        with span("allure.request_payload", "allure"):
+            reporting.attach(json.dumps(request_body, indent=4), name="Request Payload", attachment_type=allure.attachment_type.JSON)
+        start_time = time.time()
         try:
-            start_time = time.time()
-            response = self.client.request(
-                method=method,
-                url=full_url,
-                json=request_body,
-                headers=header,
-            )
+            with span("network", "network"):
+                response = self.client.request(
+                    method=method,
+                    url=full_url,
+                    json=request_body,
+                    headers=header,
+                    timeout=timeout,
+                    stream=stream_selector is not None,
+                )
             end_time = time.time()
+            with span("structure_response", "decode"):
+                if stream_selector is not None:
+                    response_structured = self.structure_streamed(response, stream_selector)
+                    # the body is downloaded while structuring, so it counts towards the response time
+                    end_time = time.time()
+                else:
+                    response_structured = self.structure(response)
             response_time = end_time - start_time
             api_response_time = f"API Response Time = {response_time} Seconds"
-            response_structured = self.structure(response)
+            reporting.record_request(method, endpoint, full_url, response.status_code, response_time)
             self.log.info(response)
 
-            allure.attach(json.dumps(response_structured.data, indent=4), name="Response Data", attachment_type=allure.attachment_type.JSON)
-            allure.attach("", name=api_response_time, attachment_type=allure.attachment_type.TEXT)
-            self.log.info(f"Response - {response_structured.data}")
+            with span("allure.response_data", "allure"):
+                if stream_selector is not None:
+                    reporting.attach(json.dumps(response_structured.data, indent=4), name="Response Fragments", attachment_type=allure.attachment_type.JSON)
+                    reporting.attach("", name=f"Streamed response of {response_structured.body_size} bytes, only the referenced fragments were kept", attachment_type=allure.attachment_type.TEXT)
+                else:
+                    reporting.attach(json.dumps(response_structured.data, indent=4), name="Response Data", attachment_type=allure.attachment_type.JSON)
+                reporting.attach("", name=api_response_time, attachment_type=allure.attachment_type.TEXT)
+            with span("logging.response", "logging"):
+                self.log.info(f"Response - {response_structured.data}")
             return response_structured
         except Exception as e:
+            self.last_error = f"Request to {full_url} failed: {e}"
             self.log.error(f"Request failed: {e}")
+            reporting.record_request(method, endpoint, full_url, None, time.time() - start_time)
             return None
     
     def upload_attachment_api_request(self, endpoint: str, method: str, request_body: dict, 
                                attachment_name: str, base_url: str = "use_env_url", 
-                               header=None) -> Response:
+                               header=None, timeout=None) -> Response:
         """
         Send an HTTP request to upload an attachment to the specified endpoint.
 
@@ -102,6 +136,8 @@ class RestApi(ApiBase):
             The base URL for the API. Defaults to environment URL if "use_env_url".
         header : dict, optional
             Additional headers to include in the request.
+        timeout : tuple, optional
+            (connect, read) timeout in seconds, None to use the configured timeout.
 
         Returns:
         --------
@@ -121,7 +157,7 @@ class RestApi(ApiBase):
         self.log.info(f"Request Payload: {request_body}")
         self.log.info(f"Attachment Path: {attachment_path}")
 
-        allure.attach(json.dumps(request_body, indent=4), name="Request Payload", 
+        reporting.attach(json.dumps(request_body, indent=4), name="Request Payload", 
                     attachment_type=allure.attachment_type.JSON)
 
         try: 
@@ -148,20 +184,25 @@ class RestApi(ApiBase):
                 del upload_headers["Content-Type"]
 
             start_time = time.time()
-            response = self.client.request(
-                method=method,
-                url=full_url,
-                headers=upload_headers,
-                files=files
-            )
+            with span("network", "network"):
+                response = self.client.request(
+                    method=method,
+                    url=full_url,
+                    headers=upload_headers,
+                    files=files,
+                    timeout=timeout
+                )
             end_time = time.time()
             response_time = end_time - start_time
             api_response_time = f"API Response Time = {response_time} Seconds"
-            response_structured = self.structure(response)
-
-            allure.attach(json.dumps(response_structured.data, indent=4), 
-                        name="Response Data", attachment_type=allure.attachment_type.JSON)
-            allure.attach("", name=api_response_time, attachment_type=allure.attachment_type.TEXT)
+            reporting.record_request(method, endpoint, full_url, response.status_code, response_time)
+            with span("structure_response", "decode"):
+                response_structured = self.structure(response)
+
+            with span("allure.response_data", "allure"):
+                reporting.attach(json.dumps(response_structured.data, indent=4), 
+                            name="Response Data", attachment_type=allure.attachment_type.JSON)
+                reporting.attach("", name=api_response_time, attachment_type=allure.attachment_type.TEXT)
             
             self.log.info(f"Response json: {response_structured.data}")
             self.log.info(f"API response time: {api_response_time}")
@@ -171,8 +212,10 @@ class RestApi(ApiBase):
             return response_structured
 
         except FileNotFoundError as e:
+            self.last_error = f"Attachment file not found: {e}"
             self.log.error(f"Attachment file not found: {e}")
             return None
         except Exception as e:
+            self.last_error = f"Request to {full_url} failed: {e}"
             self.log.error(f"Request failed: {e}")
             return None
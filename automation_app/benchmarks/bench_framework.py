@@ -0,0 +1,453 @@
+"""
+Micro and macro benchmarks for the framework's own hot paths.
+
+Run from inside automation_app:
+
+    python -m benchmarks.bench_framework run                 # all cases, 1k/10k/100k
+    python -m benchmarks.bench_framework run --sizes 1000,10000 --cases is_subset,verify_schema
+    python -m benchmarks.bench_framework compare --threshold 0.2
+
+Every run is appended to a JSON history file. 'compare' checks the latest run against
+the median of the previous runs and exits with code 1 if any case slowed down by more
+than the threshold.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_HISTORY_FILE = os.path.join(APP_DIR, "benchmarks", "history.json")
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+TESTCASE_COLUMNS = [
+    "test_group", "test_number", "use_next", "delay_before_test_sec", "use_creds", "base_url",
+    "api_name", "request_type", "test_group_name", "test_step_name", "payload", "attachment",
+    "test_type", "response_schema", "expected_outcome", "un_expected_outcome",
+    "expected_response_header", "skip_test",
+]
+
+
+def synthetic_plan(rows, chain_length=3, api_count=10):
+    """
+    Build a testcases DataFrame with 'rows' steps grouped in chains of 'chain_length'.
+
+    Parameters:
+    - rows (int): Number of rows in the plan.
+    - chain_length (int, optional): Steps per sequence. Default is 3.
+    - api_count (int, optional): Number of distinct endpoints used. Default is 10.
+
+    Returns:
+    - pandas.DataFrame: The synthetic plan.
+    """
+    import pandas as pd
+
+    records = []
+    for i in range(rows):
+        group, step = divmod(i, chain_length)
+        is_last = step == chain_length - 1 or i == rows - 1
+        records.append({
+            "test_group": group + 1,
+            "test_number": f"test{group + 1:06d}_step_{step + 1}",
+            "use_next": None if is_last else f"test{group + 1:06d}_step_{step + 2}",
+            "delay_before_test_sec": None,
+            "use_creds": '{"api_key": "bench"}' if step == 0 else None,
+            "base_url": None,
+            "api_name": f"endpoint{i % api_count}",
+            "request_type": "post",
+            "test_group_name": f"Bench sequence {group + 1}" if step == 0 else None,
+            "test_step_name": f"Step {step + 1}",
+            # the first step of a chain has no step before it to read '$$' from
+            "payload": json.dumps({"id": "$$id" if step else i, "name": f"name{i}", "value": i}),
+            "attachment": None,
+            "test_type": "positive",
+            "response_schema": json.dumps({"type": "object", "properties": {"id": {"type": "integer"}}}),
+            "expected_outcome": json.dumps({"status": "ok"}),
+            "un_expected_outcome": None,
+            "expected_response_header": None,
+            "skip_test": None,
+        })
+    return pd.DataFrame.from_records(records, columns=TESTCASE_COLUMNS)
+
+
+def synthetic_response(elements):
+    """
+    Build a nested response holding a list of 'elements' objects.
+    """
+    return {
+        "status": "ok",
+        "id": 1,
+        "items": [{"id": i, "name": f"item{i}", "tags": ["a", "b"], "meta": {"value": i}} for i in range(elements)],
+    }
+
+
+def time_call(func, repeat):
+    """
+    Run 'func' 'repeat' times and return the best wall time in seconds.
+    """
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+# --- benchmark cases --------------------------------------------------------------
+# Each case takes a size and returns a zero-argument callable to be timed.
+
+
+
+def case_extract_test_data(size):
+    import tests.test_api.test_rest_api.test_excel_cases as excel_cases
+    records = synthetic_plan(size).to_dict("records")
+
+    def run():
+        for record in records:
+            excel_cases.extract_test_data(record)
+    return run
+
+
+def write_plan(df, plan_file):
+    """
+    Write a synthetic plan in the format given by the extension of 'plan_file'.
+    """
+    import pandas as pd
+
+    extension = os.path.splitext(plan_file)[1]
+    if extension == ".xlsx":
+        with pd.ExcelWriter(plan_file) as writer:
+            df.to_excel(writer, sheet_name="testcases", index=False)
+    elif extension == ".csv":
+        df.to_csv(plan_file, index=False)
+    elif extension == ".jsonl":
+        df.to_json(plan_file, orient="records", lines=True)
+    elif extension == ".parquet":
+        df.to_parquet(plan_file, index=False)
+    else:
+        raise ValueError(f"Unsupported plan format {extension}")
+
+
+def case_group_sequences(size):
+    """
+    Time grouping the sequences of a plan whose spool is already built, which is what every
+    xdist worker but the first does when it imports the REST module.
+    """
+    from test_data.plan_readers import PlanIndex
+
+    plan_file = os.path.join(tempfile.mkdtemp(prefix="bench_plan_"), "plan.csv")
+    write_plan(synthetic_plan(size), plan_file)
+    index = PlanIndex(plan_file)
+    len(index)  # builds the spool
+    return index.group_sequences
+
+
+def plan_index_case(extension):
+    """
+    Time streaming a plan file into a PlanIndex spool and grouping its sequences.
+    """
+    def case(size):
+        from test_data.plan_readers import PlanIndex
+
+        plan_file = os.path.join(tempfile.mkdtemp(prefix="bench_plan_"), f"plan{extension}")
+        write_plan(synthetic_plan(size), plan_file)
+
+        def run():
+            index = PlanIndex(plan_file)
+            index.group_sequences()
+            index.connection.close()
+            os.remove(index.spool_path)
+        return run
+    return case
+
+
+def case_update_payload_with_prev_response(size):
+    from test_data.data_update_helpers import update_payload_with_prev_response
+    response = synthetic_response(size)
+    template = {f"key{i}": f"$$items.{i}.meta.value" for i in range(size)}
+    return lambda: update_payload_with_prev_response(dict(template), response)
+
+
+def case_get_value_from_response(size):
+    from test_data.data_update_helpers import get_value_from_response
+    response = synthetic_response(size)
+    paths = [f"items.{i}.meta.value" for i in range(size)]
+
+    def run():
+        for path in paths:
+            get_value_from_response(path, response)
+    return run
+
+
+def case_is_subset(size):
+    from utilities.data_verification_utils import is_subset
+    response = synthetic_response(size)
+    expected = {"status": "ok", "items": [{"id": size - 1, "meta": {"value": size - 1}}]}
+    return lambda: is_subset(response, expected)
+
+
+def case_verify_schema(size):
+    from utilities.data_verification_utils import verify_schema
+    response = synthetic_response(size)
+    schema = {
+        "type": "object",
+        "required": ["status", "items"],
+        "properties": {
+            "status": {"type": "string"},
+            "items": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "required": ["id", "name"],
+                    "properties": {"id": {"type": "integer"}, "name": {"type": "string"}},
+                },
+            },
+        },
+    }
+    return lambda: verify_schema(response, schema)
+
+
+def case_api_base_structure(size):
+    from requests import Response
+    from api_fixtures.api_base import ApiBase
+    body = json.dumps(synthetic_response(size)).encode("utf-8")
+    api_base = ApiBase()
+
+    def run():
+        response = Response()
+        response.status_code = 200
+        response._content = body
+        response.encoding = "utf-8"
+        api_base.structure(response)
+    return run
+
+
+def case_customlogger(size):
+    import logging
+    from utilities.custom_logger import customlogger
+    logger = customlogger(logging.DEBUG)
+
+    def run():
+        for i in range(size):
+            logger.info(f"Benchmark log line {i}")
+    return run
+
+
+CASES = {
+    "group_sequences": case_group_sequences,
+    "extract_test_data": case_extract_test_data,
+    "plan_index_xlsx": plan_index_case(".xlsx"),
+    "plan_index_csv": plan_index_case(".csv"),
+    "plan_index_jsonl": plan_index_case(".jsonl"),
+    "update_payload_with_prev_response": case_update_payload_with_prev_response,
+    "get_value_from_response": case_get_value_from_response,
+    "is_subset": case_is_subset,
+    "verify_schema": case_verify_schema,
+    "api_base_structure": case_api_base_structure,
+    "customlogger": case_customlogger,
+}
+
+
+def predicted_time(timings, next_size):
+    """
+    Extrapolate the time of 'next_size' from the last two measured sizes of a case.
+
+    The growth exponent is fitted from the last two points, so quadratic cases are
+    predicted as quadratic. With a single point, linear growth is assumed.
+    """
+    (size_a, time_a), (size_b, time_b) = ([(0, 0.0)] + timings)[-2:]
+    exponent = 1.0
+    if size_a and time_a > 0 and time_b > 0 and size_b > size_a:
+        exponent = max(1.0, math.log(time_b / time_a) / math.log(size_b / size_a))
+    return time_b * (next_size / size_b) ** exponent
+
+
+def run_micro(case_names, sizes, repeat, budget):
+    """
+    Run the micro benchmarks.
+
+    Larger sizes of a case are skipped (recorded as None) once the extrapolated time
+    exceeds 'budget' seconds, so a quadratic regression cannot stall the whole run.
+    """
+    results = {}
+    for name in case_names:
+        timings = []
+        for size in sizes:
+            key = f"{name}@{size}"
+            if timings and predicted_time(timings, size) > budget:
+                print(f"{key:<45} skipped (predicted over {budget:.0f}s budget)")
+                results[key] = None
+                continue
+            func = CASES[name](size)
+            elapsed = time_call(func, repeat)
+            timings.append((size, elapsed))
+            results[key] = elapsed
+            print(f"{key:<45} {elapsed * 1000:>12.3f} ms")
+    return results
+
+
+def run_end_to_end(rows, plan_format="xlsx"):
+    """
+    Time --collect-only and a full pytest run of a synthetic plan against the local mock server.
+    A pytest that errors out (exit code other than 0, or 1 for failed tests of a run) is recorded
+    as None, so its time never enters the baseline.
+    """
+    from mock_server import start_mock_server
+
+    df = synthetic_plan(rows)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        plan_file = os.path.join(tmp_dir, f"bench_plan.{plan_format}")
+        write_plan(df, plan_file)
+
+        server, base_url = start_mock_server(records=df.to_dict("records"))
+        # logs, results, run history and artifacts of the bench runs stay in the temporary directory,
+        # so they never feed the latency baseline of the real runs
+        env = dict(os.environ, REST_TESTDATA_FILE=plan_file, REST_API_BASE_URL=base_url,
+                   LOG_DIR=os.path.join(tmp_dir, "logs"), RESULTS_DIR=os.path.join(tmp_dir, "results"),
+                   RUN_HISTORY_DB=os.path.join(tmp_dir, "results", "history.sqlite"),
+                   ARTIFACTS_DIR=os.path.join(tmp_dir, "artifacts"))
+        try:
+            suffix = "" if plan_format == "xlsx" else f"_{plan_format}"
+            for key, extra_args, exit_codes in ((f"e2e_collect{suffix}@{rows}", ["--collect-only"], (0,)),
+                                                (f"e2e_run{suffix}@{rows}", [], (0, 1))):
+                start = time.perf_counter()
+                completed = subprocess.run(
+                    [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider",
+                     "tests/test_api/test_rest_api"] + extra_args,
+                    cwd=APP_DIR, env=env, capture_output=True, text=True,
+                )
+                if completed.returncode not in exit_codes:
+                    output = (completed.stdout + completed.stderr).strip().splitlines()[-5:]
+                    print(f"{key:<45} failed, pytest exit code {completed.returncode}")
+                    print("\n".join(f"    {line}" for line in output))
+                    results[key] = None
+                    continue
+                results[key] = time.perf_counter() - start
+                print(f"{key:<45} {results[key] * 1000:>12.3f} ms")
+        finally:
+            server.shutdown()
+    return results
+
+
+def load_history(history_file):
+    if not os.path.exists(history_file):
+        return []
+    with open(history_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_history(history_file, history):
+    os.makedirs(os.path.dirname(os.path.abspath(history_file)), exist_ok=True)
+    with open(history_file, "w", encoding="utf-8") as f:
+        json.dump(history, f, indent=2)
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare_runs(history, threshold, baseline_runs):
+    """
+    Compare the latest run with the median of up to 'baseline_runs' previous runs.
+
+    Returns:
+    - list: (case, baseline_seconds, latest_seconds, ratio) for every slowdown above the threshold.
+    """
+    if len(history) < 2:
+        return []
+    latest = history[-1]["results"]
+    previous = history[-1 - baseline_runs:-1]
+    slowdowns = []
+    for key, latest_time in latest.items():
+        baseline_times = [run["results"].get(key) for run in previous if run["results"].get(key)]
+        if not latest_time or not baseline_times:
+            continue
+        baseline_time = statistics.median(baseline_times)
+        ratio = latest_time / baseline_time
+        if ratio > 1 + threshold:
+            slowdowns.append((key, baseline_time, latest_time, ratio))
+    return slowdowns
+
+
+def command_run(args):
+    sys.path.insert(0, APP_DIR)
+    os.environ.setdefault("REST_TESTDATA_FILE", "test_data_rest_api.xlsx")
+    # customlogger writes to $LOG_DIR/automation.log, the benchmark lines and those of the mock
+    # server stay out of the repo's logs
+    work_dir = tempfile.mkdtemp(prefix="bench_")
+    os.environ["LOG_DIR"] = os.path.join(work_dir, "logs")
+    os.makedirs(os.environ["LOG_DIR"], exist_ok=True)
+    os.chdir(work_dir)
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    case_names = args.cases.split(",") if args.cases else list(CASES)
+    unknown = [name for name in case_names if name not in CASES]
+    if unknown:
+        sys.exit(f"Unknown benchmark cases: {', '.join(unknown)}")
+
+    results = run_micro(case_names, sizes, args.repeat, args.budget)
+    if args.e2e_rows:
+        os.chdir(APP_DIR)
+        results.update(run_end_to_end(args.e2e_rows, args.e2e_format))
+
+    history = load_history(args.history)
+    history.append({
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "results": results,
+    })
+    save_history(args.history, history)
+    print(f"Results appended to {args.history}")
+
+
+def command_compare(args):
+    history = load_history(args.history)
+    if len(history) < 2:
+        print("Need at least two runs in the history to compare.")
+        return
+    slowdowns = compare_runs(history, args.threshold, args.baseline_runs)
+    if not slowdowns:
+        print(f"No slowdowns above {args.threshold:.0%}.")
+        return
+    print(f"{'case':<45} {'baseline ms':>12} {'latest ms':>12} {'change':>8}")
+    for key, baseline_time, latest_time, ratio in slowdowns:
+        print(f"{key:<45} {baseline_time * 1000:>12.3f} {latest_time * 1000:>12.3f} {ratio - 1:>+8.0%}")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks for the framework's hot paths")
+    parser.add_argument("--history", type=str, default=DEFAULT_HISTORY_FILE, help="JSON history file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="run the benchmarks and append them to the history")
+    run_parser.add_argument("--sizes", type=str, default=",".join(map(str, DEFAULT_SIZES)), help="comma separated sizes")
+    run_parser.add_argument("--cases", type=str, default="", help="comma separated case names, default all")
+    run_parser.add_argument("--repeat", type=int, default=3, help="repetitions per case, best time is kept")
+    run_parser.add_argument("--budget", type=float, default=60.0, help="skip sizes predicted to take longer (seconds)")
+    run_parser.add_argument("--e2e-rows", type=int, default=300, help="rows in the end-to-end plan, 0 disables it")
+    run_parser.add_argument("--e2e-format", type=str, default="xlsx", choices=["xlsx", "csv", "jsonl", "parquet"],
+                            help="file format of the end-to-end plan")
+    run_parser.set_defaults(func=command_run)
+
+    compare_parser = subparsers.add_parser("compare", help="flag slowdowns of the latest run")
+    compare_parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown, 0.2 means 20%%")
+    compare_parser.add_argument("--baseline-runs", type=int, default=5, help="previous runs used as baseline")
+    compare_parser.set_defaults(func=command_compare)
+
+    args = parser.parse_args()
+    args.func(args)
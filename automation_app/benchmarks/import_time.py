@@ -0,0 +1,85 @@
+"""
+Import-time report built on 'python -X importtime'.
+
+Run from inside automation_app:
+
+    python -m benchmarks.import_time                                   # pytest --collect-only of the REST suite
+    python -m benchmarks.import_time --module api_fixtures.rest_api    # a single module
+    python -m benchmarks.import_time --budget-ms 1500                  # exit code 1 when over budget
+
+The report lists the slowest imports by cumulative time and the total import time of
+the process. With --budget-ms the total is checked against the startup budget.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+DEFAULT_COLLECT_TARGET = "tests/test_api/test_rest_api"
+
+
+def parse_importtime(stderr):
+    """
+    Parse the stderr of 'python -X importtime'.
+
+    Parameters:
+    - stderr (str): The captured stderr.
+
+    Returns:
+    - list: (module, self_us, cumulative_us, depth) in import order.
+    """
+    entries = []
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append((module, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return entries
+
+
+def measure(module=None, collect_target=DEFAULT_COLLECT_TARGET):
+    """
+    Run a fresh interpreter with -X importtime and return the parsed entries.
+
+    Parameters:
+    - module (str, optional): Module to import. If None, 'pytest --collect-only' is run on collect_target.
+    - collect_target (str, optional): Test path used for the collect-only run.
+
+    Returns:
+    - list: Entries as returned by parse_importtime.
+    """
+    if module:
+        command = [sys.executable, "-X", "importtime", "-c", f"import {module}"]
+    else:
+        command = [sys.executable, "-X", "importtime", "-m", "pytest", "--collect-only", "-q", "-s",
+                   "-p", "no:cacheprovider", collect_target]
+    result = subprocess.run(command, cwd=APP_DIR, capture_output=True, text=True)
+    return parse_importtime(result.stderr)
+
+
+def format_report(entries, top_n):
+    total_us = sum(self_us for _, self_us, _, _ in entries)
+    slowest = sorted(entries, key=lambda entry: entry[2], reverse=True)[:top_n]
+    lines = [f"{'module':<60} {'self ms':>9} {'cumulative ms':>14}"]
+    for module, self_us, cumulative_us, depth in slowest:
+        lines.append(f"{'  ' * depth + module:<60} {self_us / 1000:>9.1f} {cumulative_us / 1000:>14.1f}")
+    lines.append(f"Total import time: {total_us / 1000:.1f} ms across {len(entries)} modules")
+    return "\n".join(lines), total_us
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import-time report and startup budget check")
+    parser.add_argument("--module", type=str, default=None, help="module to import instead of a collect-only run")
+    parser.add_argument("--collect-target", type=str, default=DEFAULT_COLLECT_TARGET, help="test path to collect")
+    parser.add_argument("--top", type=int, default=25, help="number of slowest imports to list")
+    parser.add_argument("--budget-ms", type=float, default=None, help="fail when total import time exceeds this")
+
+    args = parser.parse_args()
+    report, total_us = format_report(measure(args.module, args.collect_target), args.top)
+    print(report)
+    if args.budget_ms is not None and total_us / 1000 > args.budget_ms:
+        print(f"Import time budget exceeded: {total_us / 1000:.1f} ms > {args.budget_ms:.1f} ms")
+        sys.exit(1)
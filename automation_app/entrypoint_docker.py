@@ -3,20 +3,28 @@ import subprocess
 import sys
 import re
 import shutil
+import signal
 import logging
 import argparse
+import time
 
-# Set up logging
-logs_dir = os.path.join(os.path.dirname(__file__), 'logs')
-os.makedirs(logs_dir, exist_ok=True)
-log_file_path = os.path.join(logs_dir, 'entrypoint.log')
-verbose_log_file = os.path.join(logs_dir, 'pytest_verbose_output.log')
+from utilities import run_artifacts
+from utilities.compressed_files import precompress
 
-logging.basicConfig(
-    filename=log_file_path,
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+def setup_logging(logs_dir):
+    """
+    Log to entrypoint.log in the logs directory of the run.
+    """
+    os.makedirs(logs_dir, exist_ok=True)
+    logging.basicConfig(
+        filename=os.path.join(logs_dir, 'entrypoint.log'),
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+# Time kept after the run deadline for report generation, and how long pytest may overrun it
+REPORT_RESERVE_SEC = float(os.getenv("REPORT_RESERVE_SEC", 120))
+PYTEST_KILL_GRACE_SEC = 30
 
 def install_requirements(requirements_file):
     """
@@ -31,42 +39,57 @@ def install_requirements(requirements_file):
         logging.error("Error installing requirements:", e)
         sys.exit(1)
 
-def run_tests_and_summarize(pytest_run_command):
+def run_tests_and_summarize(pytest_run_command, run_dir, deadline=None):
     """
     Run pytest to execute tests and then summarize the results.
     Capture all verbose output from the pytest run and store it in a log file.
+    Both go to the run directory, test_summary.txt is also copied to the working directory.
+
+    With a deadline (epoch seconds) pytest gets it as RUN_DEADLINE and stops starting tests
+    once it has passed. If pytest is still running shortly after, it is killed with its xdist
+    workers and whatever output it produced is summarized, so the report can still be generated.
     """
+    env = os.environ.copy()
+    timeout = None
+    if deadline is not None:
+        env["RUN_DEADLINE"] = str(deadline)
+        timeout = max(deadline - time.time(), 0) + PYTEST_KILL_GRACE_SEC
+
     try:
         # Run the pytest command and capture both stdout and stderr
-        result = subprocess.run(
+        # pytest and its xdist workers run in their own session, so a timeout kills all of them
+        process = subprocess.Popen(
             pytest_run_command,
             shell=True,
-            capture_output=True,
-            text=True
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            env=env,
+            start_new_session=True
         )
-        
-        # Extract test results from stdout
-        output = result.stdout
-        error_output = result.stderr
+        try:
+            output, error_output = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            logging.error(f"pytest did not stop at the run deadline, killed after {timeout:.0f} seconds.")
+            os.killpg(process.pid, signal.SIGKILL)
+            output, error_output = process.communicate()
+            error_output += "\nKilled: run deadline exceeded\n"
 
         # Parse the test results
         passed_match = re.search(r'(\d+) passed', output, re.IGNORECASE)
         failed_match = re.search(r'(\d+) failed', output, re.IGNORECASE)
+        regressions_match = re.search(r'(\d+) latency regression', output, re.IGNORECASE)
 
         passed = int(passed_match.group(1)) if passed_match else 0
         failed = int(failed_match.group(1)) if failed_match else 0
+        regressions = int(regressions_match.group(1)) if regressions_match else 0
 
         total = passed + failed
 
-        # Write a summary to a text file
-        with open("test_summary.txt", "w") as summary_file:
-            summary_file.write(f"Test API\n")
-            summary_file.write(f"Total Tests: {total}\n")
-            summary_file.write(f"Passed Tests: {passed}\n")
-            summary_file.write(f"Failed Tests: {failed}\n")
+        write_summary(run_dir, passed, failed, regressions)
         
         # Write full verbose output to a separate log file
-        with open(verbose_log_file, "w") as log_file:
+        with open(os.path.join(run_dir, "logs", "pytest_verbose_output.log"), "w") as log_file:
             log_file.write("STDOUT:\n")
             log_file.write(output)
             log_file.write("\n\nSTDERR:\n")
@@ -79,13 +102,88 @@ def run_tests_and_summarize(pytest_run_command):
         logging.error("Error running pytest command:", e)
         sys.exit(1)
 
-def copy_history(src_dir, dst_dir):
+def write_summary(run_dir, passed, failed, regressions):
+    """
+    Write test_summary.txt to the run directory and copy it to the working directory.
+    """
+    total = passed + failed
+    summary_path = os.path.join(run_dir, "test_summary.txt")
+    with open(summary_path, "w") as summary_file:
+        summary_file.write(f"Test API\n")
+        summary_file.write(f"Total Tests: {total}\n")
+        summary_file.write(f"Passed Tests: {passed}\n")
+        summary_file.write(f"Failed Tests: {failed}\n")
+        summary_file.write(f"Latency Regressions: {regressions}\n")
+    shutil.copyfile(summary_path, "test_summary.txt")
+
+def run_distributed_and_summarize(run_dir, allure_results_dir, runners, deadline=None):
+    """
+    Coordinate a distributed run: put one task per sequence of the plan in the work queue, start
+    runner.py with `runners` local pytest processes and wait until the queue is drained. Runners
+    on other hosts join through the /queue routes of the Flask app. The run history, latency
+    regressions and span trace of the run are handled here once, not by each runner.
+    """
+    from test_data.plan_readers import PlanIndex
+    from test_data.read_settings_file import get_rest_api_settings
+    from utilities import latency_regression, profiler, run_history, work_queue
+    from utilities.api_utils.resilience import reset_run_state
+
+    run_id = os.environ["RUN_ID"]
+    plan = PlanIndex(get_rest_api_settings("testdata_file"), sheet_name="testcases")
+    task_ids = [work_queue.sequence_key(sequence) for sequence in plan.group_sequences()]
+    queue = work_queue.WorkQueue()
+    reset_run_state()
+    queue.create_run(run_id, task_ids, testtype="rest", deadline=deadline)
+    logging.info(f"Run {run_id}: {len(task_ids)} sequences queued for {runners} local runner(s).")
+
+    command = [sys.executable, "runner.py", "--run-id", run_id, "--processes", str(runners),
+               "--alluredir", allure_results_dir]
+    with open(os.path.join(run_dir, "logs", "runner.log"), "a") as runner_log:
+        process = subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(__file__)), stdout=runner_log,
+                                   stderr=subprocess.STDOUT, start_new_session=True)
+    wait_deadline = deadline + PYTEST_KILL_GRACE_SEC if deadline else None
+    status = work_queue.wait_until_drained(queue, run_id, wait_deadline, [process])
+    queue.close_run(run_id)
+    try:
+        process.wait(timeout=PYTEST_KILL_GRACE_SEC)
+    except subprocess.TimeoutExpired:
+        logging.error("Local runners did not stop after the run, killed.")
+        os.killpg(process.pid, signal.SIGKILL)
+    logging.info(f"Run {run_id} finished with {status['outcomes']}, runners: {status['runners']}.")
+
+    regressions = []
+    # the runners wrote their spans under the run id, merge those and not a timestamped run
+    os.environ["PROFILE_RUN_ID"] = run_id
+    profiler.configure()
+    profiler.finish_run(logging.getLogger())
+    try:
+        run_history.ingest_run(run_id)
+        regressions = latency_regression.detect_regressions(run_id)
+    except Exception as e:
+        logging.error(f"Could not store run {run_id} in the run history: {e}")
+    outcomes = status["outcomes"]
+    write_summary(run_dir, outcomes.get("passed", 0), outcomes.get("failed", 0), len(regressions))
+
+def carry_history(previous_run_dir, allure_results_dir):
+    """
+    Hardlink the history of the previous run's report into the new allure-results, so the
+    trend charts continue without copying the history.
+    """
+    history_dir = os.path.join(previous_run_dir, 'allure-report', 'history')
+    if os.path.exists(history_dir):
+        count = run_artifacts.link_tree(history_dir, os.path.join(allure_results_dir, 'history'))
+        logging.info(f"Linked {count} history files from {history_dir}.")
+    else:
+        logging.warning(f"No history found in {previous_run_dir}.")
+
+def start_maintenance(logs_dir):
     """
-    Copy history directory from src_dir to dst_dir.
+    Pack old runs and apply the retention policy in a detached process, so the run ends without waiting.
     """
-    if os.path.exists(src_dir):
-        shutil.copytree(src_dir, dst_dir, dirs_exist_ok=True)
-        logging.info(f"Copied history from {src_dir} to {dst_dir}.")
+    with open(os.path.join(logs_dir, 'artifacts_maintain.log'), 'a') as maintain_log:
+        subprocess.Popen([sys.executable, '-m', 'utilities.run_artifacts', 'maintain'],
+                         cwd=os.path.dirname(os.path.abspath(__file__)), stdout=maintain_log,
+                         stderr=subprocess.STDOUT, start_new_session=True)
 
 def generate_allure_report(results_dir, report_dir, single_file=False):
     """
@@ -106,77 +204,83 @@ def generate_allure_report(results_dir, report_dir, single_file=False):
 
 def main(args):
     script_dir = os.path.dirname(os.path.abspath(__file__))
+    # One artifact directory per run, the Flask app creates it and passes RUN_ID and LOG_DIR.
+    # pytest writes the native results of this run to results/<RUN_ID>.jsonl
+    os.environ.setdefault("RUN_ID", run_artifacts.new_run_id(args.testtype))
+    run_dir = run_artifacts.create_run(os.environ["RUN_ID"], args.testtype)
+    os.environ.setdefault("LOG_DIR", os.path.join(run_dir, 'logs'))
+    setup_logging(os.environ["LOG_DIR"])
+    logging.info(f"Artifacts of run {os.environ['RUN_ID']} go to {run_dir}.")
+    # The tests must finish REPORT_RESERVE_SEC before the deadline, the rest is for the report
+    pytest_deadline = args.deadline - REPORT_RESERVE_SEC if args.deadline else None
 
-    # Define the parent directory for all results and reports
-    root_parent_dir = os.path.join(script_dir, 'allure_data')
-    api_parent_dir = os.path.join(root_parent_dir, 'api_allure_data')
-    if args.testtype == 'rest':
-        parent_dir = os.path.join(api_parent_dir, 'rest')
-    if args.testtype == 'graphql':
-        parent_dir = os.path.join(api_parent_dir, 'graphql')
-
-    # Define directories for Allure reports and history within the parent directory
-    allure_results_dir = os.path.join(parent_dir, 'allure-results')
-    allure_history_dir = os.path.join(parent_dir, 'allure-history')
-    allure_report_dir = os.path.join(parent_dir, 'allure-report')
-
-    # Delete existing allure results and report directories if they exist and are accessible
-    if os.path.exists(allure_results_dir) and os.access(allure_results_dir, os.W_OK):
-        shutil.rmtree(allure_results_dir)
-        logging.info(f"Deleted directory: {allure_results_dir}")
-    else:
-        logging.warning(f"Cannot delete {allure_results_dir}: Directory does not exist or lacks write permission.")
+    try:
+        if args.sink == 'native':
+            # no Allure files during the run and no JVM afterwards, utilities.reporting can export them later
+            test_path = "tests/test_api/test_rest_api" if args.testtype == 'rest' else "tests/test_graphql"
+            run_tests_and_summarize(f"pytest {test_path}", run_dir, deadline=pytest_deadline)
+            logging.info(f"Native results of run {os.environ['RUN_ID']} stored, Allure report skipped.")
+            return
 
-    if os.path.exists(allure_report_dir) and os.access(allure_report_dir, os.W_OK):
-        shutil.rmtree(allure_report_dir)
-        logging.info(f"Deleted directory: {allure_report_dir}")
-    else:
-        logging.warning(f"Cannot delete {allure_report_dir}: Directory does not exist or lacks write permission.")
-
-    # Ensure directories exist
-    os.makedirs(allure_results_dir, exist_ok=True)
-    os.makedirs(allure_history_dir, exist_ok=True)
-    os.makedirs(allure_report_dir, exist_ok=True)
-
-    # Copy the previous history to the new allure-results directory before running tests
-    copy_history(os.path.join(allure_history_dir, 'history'), os.path.join(allure_results_dir, 'history'))
-
-    # Run the pytest command and summarize results
-    if args.testtype == 'rest':
-        pytest_run_command = "pytest tests/test_api/test_rest_api --alluredir=" + allure_results_dir
-    if args.testtype == 'graphql':
-        pytest_run_command = "pytest tests/test_graphql --alluredir=" + allure_results_dir
-    run_tests_and_summarize(pytest_run_command)
-
-    # Generate the full Allure report
-    generate_allure_report(allure_results_dir, allure_report_dir)
-
-    # Check if history is generated and copy it back for future runs
-    generated_history_dir = os.path.join(allure_report_dir, 'history')
-    history_src_dir = os.path.join(allure_history_dir, 'history')
-    if os.path.exists(generated_history_dir):
-        copy_history(generated_history_dir, history_src_dir)
-    else:
-        logging.warning("No history directory found in the generated Allure results.")
-
-    # Generate the single HTML file using --single-file option
-    single_file_report_dir = os.path.join(parent_dir, 'single-file-report')
-    os.makedirs(single_file_report_dir, exist_ok=True)
-    generate_allure_report(allure_results_dir, single_file_report_dir, single_file=True)
-
-    # Rename the single HTML file to make it clear
-    single_file_html = os.path.join(single_file_report_dir, 'index.html')
-    final_single_html = os.path.join(parent_dir, 'allure-report.html')
-    if os.path.exists(single_file_html):
-        shutil.move(single_file_html, final_single_html)
-        logging.info(f"Single HTML report generated at: {final_single_html}")
-    else:
-        logging.warning("Single HTML file was not created.")
+        # Allure results and reports of this run, nothing of an earlier run is deleted or rewritten
+        allure_results_dir = os.path.join(run_dir, 'allure-results')
+        allure_report_dir = os.path.join(run_dir, 'allure-report')
+        os.makedirs(allure_results_dir, exist_ok=True)
+
+        # Carry the history of the last report of this test type forward
+        previous_run_dir = run_artifacts.latest_run(args.testtype)
+        if previous_run_dir:
+            carry_history(previous_run_dir, allure_results_dir)
+
+        # Run the pytest command and summarize results
+        if args.testtype == 'rest' and args.runners:
+            # the sequences are pulled from the work queue by runner processes, here and on other hosts
+            run_distributed_and_summarize(run_dir, allure_results_dir, args.runners, deadline=pytest_deadline)
+        else:
+            if args.testtype == 'rest':
+                pytest_run_command = "pytest tests/test_api/test_rest_api --alluredir=" + allure_results_dir
+            if args.testtype == 'graphql':
+                pytest_run_command = "pytest tests/test_graphql --alluredir=" + allure_results_dir
+            run_tests_and_summarize(pytest_run_command, run_dir, deadline=pytest_deadline)
+
+        # Generate the full Allure report, its history is picked up by the next run
+        generate_allure_report(allure_results_dir, allure_report_dir)
+        if not os.path.exists(os.path.join(allure_report_dir, 'history')):
+            logging.warning("No history directory found in the generated Allure report.")
+
+        # Generate the single HTML file using --single-file option
+        single_file_report_dir = os.path.join(run_dir, 'single-file-report')
+        generate_allure_report(allure_results_dir, single_file_report_dir, single_file=True)
+
+        # Rename the single HTML file to make it clear
+        single_file_html = os.path.join(single_file_report_dir, 'index.html')
+        final_single_html = os.path.join(run_dir, 'allure-report.html')
+        if os.path.exists(single_file_html):
+            shutil.move(single_file_html, final_single_html)
+            logging.info(f"Single HTML report generated at: {final_single_html}")
+            # compressed once here, so Flask never compresses the report per request
+            for variant in precompress(final_single_html):
+                logging.info(f"Pre-compressed report written to: {variant}")
+        else:
+            logging.warning("Single HTML file was not created.")
+
+        # The Flask app serves the report of the latest-<testtype> run
+        run_artifacts.set_latest(args.testtype, os.environ["RUN_ID"])
+    finally:
+        run_artifacts.finish_run(run_dir)
+        start_maintenance(os.environ["LOG_DIR"])
     
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="for Test Type")
     parser.add_argument("--testtype", type=str, help="rest or graphql")
+    parser.add_argument("--deadline", type=float, default=None,
+                        help="epoch seconds by which the tests and the report must be finished")
+    parser.add_argument("--sink", type=str, choices=["allure", "native"], default=os.getenv("REPORT_SINK", "allure"),
+                        help="native only writes results/<run_id>.jsonl and skips the Allure report")
+    parser.add_argument("--runners", type=int, default=int(os.getenv("RUNNERS", 0)),
+                        help="REST only: pull the sequences from the work queue with this many local runner "
+                             "processes, runners on other hosts can join")
 
     args = parser.parse_args()
     main(args)
@@ -1,30 +1,62 @@
 import json
+import mimetypes
+import re
+import signal
 import time
-from flask import Flask, jsonify, request, render_template, send_from_directory, render_template_string, abort
+from flask import Flask, jsonify, request, render_template, send_file, send_from_directory, render_template_string, abort
+from werkzeug.security import safe_join
 import subprocess
 import os
 import threading
-import shutil
+
+from utilities import latency_regression, log_search, reporting, run_artifacts, run_history, work_queue
+from utilities.compressed_files import pick_variant
 
 app = Flask(__name__)
 root_dir = os.path.dirname(__file__)
 environment = os.getenv("ENVIRONMENT")
 
+# Whole-run deadline, the watchdog kills a run that is still alive WATCHDOG_GRACE_SEC after it
+RUN_TIMEOUT_SEC = float(os.getenv("RUN_TIMEOUT_SEC", 3600))
+WATCHDOG_GRACE_SEC = 60
+
 # Global flags to track if the scripts are running
 rest_api_test_running = False
 graphql_api_test_running = False
 
+def send_precompressed(directory, filename):
+    """
+    Serve a file through its pre-compressed .br/.gz variant when the client accepts it.
+    ETag and Last-Modified let repeat loads end in a 304 without a body, and no-cache makes
+    the browser revalidate instead of showing a stale report.
+    """
+    path = safe_join(directory, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    served_path, encoding = pick_variant(path, request.accept_encodings)
+    response = send_file(served_path, mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+                         conditional=True, etag=True)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    response.cache_control.no_cache = True
+    return response
+
+def _latest_report_dir(testtype):
+    report_dir = run_artifacts.latest_run(testtype)
+    if report_dir is None:
+        abort(404)
+    return report_dir
+
 # Serve the rest Tests Allure report
 @app.route('/allure-report-rest')
 def serve_smoke_report():
-    report_dir = os.path.join(root_dir, "allure_data", "api_allure_data", "rest")
-    return send_from_directory(report_dir, 'allure-report.html')
+    return send_precompressed(_latest_report_dir("rest"), 'allure-report.html')
 
 # Serve the graphql Tests Allure report
 @app.route('/allure-report-graphql')
 def serve_detailed_report():
-    report_dir = os.path.join(root_dir, "allure_data", "api_allure_data", "graphql")
-    return send_from_directory(report_dir, 'allure-report.html')
+    return send_precompressed(_latest_report_dir("graphql"), 'allure-report.html')
 
 @app.route('/')
 def index():
@@ -34,7 +66,15 @@ def index():
         return render_template('prod_index.html')
 
 
-def run_script_in_background(script_type):
+def _kill_process_group(process):
+    # the run's pytest processes are in its group and hold its output pipes, kill them with it
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def run_script_in_background(script_type, timeout_sec=None, sink=None, runners=None):
     global rest_api_test_running, graphql_api_test_running
 
     if script_type == "rest":
@@ -43,26 +83,40 @@ def run_script_in_background(script_type):
         graphql_api_test_running = True
 
     try:
-        logs_dir = os.path.join(root_dir, "logs")
-        # Delete the logs directory if it exists
-        if os.path.exists(logs_dir):
-            shutil.rmtree(logs_dir)
-
-        # Create a new logs directory
-        os.makedirs(logs_dir, exist_ok=True)
+        # Each run writes to its own artifacts/<run_id>/ directory, so runs never remove each other's logs
+        run_id = run_artifacts.new_run_id(script_type)
+        run_dir = run_artifacts.create_run(run_id, script_type)
+        logs_dir = os.path.join(run_dir, "logs")
+        env = dict(os.environ, RUN_ID=run_id, LOG_DIR=logs_dir)
 
         log_file_path = os.path.join(logs_dir, f'{script_type}_output.log')
         # Open the log file in append mode
         with open(log_file_path, "a") as log_file:
             try:
+                timeout_sec = timeout_sec or RUN_TIMEOUT_SEC
+                deadline = time.time() + timeout_sec
+
                 # Execute the subprocess and log output in real-time
+                command = ['python', f'{root_dir}/entrypoint_docker.py', '--testtype', script_type,
+                           '--deadline', str(deadline)]
+                if sink:
+                    command += ['--sink', sink]
+                if runners:
+                    command += ['--runners', str(runners)]
                 process = subprocess.Popen(
-                    ['python', f'{root_dir}/entrypoint_docker.py', '--testtype', script_type],
+                    command,
                     stdout=subprocess.PIPE,
                     stderr=subprocess.PIPE,
-                    text=True
+                    text=True,
+                    env=env,
+                    start_new_session=True
                 )
 
+                # Kill the run if it hangs past its deadline so the running flag is released
+                watchdog = threading.Timer(timeout_sec + WATCHDOG_GRACE_SEC, _kill_process_group, (process,))
+                watchdog.daemon = True
+                watchdog.start()
+
                 # Stream and write the output to the log file
                 for line in process.stdout:
                     log_file.write(f"STDOUT: {line}")
@@ -74,9 +128,13 @@ def run_script_in_background(script_type):
 
                 # Wait for the process to complete
                 process.wait()
+                watchdog.cancel()
 
                 # Check the return code for success or failure
-                if process.returncode != 0:
+                if process.returncode == -9:
+                    log_file.write(f"Process killed by the watchdog after {timeout_sec:.0f} seconds\n")
+                    print(f"Process killed by the watchdog after {timeout_sec:.0f} seconds")
+                elif process.returncode != 0:
                     log_file.write(f"Process exited with code {process.returncode}\n")
                     print(f"Process exited with code {process.returncode}")
                 else:
@@ -94,18 +152,43 @@ def run_script_in_background(script_type):
             graphql_api_test_running = False
 
 
+def _requested_timeout():
+    # optional ?timeout_sec= on the run endpoints overrides RUN_TIMEOUT_SEC for that run
+    timeout_sec = request.args.get("timeout_sec", type=float)
+    return timeout_sec if timeout_sec and timeout_sec > 0 else None
+
+
+def _requested_sink():
+    # optional ?sink=native skips the Allure report for that run, the native results are always written
+    sink = request.args.get("sink")
+    return sink if sink in ("allure", "native") else None
+
+
+def _requested_runners():
+    # optional ?runners=N spreads the sequences over N local runner processes pulling from the work queue
+    runners = request.args.get("runners", type=int)
+    return runners if runners and runners > 0 else None
+
+
 @app.route('/run-rest-tests', methods=['POST'])
 def run_smoke_tests():
+    global rest_api_test_running
     if not rest_api_test_running:
-        threading.Thread(target=run_script_in_background("rest"), args=("rest",)).start()
+        # set before the thread starts so a second request cannot slip in
+        rest_api_test_running = True
+        threading.Thread(target=run_script_in_background,
+                         args=("rest", _requested_timeout(), _requested_sink(), _requested_runners())).start()
         return "rest tests started successfully"
     else:
         return "rest tests are already running"
 
 @app.route('/run-graphql-tests', methods=['POST'])
 def run_detailed_tests():
+    global graphql_api_test_running
     if not graphql_api_test_running:
-        threading.Thread(target=run_script_in_background("graphql"), args=("graphql",)).start()
+        # set before the thread starts so a second request cannot slip in
+        graphql_api_test_running = True
+        threading.Thread(target=run_script_in_background, args=("graphql", _requested_timeout(), _requested_sink())).start()
         return "graphql tests started successfully"
     else:
         return "graphql tests are already running"
@@ -117,14 +200,121 @@ def status():
         "graphql_api_test_running": graphql_api_test_running
     })
 
+# Route to list the runs stored by the native results sink
+@app.route('/results')
+def list_results():
+    runs = reporting.list_runs()
+    return render_template_string('''
+        <html>
+            <head>
+                <title>Results</title>
+            </head>
+            <body>
+                <h1>Runs</h1>
+                <ul>
+                    {% for run_id in runs %}
+                        <li><a href="{{ url_for('view_results', run_id=run_id) }}">{{ run_id }}</a>
+                            (<a href="{{ url_for('results_summary', run_id=run_id) }}">json</a>)</li>
+                    {% endfor %}
+                </ul>
+            </body>
+        </html>
+    ''', runs=runs)
+
+def _run_summary(run_id):
+    if run_id not in reporting.list_runs():
+        abort(404)
+    return reporting.summarize_run(run_id)
+
+# Summary of a stored run as JSON
+@app.route('/results/<run_id>/summary.json')
+def results_summary(run_id):
+    return jsonify(_run_summary(run_id))
+
+# Summary of a stored run as an HTML table
+@app.route('/results/<run_id>')
+def view_results(run_id):
+    summary = _run_summary(run_id)
+    return render_template_string('''
+        <html>
+            <head>
+                <title>Run {{ summary.run_id }}</title>
+            </head>
+            <body>
+                <h1>Run {{ summary.run_id }}</h1>
+                <p>{{ summary.totals.total }} tests: {{ summary.totals.passed }} passed,
+                   {{ summary.totals.failed }} failed, {{ summary.totals.skipped }} skipped
+                   {% if summary.duration_sec is not none %} in {{ summary.duration_sec }}s{% endif %}</p>
+                <table border="1" cellpadding="4">
+                    <tr><th>Test</th><th>Outcome</th><th>Seconds</th><th>Failed checkpoints</th><th>Message</th></tr>
+                    {% for test in summary.tests %}
+                        <tr>
+                            <td>{{ test.title }}</td>
+                            <td>{{ test.outcome }}</td>
+                            <td>{{ test.duration_sec }}</td>
+                            <td>{{ test.failed_checkpoints | join(', ') }}</td>
+                            <td><pre>{{ test.message or '' }}</pre></td>
+                        </tr>
+                    {% endfor %}
+                </table>
+                <a href="{{ url_for('list_results') }}">Back to runs</a>
+            </body>
+        </html>
+    ''', summary=summary)
+
+def _last_runs():
+    # ?runs=N limits the history queries to the N most recent runs
+    return min(max(request.args.get("runs", default=20, type=int), 1), 1000)
+
+# Runs stored in the run history
+@app.route('/history/runs')
+def history_runs():
+    return jsonify(run_history.list_runs(_last_runs()))
+
+# Requests, failure rate and latency per endpoint and run, ?endpoint= for one endpoint
+@app.route('/history/endpoints')
+def history_endpoints():
+    return jsonify(run_history.endpoint_trends(_last_runs(), endpoint=request.args.get("endpoint")))
+
+# Flakiness per sequence, most flaky first
+@app.route('/history/flaky')
+def history_flaky():
+    return jsonify(run_history.flaky_sequences(_last_runs()))
+
+# Slowest requests, ?limit= rows
+@app.route('/history/slowest')
+def history_slowest():
+    return jsonify(run_history.slowest_steps(_last_runs(), limit=request.args.get("limit", default=20, type=int)))
+
+# Latency regressions of a run against its rolling baseline, the latest run unless ?run_id= is given
+@app.route('/history/regressions')
+def history_regressions():
+    return jsonify(latency_regression.stored_regressions(request.args.get("run_id")))
+
+def _logs_dir(run_id=None):
+    # logs of a run with ?run_id=, the logs directory of the app itself without it
+    if not run_id:
+        return os.path.join(os.path.dirname(__file__), 'logs')
+    logs_dir = safe_join(run_artifacts.get_artifacts_dir(), run_id, 'logs')
+    if logs_dir is None or not os.path.isdir(logs_dir):
+        abort(404)
+    return logs_dir
+
+def _log_files(logs_dir):
+    if not os.path.exists(logs_dir):
+        return []
+    return sorted(f for f in os.listdir(logs_dir) if os.path.isfile(os.path.join(logs_dir, f)) and f.endswith('.log'))
+
 # Route to list all log files
 @app.route('/logs')
 def list_logs():
-    logs_dir = os.path.join(os.path.dirname(__file__), 'logs')
+    logs_dir = _logs_dir()
     if not os.path.exists(logs_dir):
         os.makedirs(logs_dir)
-    files = os.listdir(logs_dir)
-    files = [f for f in files if os.path.isfile(os.path.join(logs_dir, f)) and f.endswith('.log')]
+    # the app's own logs first, then the logs of every run that is not packed yet
+    groups = [(None, _log_files(logs_dir))]
+    groups += [(run["run_id"], _log_files(os.path.join(run["path"], 'logs')))
+               for run in run_artifacts.list_runs() if not run["compressed"]]
     
     # Render an HTML template to display the list of log files as links
     return render_template_string('''
@@ -134,42 +324,131 @@ def list_logs():
             </head>
             <body>
                 <h1>Log Files</h1>
-                <ul>
-                    {% for file in files %}
-                        <li><a href="{{ url_for('view_log', filename=file) }}">{{ file }}</a></li>
-                    {% endfor %}
-                </ul>
+                {% for run_id, files in groups %}
+                    {% if run_id %}<h2>Run {{ run_id }}</h2>{% endif %}
+                    <ul>
+                        {% for file in files %}
+                            <li>
+                                <a href="{{ url_for('view_log', filename=file, run_id=run_id) }}">{{ file }}</a>
+                                <form action="{{ url_for('search_log', filename=file) }}" method="get" style="display:inline">
+                                    {% if run_id %}<input type="hidden" name="run_id" value="{{ run_id }}">{% endif %}
+                                    <input name="q" placeholder="search">
+                                    <label><input type="checkbox" name="regex" value="true">regex</label>
+                                    <label><input type="checkbox" name="ignore_case" value="true">ignore case</label>
+                                </form>
+                            </li>
+                        {% endfor %}
+                    </ul>
+                {% endfor %}
             </body>
         </html>
-    ''', files=files)
+    ''', groups=groups)
 
-# Route to display log file contents in the browser
+# Route to display log file contents in the browser, ?run_id= for the logs of a run
 @app.route('/logs/view/<filename>')
 def view_log(filename):
-    logs_dir = os.path.join(os.path.dirname(__file__), 'logs')
-    file_path = os.path.join(logs_dir, filename)
+    logs_dir = _logs_dir(request.args.get("run_id"))
     
-    # Ensure the file exists and has a .log extension for security
-    if not os.path.isfile(file_path) or not filename.endswith('.log'):
+    # Only .log files are served
+    if not filename.endswith('.log'):
         return abort(404)
     
-    # Read the file contents and render as plain text
-    with open(file_path, 'r') as file:
-        content = file.read()
-    
-    # Display the log content in the browser
-    return render_template_string('''
-        <html>
-            <head>
-                <title>{{ filename }}</title>
-            </head>
-            <body>
-                <h1>{{ filename }}</h1>
-                <pre>{{ content }}</pre>
-                <a href="{{ url_for('list_logs') }}">Back to log files</a>
-            </body>
-        </html>
-    ''', filename=filename, content=content)
+    # Streamed as plain text with ETag/Last-Modified and Range, so a reload of an unchanged log
+    # is a 304 and a growing log can be followed with "Range: bytes=<size>-"
+    response = send_from_directory(logs_dir, filename, mimetype="text/plain", conditional=True, etag=True)
+    response.cache_control.no_cache = True
+    return response
+
+def _log_path(filename):
+    # only .log files of the logs directory
+    path = safe_join(_logs_dir(request.args.get("run_id")), filename)
+    if path is None or not filename.endswith('.log') or not os.path.isfile(path):
+        abort(404)
+    return path
+
+# Stored runs with their artifact directory or archive
+@app.route('/artifacts')
+def list_artifacts():
+    return jsonify(run_artifacts.list_runs())
+
+# Search a log for a substring or a regex, paged with from_line=<next_line of the previous page>
+@app.route('/logs/search/<filename>')
+def search_log(filename):
+    path = _log_path(filename)
+    query = request.args.get("q", "")
+    if not query:
+        return jsonify({"error": "Missing search text, pass ?q="}), 400
+    try:
+        result = log_search.search(
+            path, query,
+            regex=request.args.get("regex", "false").lower() in ("1", "true", "yes"),
+            ignore_case=request.args.get("ignore_case", "false").lower() in ("1", "true", "yes"),
+            from_line=max(request.args.get("from_line", default=1, type=int), 1),
+            limit=min(max(request.args.get("limit", default=50, type=int), 1), 500),
+            context=min(max(request.args.get("context", default=2, type=int), 0), 50))
+    except re.error as e:
+        return jsonify({"error": f"Invalid regex: {e}"}), 400
+    return jsonify(result)
+
+# Page through a log by line number
+@app.route('/logs/lines/<filename>')
+def log_lines(filename):
+    path = _log_path(filename)
+    return jsonify(log_search.read_lines(
+        path,
+        start=max(request.args.get("start", default=1, type=int), 1),
+        count=min(max(request.args.get("count", default=200, type=int), 1), 5000)))
+
+# Work queue of distributed runs, runners on other hosts reach it with COORDINATOR_URL set to this app
+_work_queue = None
+
+def _queue():
+    global _work_queue
+    if _work_queue is None:
+        _work_queue = work_queue.WorkQueue()
+    return _work_queue
+
+def _queue_request():
+    body = request.get_json(silent=True) or {}
+    if not body.get("runner"):
+        abort(400)
+    return body
+
+@app.route('/queue/runs')
+def queue_runs():
+    return jsonify(_queue().active_runs())
+
+@app.route('/queue/<run_id>')
+def queue_status(run_id):
+    return jsonify(_queue().status(run_id))
+
+@app.route('/queue/<run_id>/run')
+def queue_run(run_id):
+    run = _queue().get_run(run_id)
+    if run is None:
+        abort(404)
+    return jsonify(run)
+
+@app.route('/queue/<run_id>/lease', methods=['POST'])
+def queue_lease(run_id):
+    body = _queue_request()
+    return jsonify({"tasks": _queue().lease(run_id, body["runner"], body.get("max_tasks"))})
+
+@app.route('/queue/<run_id>/start', methods=['POST'])
+def queue_start(run_id):
+    body = _queue_request()
+    return jsonify({"started": _queue().start(run_id, body["runner"], body["task_id"])})
+
+@app.route('/queue/<run_id>/complete', methods=['POST'])
+def queue_complete(run_id):
+    body = _queue_request()
+    return jsonify({"completed": _queue().complete(run_id, body["runner"], body["task_id"], body["outcome"],
+                                                   body.get("duration_sec"))})
+
+@app.route('/queue/<run_id>/heartbeat', methods=['POST'])
+def queue_heartbeat(run_id):
+    body = _queue_request()
+    return jsonify({"tasks": _queue().heartbeat(run_id, body["runner"])})
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5001)
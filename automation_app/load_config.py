@@ -13,12 +13,36 @@ def get_configs():
     SETTINGS = {
         'Settings_Rest_api': {
             'testdata_file': os.getenv('REST_TESTDATA_FILE'),
+            'config_file': os.getenv('REST_CONFIG_FILE'),
+            'plan_check': os.getenv('REST_PLAN_CHECK'),
             'api_key': os.getenv('REST_API_KEY'),
             'api_secret': os.getenv('REST_API_SECRET'),
             'signature': os.getenv('REST_API_SIGNATURE'),
             'base_url': os.getenv('REST_API_BASE_URL'),
             'username': os.getenv('REST_USERNAME'),
-            'password': os.getenv('REST_PASSWORD')
+            'password': os.getenv('REST_PASSWORD'),
+            'auth_token_path': os.getenv('REST_AUTH_TOKEN_PATH'),
+            'auth_expires_path': os.getenv('REST_AUTH_EXPIRES_PATH'),
+            'auth_ttl_sec': os.getenv('REST_AUTH_TTL_SEC'),
+            'auth_refresh_margin_sec': os.getenv('REST_AUTH_REFRESH_MARGIN_SEC'),
+            'circuit_breaker_threshold': os.getenv('REST_CIRCUIT_BREAKER_THRESHOLD'),
+            'circuit_breaker_cooldown_sec': os.getenv('REST_CIRCUIT_BREAKER_COOLDOWN_SEC'),
+            'max_retries': os.getenv('REST_MAX_RETRIES'),
+            'retry_backoff_sec': os.getenv('REST_RETRY_BACKOFF_SEC'),
+            'retry_backoff_cap_sec': os.getenv('REST_RETRY_BACKOFF_CAP_SEC'),
+            'retry_budget': os.getenv('REST_RETRY_BUDGET'),
+            'connect_timeout_sec': os.getenv('REST_CONNECT_TIMEOUT_SEC'),
+            'read_timeout_sec': os.getenv('REST_READ_TIMEOUT_SEC'),
+            'host_timeouts': os.getenv('REST_HOST_TIMEOUTS'),
+            'dag_max_workers': os.getenv('REST_DAG_MAX_WORKERS'),
+            'data_driven_concurrency': os.getenv('REST_DATA_DRIVEN_CONCURRENCY'),
+            'rate_limits': os.getenv('REST_RATE_LIMITS'),
+            'rate_limit_max_wait_sec': os.getenv('REST_RATE_LIMIT_MAX_WAIT_SEC'),
+            'stream_memory_cap_mb': os.getenv('REST_STREAM_MEMORY_CAP_MB'),
+            'fanout_base_urls': os.getenv('REST_FANOUT_BASE_URLS'),
+            'fanout_ignore_fields': os.getenv('REST_FANOUT_IGNORE_FIELDS'),
+            'diff_list_keys': os.getenv('REST_DIFF_LIST_KEYS'),
+            'diff_max_differences': os.getenv('REST_DIFF_MAX_DIFFERENCES')
         },
         'Settings_Graphql': {
             'testdata_file': os.getenv('GRAPHQL_TESTDATA_FILE'),
@@ -27,10 +51,35 @@ def get_configs():
             'signature': os.getenv('GRAPHQL_API_SIGNATURE'),
             'base_url': os.getenv('GRAPHQL_API_BASE_URL'),
             'username': os.getenv('GRAPHQL_USERNAME'),
-            'password': os.getenv('GRAPHQL_PASSWORD')
+            'password': os.getenv('GRAPHQL_PASSWORD'),
+            'endpoint': os.getenv('GRAPHQL_ENDPOINT'),
+            'persisted_queries': os.getenv('GRAPHQL_PERSISTED_QUERIES'),
+            'max_batch_size': os.getenv('GRAPHQL_MAX_BATCH_SIZE')
         },
         'Settings_Common': {
-            'environment': os.getenv('ENVIRONMENT')
+            'environment': os.getenv('ENVIRONMENT'),
+            'profile_spans': os.getenv('PROFILE_SPANS'),
+            'profile_top_n': os.getenv('PROFILE_TOP_N'),
+            'run_deadline': os.getenv('RUN_DEADLINE'),
+            'results_dir': os.getenv('RESULTS_DIR'),
+            'results_body_cap_kb': os.getenv('RESULTS_BODY_CAP_KB'),
+            'run_history_db': os.getenv('RUN_HISTORY_DB'),
+            'run_history_max_age_days': os.getenv('RUN_HISTORY_MAX_AGE_DAYS'),
+            'latency_baseline_runs': os.getenv('LATENCY_BASELINE_RUNS'),
+            'latency_min_baseline_runs': os.getenv('LATENCY_MIN_BASELINE_RUNS'),
+            'latency_mad_threshold': os.getenv('LATENCY_MAD_THRESHOLD'),
+            'latency_min_slowdown': os.getenv('LATENCY_MIN_SLOWDOWN'),
+            'latency_regression_fail': os.getenv('LATENCY_REGRESSION_FAIL'),
+            'artifacts_dir': os.getenv('ARTIFACTS_DIR'),
+            'artifacts_keep_uncompressed': os.getenv('ARTIFACTS_KEEP_UNCOMPRESSED'),
+            'artifacts_max_age_days': os.getenv('ARTIFACTS_MAX_AGE_DAYS'),
+            'artifacts_max_total_mb': os.getenv('ARTIFACTS_MAX_TOTAL_MB'),
+            'coordinator_url': os.getenv('COORDINATOR_URL'),
+            'work_queue_db': os.getenv('WORK_QUEUE_DB'),
+            'queue_lease_sec': os.getenv('QUEUE_LEASE_SEC'),
+            'queue_heartbeat_sec': os.getenv('QUEUE_HEARTBEAT_SEC'),
+            'queue_batch_size': os.getenv('QUEUE_BATCH_SIZE'),
+            'queue_max_attempts': os.getenv('QUEUE_MAX_ATTEMPTS')
         },
     }
 
@@ -0,0 +1,231 @@
+import json
+import logging
+import random
+import threading
+import time
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from test_data.plan_readers import iter_plan_records, get_json_from_record
+from test_data.read_settings_file import get_rest_api_settings
+from api_fixtures.endpoints import RestAPIEndpoints
+from utilities.custom_logger import customlogger
+
+log = customlogger(logging.DEBUG)
+
+
+def sample_from_schema(schema):
+    """
+    Build the smallest JSON value that satisfies the given JSON schema.
+
+    Only the keywords used in the workbook are honoured: 'const', 'enum', 'type',
+    'properties', 'required', 'items', 'minItems', 'minimum', 'minLength' and the
+    first alternative of 'anyOf'/'oneOf'/'allOf'.
+
+    Parameters:
+    - schema (dict): The JSON schema to sample.
+
+    Returns:
+    - any: A value that validates against the schema.
+    """
+    if not isinstance(schema, dict):
+        return None
+    if "const" in schema:
+        return schema["const"]
+    if schema.get("enum"):
+        return schema["enum"][0]
+    for keyword in ("anyOf", "oneOf", "allOf"):
+        if schema.get(keyword):
+            return sample_from_schema(schema[keyword][0])
+
+    schema_type = schema.get("type")
+    if isinstance(schema_type, list):
+        schema_type = schema_type[0] if schema_type else None
+    if schema_type is None:
+        schema_type = "object" if "properties" in schema else "array" if "items" in schema else None
+
+    if schema_type == "object":
+        properties = schema.get("properties", {})
+        return {key: sample_from_schema(sub_schema) for key, sub_schema in properties.items()}
+    if schema_type == "array":
+        item = sample_from_schema(schema.get("items", {}))
+        return [item for _ in range(schema.get("minItems", 0))]
+    if schema_type == "string":
+        return "x" * schema.get("minLength", 0)
+    if schema_type == "integer":
+        return int(schema.get("minimum", 0))
+    if schema_type == "number":
+        return schema.get("minimum", 0)
+    if schema_type == "boolean":
+        return True
+    return None
+
+
+def merge_expected(base, expected):
+    """
+    Deep-merge 'expected' into 'base' so that 'expected' is a subset of the result.
+
+    Parameters:
+    - base (any): The value sampled from the response schema.
+    - expected (any): The expected outcome from the workbook.
+
+    Returns:
+    - any: The merged value.
+    """
+    if isinstance(base, dict) and isinstance(expected, dict):
+        merged = dict(base)
+        for key, value in expected.items():
+            merged[key] = merge_expected(base.get(key), value)
+        return merged
+    return expected
+
+
+def build_routes(records):
+    """
+    Build the mock routes from the steps of the test plan.
+
+    Every row contributes to the route keyed by its request type and api name.
+    When several rows share a route, their expected outcomes and headers are merged
+    in sheet order, so a later row only overrides the keys it specifies.
+    A POST login route issuing a one hour token is added unless the sheet defines one.
+
+    Parameters:
+    - records (iterable of dict): The step records, as yielded by iter_plan_records.
+
+    Returns:
+    - dict: Mapping of (METHOD, api_name) to {"body": ..., "headers": {...}}.
+    """
+    routes = {}
+    for record in records:
+        api_name = record.get("api_name")
+        request_type = record.get("request_type")
+        if api_name is None or request_type is None:
+            continue
+
+        key = (str(request_type).upper(), str(api_name).strip("/"))
+        route = routes.setdefault(key, {"body": None, "headers": {}})
+
+        response_schema = get_json_from_record(record, "response_schema")
+        expected_outcome = get_json_from_record(record, "expected_outcome")
+        expected_header = get_json_from_record(record, "expected_response_header")
+
+        if route["body"] is None:
+            route["body"] = sample_from_schema(response_schema) if response_schema else {}
+        if expected_outcome is not None:
+            route["body"] = merge_expected(route["body"], expected_outcome)
+        if expected_header:
+            route["headers"].update({k: str(v) for k, v in expected_header.items()})
+
+    routes.setdefault(("POST", RestAPIEndpoints.LOGIN), {
+        "body": {"token": "mock-token", "expires_in": 3600},
+        "headers": {},
+    })
+    return routes
+
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    """
+    Request handler serving the routes built from the workbook.
+
+    The server instance carries 'routes', 'latency_ms', 'latency_jitter_ms' and 'error_rate'.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def _handle(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+
+        server = self.server
+        delay_ms = server.latency_ms + random.uniform(0, server.latency_jitter_ms)
+        if delay_ms:
+            time.sleep(delay_ms / 1000)
+
+        path = self.path.split("?", 1)[0].strip("/")
+        route = server.routes.get((self.command, path))
+
+        if route is None:
+            status, body, headers = 404, {"error": f"No mock route for {self.command} /{path}"}, {}
+        elif server.error_rate and random.random() < server.error_rate:
+            status, body, headers = 500, {"error": "Injected mock error"}, {}
+        else:
+            status, body, headers = 200, route["body"], route["headers"]
+
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        for name, value in headers.items():
+            if name.lower() not in ("content-length", "content-type"):
+                self.send_header(name, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = do_HEAD = do_OPTIONS = _handle
+
+    def log_message(self, format, *args):
+        log.debug(f"Mock server: {format % args}")
+
+
+def create_mock_server(records=None, host="127.0.0.1", port=0, latency_ms=0.0, latency_jitter_ms=0.0, error_rate=0.0):
+    """
+    Create a threaded mock HTTP server from the workbook.
+
+    Parameters:
+    - records (iterable of dict, optional): The step records. Streamed from REST_TESTDATA_FILE if not given.
+    - host (str, optional): The interface to bind. Default is '127.0.0.1'.
+    - port (int, optional): The port to bind, 0 picks a free port. Default is 0.
+    - latency_ms (float, optional): Fixed latency injected before every response.
+    - latency_jitter_ms (float, optional): Upper bound of the random latency added on top.
+    - error_rate (float, optional): Fraction of requests answered with a 500 error.
+
+    Returns:
+    - ThreadingHTTPServer: The server, not yet serving.
+    """
+    if records is None:
+        records = iter_plan_records(get_rest_api_settings("TESTDATA_FILE"), sheet_name="testcases")
+
+    server = ThreadingHTTPServer((host, port), MockRequestHandler)
+    server.daemon_threads = True
+    server.routes = build_routes(records)
+    server.latency_ms = latency_ms
+    server.latency_jitter_ms = latency_jitter_ms
+    server.error_rate = error_rate
+    log.info(f"Mock server built with {len(server.routes)} routes on {host}:{server.server_address[1]}")
+    return server
+
+
+def start_mock_server(**kwargs):
+    """
+    Start the mock server in a background thread.
+
+    Accepts the same keyword arguments as create_mock_server.
+
+    Returns:
+    - tuple: (server, base_url). Call server.shutdown() to stop it.
+    """
+    server = create_mock_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock REST backend built from the testcases sheet")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="interface to bind")
+    parser.add_argument("--port", type=int, default=8081, help="port to bind")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="fixed latency per response")
+    parser.add_argument("--latency-jitter-ms", type=float, default=0.0, help="random latency added on top")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+
+    args = parser.parse_args()
+    mock_server = create_mock_server(
+        host=args.host,
+        port=args.port,
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        error_rate=args.error_rate,
+    )
+    print(f"Mock server listening on http://{args.host}:{mock_server.server_address[1]}")
+    print(f"Run the suite with REST_API_BASE_URL=http://{args.host}:{mock_server.server_address[1]}")
+    mock_server.serve_forever()
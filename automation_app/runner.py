@@ -0,0 +1,90 @@
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import time
+
+from utilities import run_artifacts, work_queue
+
+"""
+Runner of distributed runs: joins a run of the work queue and runs its sequences in several
+pytest processes that pull them from the queue.
+
+Started by entrypoint_docker.py --runners for the runners on the coordinator's host. On another
+host or container, set COORDINATOR_URL to the Flask app and share ARTIFACTS_DIR with it, then
+
+    python runner.py --processes 4
+
+waits for distributed runs and joins each one; --once leaves after the first.
+"""
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+TEST_PATHS = {"rest": "tests/test_api/test_rest_api"}
+WAIT_FOR_RUN_SEC = 5
+
+
+def wait_for_run(queue, once):
+    """
+    :return: the oldest open run with tasks left, None with once when there is none
+    """
+    while True:
+        runs = queue.active_runs()
+        if runs:
+            return runs[0]
+        if once:
+            return None
+        time.sleep(WAIT_FOR_RUN_SEC)
+
+
+def start_processes(run, processes, alluredir=None):
+    """
+    Start the pytest processes of this runner for a run, each with its own runner id.
+
+    :return: the Popen objects
+    """
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    run_dir = run_artifacts.create_run(run["run_id"], run["testtype"] or "rest")
+    alluredir = alluredir or os.path.join(run_dir, "allure-results")
+    os.makedirs(alluredir, exist_ok=True)
+    started = []
+    for index in range(processes):
+        runner_id = work_queue.default_runner_id(index)
+        env = dict(os.environ, WORK_QUEUE_RUN_ID=run["run_id"], RUNNER_ID=runner_id, RUN_ID=run["run_id"],
+                   PROFILE_RUN_ID=run["run_id"], LOG_DIR=os.path.join(run_dir, "logs"))
+        if run.get("deadline"):
+            env["RUN_DEADLINE"] = str(run["deadline"])
+        command = [sys.executable, "-m", "pytest", TEST_PATHS[run["testtype"] or "rest"], "-p", "no:cacheprovider",
+                   f"--alluredir={alluredir}"]
+        with open(os.path.join(run_dir, "logs", f"runner-{runner_id}.log"), "a") as output:
+            started.append(subprocess.Popen(command, cwd=script_dir, env=env, stdout=output, stderr=subprocess.STDOUT))
+        logging.info(f"Runner {runner_id} started for run {run['run_id']}.")
+    return started
+
+
+def main(args):
+    queue = work_queue.get_queue()
+    while True:
+        run = queue.get_run(args.run_id) if args.run_id else wait_for_run(queue, args.once)
+        if run is None:
+            logging.info("No distributed run to join.")
+            return
+        processes = start_processes(run, args.processes, args.alluredir)
+        for process in processes:
+            process.wait()
+        logging.info(f"Runners of run {run['run_id']} exited with {[process.returncode for process in processes]}.")
+        if args.run_id or args.once:
+            return
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Runner of distributed runs")
+    parser.add_argument("--run-id", type=str, default=None, help="join this run and leave when it is done")
+    parser.add_argument("--processes", type=int, default=int(os.getenv("RUNNER_PROCESSES", os.cpu_count() or 1)),
+                        help="pytest processes pulling sequences on this host")
+    parser.add_argument("--alluredir", type=str, default=None,
+                        help="allure-results directory, the run's own under ARTIFACTS_DIR by default")
+    parser.add_argument("--once", action="store_true", help="leave after the first run")
+
+    main(parser.parse_args())
@@ -6,8 +6,21 @@ Settings_Rest_api = {}
 Settings_Graphql = {}
 Settings_Common = {}
 
-# Update local variables dynamically
-locals().update(get_configs())
+
+def init_settings():
+    """
+    Load the .env file and fill the settings dictionaries in place.
+
+    Runs once per process on first use instead of at import time, so importing
+    modules that read settings does not parse the .env file. Later calls are no-ops.
+    """
+    if Settings_Common:
+        return
+    configs = get_configs()
+    Settings_Rest_api.update(configs['Settings_Rest_api'])
+    Settings_Graphql.update(configs['Settings_Graphql'])
+    Settings_Common.update(configs['Settings_Common'])
+
 
 # Create a logger class
 class SettingsUpdaterLogger:
@@ -1,4 +1,4 @@
-from test_data.read_excel_api_testdata import get_value_by_attribute, get_value_by_attribute_as_json
+from test_data.read_excel_api_testdata import get_config_index
 import re
 import pandas as pd
 
@@ -20,29 +20,91 @@ def process_config_value(value):
     
     return value
 
-def update_payload_with_config(payload, config_df):
+CONFIG_PLACEHOLDER_PATTERN = re.compile(r'##([A-Za-z_][\w.\-]*)')
+
+def load_config_values(records):
     """
-    Update the payload dictionary by replacing keys starting with '#' with values from the DataFrame.
+    Load the configs sheet into a dictionary, values converted by process_config_value.
 
     Parameters:
-    - payload (dict): The payload dictionary to be updated.
-    - config_df (pandas.DataFrame): The DataFrame containing the configuration data.
+    - records (iterable of dict): Rows with 'attribute'/'value' or 'config_name'/'config_value'.
 
     Returns:
-    - dict: The updated payload dictionary.
+    - dict: The config values keyed by attribute. Empty values are left out.
     """
-    updated_payload = payload.copy()  # Create a copy to avoid modifying the original payload
+    config_values = {}
+    for record in records:
+        name = record.get('attribute', record.get('config_name'))
+        value = process_config_value(record.get('value', record.get('config_value')))
+        if name is not None and value is not None:
+            config_values.setdefault(str(name).strip(), value)
+    return config_values
 
-    for key, value in payload.items():
-        if isinstance(value, str):
-            if value.startswith('##'):
-                attribute_name = value[2:]  # Remove the leading '##'
-                replacement_value = get_value_by_attribute(config_df, attribute_name)
-                processed_replacement_value = process_config_value(replacement_value)
-                if replacement_value is not None:
-                    updated_payload[key] = processed_replacement_value
+def compile_config_template(data):
+    """
+    Compile a payload, header dictionary or URL into a function that replaces '##<key>'
+    placeholders with config values.
+
+    The structure is walked and the placeholder strings are split once; rendering is then a
+    single pass that rebuilds only the containers holding placeholders. A string that is just
+    '##key' takes the config value with its type (e.g. int[5] -> 5), inside a longer string the
+    value is inserted as text. Unknown keys and '##auth' are left for later substitutions.
+
+    Parameters:
+    - data (dict, list or str): The structure to compile.
+
+    Returns:
+    - callable: render(config_values) returning the substituted structure.
+    """
+    compiled = _compile_template(data)
+    if compiled is None:
+        return lambda config_values: data
+    return compiled
+
+def _compile_template(value):
+    # returns None for values without placeholders, so they are reused as they are
+    if isinstance(value, dict):
+        items = [(key, item, _compile_template(item)) for key, item in value.items()]
+        if all(render is None for _, _, render in items):
+            return None
+        return lambda config: {key: item if render is None else render(config) for key, item, render in items}
+    if isinstance(value, list):
+        items = [(item, _compile_template(item)) for item in value]
+        if all(render is None for _, render in items):
+            return None
+        return lambda config: [item if render is None else render(config) for item, render in items]
+    if not isinstance(value, str) or '##' not in value:
+        return None
+
+    parts = CONFIG_PLACEHOLDER_PATTERN.split(value)  # text, key, text, key, ..., text
+    keys = [key for key in parts[1::2] if '##' + key != AUTH_PLACEHOLDER]
+    if not keys:
+        return None
+    if len(parts) == 3 and parts[0] == '' and parts[2] == '':
+        key = parts[1]
+        return lambda config: config.get(key, value)
+
+    def render(config):
+        return ''.join(
+            part if i % 2 == 0 else str(config[part]) if part in config and '##' + part != AUTH_PLACEHOLDER else '##' + part
+            for i, part in enumerate(parts))
+    return render
+
+def update_payload_with_config(payload, config_values):
+    """
+    Replace '##<key>' placeholders at any depth of the payload with config values.
 
-    return updated_payload
+    Parameters:
+    - payload (dict, list or str): The payload, header dictionary or URL to be updated.
+    - config_values (dict or pandas.DataFrame): Config values from load_config_values, or the configs sheet.
+
+    Returns:
+    - dict, list or str: The updated payload. The original is not modified.
+    """
+    if not isinstance(config_values, dict):
+        config_values = load_config_values(
+            {'attribute': name, 'value': value} for name, value in get_config_index(config_values).items())
+    return compile_config_template(payload)(config_values)
 
 def get_value_from_response(path, response):
     """
@@ -191,4 +253,125 @@ def update_payload_with_response(payload, response):
                 if isinstance(item, dict):
                     update_payload_with_prev_response(item, response)
     
-    return payload
\ No newline at end of file
+    return payload
+
+
+AUTH_PLACEHOLDER = '##auth'
+
+def update_with_auth_token(data, token_supplier):
+    """
+    Replace the '##auth' placeholder with a token from the credential provider.
+
+    The placeholder can be a whole value ("##auth") or part of one ("Bearer ##auth"), at any
+    nesting depth of a header or payload dictionary. The token is only requested when the
+    placeholder is present, so sequences without it never trigger a login.
+
+    Parameters:
+    data (dict or list): The headers or payload, possibly containing '##auth'.
+    token_supplier (callable): Returns the current token, e.g. CredentialProvider.get_token.
+
+    Returns:
+    dict or list: The same structure with the placeholder replaced.
+    """
+    token = None
+
+    def replace(value):
+        nonlocal token
+        if isinstance(value, dict):
+            return {key: replace(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [replace(item) for item in value]
+        if isinstance(value, str) and AUTH_PLACEHOLDER in value:
+            if token is None:
+                token = token_supplier()
+            return value.replace(AUTH_PLACEHOLDER, str(token))
+        return value
+
+    if data is None:
+        return None
+    return replace(data)
+
+
+NAMED_RESULT_PREFIX = '$@'
+
+def get_named_result_references(data):
+    """
+    Return the test numbers referenced by '$@<test_number>.<path>' placeholders in data.
+    """
+    references = set()
+
+    def collect(value):
+        if isinstance(value, dict):
+            for item in value.values():
+                collect(item)
+        elif isinstance(value, list):
+            for item in value:
+                collect(item)
+        elif isinstance(value, str) and value.startswith(NAMED_RESULT_PREFIX):
+            references.add(value[len(NAMED_RESULT_PREFIX):].split('.', 1)[0])
+
+    collect(data)
+    return references
+
+def get_response_paths(data, test_number):
+    """
+    Return the response paths of step test_number that placeholders in data may read.
+
+    '$$' and '$#' paths are included wherever they appear, since they refer to whichever step
+    runs before; '$@' paths only when they name test_number. An empty path stands for the
+    whole response.
+    """
+    paths = set()
+
+    def collect(value):
+        if isinstance(value, dict):
+            for item in value.values():
+                collect(item)
+        elif isinstance(value, list):
+            for item in value:
+                collect(item)
+        elif isinstance(value, str):
+            if value.startswith(('$$', '$#')):
+                paths.add(value[2:])
+            elif value.startswith(NAMED_RESULT_PREFIX):
+                step, _, path = value[len(NAMED_RESULT_PREFIX):].partition('.')
+                if step == str(test_number):
+                    paths.add(path)
+
+    collect(data)
+    return paths
+
+def update_payload_with_named_results(payload, results):
+    """
+    Replace '$@<test_number>.<path>' values with values from the response of that step.
+
+    Unlike '$$' and '$#', which refer to the previous steps, a named result can come from
+    any earlier step of the flow. Without a path the whole response is used.
+
+    Parameters:
+    payload (dict or list): The payload, possibly containing '$@' placeholders at any depth.
+    results (dict): The response data of finished steps, keyed by test number.
+
+    Returns:
+    dict or list: The same structure with the placeholders replaced.
+
+    Example:
+    --------
+    payload = {'orderId': '$@test01_step_1.order.id'}
+    results = {'test01_step_1': {'order': {'id': 42}}}
+    # update_payload_with_named_results(payload, results) == {'orderId': 42}
+    """
+    def replace(value):
+        if isinstance(value, dict):
+            return {key: replace(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [replace(item) for item in value]
+        if isinstance(value, str) and value.startswith(NAMED_RESULT_PREFIX):
+            step, _, path = value[len(NAMED_RESULT_PREFIX):].partition('.')
+            response = results.get(step)
+            return get_value_from_response(path, response) if path and response is not None else response
+        return value
+
+    if payload is None:
+        return None
+    return replace(payload)
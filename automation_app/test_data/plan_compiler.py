@@ -0,0 +1,316 @@
+import json
+import os
+
+from load_config import ATTACHMENT_PATH
+from test_data.data_update_helpers import AUTH_PLACEHOLDER, CONFIG_PLACEHOLDER_PATTERN, NAMED_RESULT_PREFIX
+from test_data.plan_readers import ROW_KEY
+from test_data.read_excel_api_testdata import get_step_parents, group_step_links, is_blank, parse_depends_on
+from utilities.api_utils.data_driven import get_variable_names
+from utilities.api_utils.step_graph import get_ancestors
+
+"""
+Pre-flight check of a test plan, run once at collection before any request is sent.
+
+compile_plan() reads every step once and collects all the errors it finds, each with its sheet
+row: JSON cells that do not parse, number cells that are not numbers, response schemas that
+are not valid against their metaschema, '##' keys missing from the configs, '$$'/'$#'/'$@'
+references to steps that do not run before the step, use_next/depends_on links to missing
+steps or in a cycle, attachments missing from ATTACHMENT_PATH and data sources that cannot be
+read. The columns of a row's data source count as '##' keys of that row. A '$$' or '$#' path into a
+step with a response_schema is also checked against the objects the schema closes with
+additionalProperties: false.
+"""
+
+JSON_COLUMNS = ("use_creds", "payload", "response_schema", "expected_outcome", "un_expected_outcome",
+                "expected_response_header")
+NUMBER_COLUMNS = ("delay_before_test_sec", "connect_timeout_sec", "read_timeout_sec")
+CONFIG_COLUMNS = ("payload", "use_creds", "base_url", "api_name")
+
+
+class PlanError:
+    """
+    One problem of a plan, at a sheet row and column.
+    """
+
+    def __init__(self, row, test_number, column, message):
+        self.row = row
+        self.test_number = test_number
+        self.column = column
+        self.message = message
+
+    def __str__(self):
+        return f"row {self.row} ({self.test_number}) {self.column}: {self.message}"
+
+
+class PlanCompileError(ValueError):
+    """
+    Raised by check_plan with every error of the plan.
+    """
+
+    def __init__(self, plan_name, errors):
+        self.errors = errors
+        lines = [f"Test plan {plan_name} has {len(errors)} error(s), no request was sent:"]
+        lines += [f"  {error}" for error in errors]
+        super().__init__("\n".join(lines))
+
+
+def _walk_strings(value):
+    if isinstance(value, dict):
+        for item in value.values():
+            yield from _walk_strings(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _walk_strings(item)
+    elif isinstance(value, str):
+        yield value
+
+
+def _parse_json(record, column, errors):
+    value = record.get(column)
+    if not isinstance(value, str):
+        return value
+    try:
+        return json.loads(value)
+    except json.JSONDecodeError as e:
+        errors.append(PlanError(record.get(ROW_KEY), record.get("test_number"), column,
+                                f"invalid JSON at line {e.lineno} column {e.colno}: {e.msg}"))
+        return None
+
+
+def _schema_error(schema):
+    """
+    :return: why the schema is not valid against its metaschema, or None
+    """
+    # jsonschema is slow to import, only plans with a response_schema need it
+    from jsonschema.exceptions import SchemaError
+    from jsonschema.validators import validator_for
+
+    if not isinstance(schema, (dict, bool)):
+        return "must be a JSON object"
+    try:
+        validator_for(schema).check_schema(schema)
+    except SchemaError as e:
+        path = "/".join(str(part) for part in e.absolute_path) or "(root)"
+        return f"invalid schema at {path}: {e.message}"
+    return None
+
+
+def _path_outside_schema(schema, path):
+    """
+    :return: the first part of a response path that the schema rules out, or None when the
+             path may exist. Lists are walked like get_value_from_response does.
+    """
+    for part in (path.split(".") if path else []):
+        if not isinstance(schema, dict):
+            return None
+        if schema.get("type") == "array" or "items" in schema:
+            schema = schema.get("items")
+            continue
+        properties = schema.get("properties")
+        if properties is None:
+            return None
+        if part in properties:
+            schema = properties[part]
+        elif schema.get("additionalProperties") is False:
+            return part
+        else:
+            return None
+    return None
+
+
+def _find_cycles(edges):
+    """
+    :param edges: {step: [next steps]}, in plan order
+    :return: one list of steps per cycle found, each closed by its first step
+    """
+    cycles, done = [], set()
+    for start in edges:
+        if start in done:
+            continue
+        path, on_path = [start], {start: 0}
+        stack = [iter(edges[start])]
+        while stack:
+            for child in stack[-1]:
+                if child in on_path:
+                    cycles.append(path[on_path[child]:] + [child])
+                elif child not in done and child in edges:
+                    on_path[child] = len(path)
+                    path.append(child)
+                    stack.append(iter(edges[child]))
+                    break
+            else:
+                stack.pop()
+                step = path.pop()
+                del on_path[step]
+                done.add(step)
+    return cycles
+
+
+def _check_links(records, errors):
+    first_rows = {}
+    for record in records:
+        test_number = record.get("test_number")
+        if is_blank(test_number):
+            errors.append(PlanError(record.get(ROW_KEY), None, "test_number", "is empty"))
+        elif str(test_number) in first_rows:
+            errors.append(PlanError(record.get(ROW_KEY), test_number, "test_number",
+                                    f"duplicate of row {first_rows[str(test_number)][ROW_KEY]}, this row never runs"))
+        else:
+            first_rows[str(test_number)] = record
+
+    for test_number, record in first_rows.items():
+        use_next = record.get("use_next")
+        if not is_blank(use_next) and str(use_next) not in first_rows:
+            errors.append(PlanError(record[ROW_KEY], test_number, "use_next", f"step '{use_next}' does not exist"))
+        for parent in parse_depends_on(record.get("depends_on")):
+            if parent not in first_rows:
+                errors.append(PlanError(record[ROW_KEY], test_number, "depends_on", f"step '{parent}' does not exist"))
+
+    # a step's parents are the steps it depends on and the step whose use_next points at it
+    steps = [{"test_number": test_number, "use_next": None if is_blank(record.get("use_next")) else str(record["use_next"]),
+              "depends_on": record.get("depends_on")} for test_number, record in first_rows.items()]
+    parents = get_step_parents(steps)
+    children = {step: [] for step in parents}
+    for step, step_parents in parents.items():
+        for parent in step_parents:
+            if parent in children:
+                children[parent].append(step)
+    for cycle in _find_cycles(children):
+        errors.append(PlanError(first_rows[cycle[0]][ROW_KEY], cycle[0], "use_next/depends_on",
+                                f"cycle {' -> '.join(cycle)}"))
+    return first_rows, parents
+
+
+def _check_references(record, payload, position, sequence, parents, graph, schemas, errors):
+    """
+    '$$' reads the step before (the first parent in a graph flow), '$#' the one before that,
+    '$@<step>' any step that runs earlier (an ancestor in a graph flow).
+    """
+    test_number = str(record.get("test_number"))
+    if graph:
+        parent = parents[test_number][0] if parents.get(test_number) else None
+        grandparent = parents[parent][0] if parent and parents.get(parent) else None
+        earlier = get_ancestors(test_number, parents)
+    else:
+        parent = sequence[position - 1] if position >= 1 else None
+        grandparent = sequence[position - 2] if position >= 2 else None
+        earlier = set(sequence[:position])
+
+    for value in _walk_strings(payload):
+        if value.startswith("$$") or value.startswith("$#"):
+            source = parent if value.startswith("$$") else grandparent
+            if source is None:
+                errors.append(PlanError(record.get(ROW_KEY), test_number, "payload",
+                                        f"'{value}' refers to a step that does not run before this one"))
+                continue
+            part = _path_outside_schema(schemas.get(source), value[2:].lstrip("."))
+            if part is not None:
+                errors.append(PlanError(record.get(ROW_KEY), test_number, "payload",
+                                        f"'{value}': '{part}' is not in the response_schema of step {source}"))
+        elif value.startswith(NAMED_RESULT_PREFIX):
+            step = value[len(NAMED_RESULT_PREFIX):].split(".", 1)[0]
+            if step not in schemas:
+                errors.append(PlanError(record.get(ROW_KEY), test_number, "payload",
+                                        f"'{value}' refers to step '{step}', which does not exist"))
+            elif step not in earlier:
+                errors.append(PlanError(record.get(ROW_KEY), test_number, "payload",
+                                        f"'{value}' refers to step '{step}', which does not run before this one"))
+
+
+def compile_plan(plan, config_values=None, attachment_path=ATTACHMENT_PATH):
+    """
+    Check every step of a plan.
+
+    :param plan: PlanIndex of the plan
+    :param config_values: values of the '##' placeholders, see read_config_values
+    :param attachment_path: directory of the attachment files
+    :return: list of PlanError, in row order; empty for a plan that can run
+    """
+    config_values = config_values or {}
+    errors = []
+    records = list(plan.iter_records())
+    first_rows, parents = _check_links(records, errors)
+
+    schemas, payloads, schema_errors, data_sources = {}, {}, {}, {}
+    for record in records:
+        values = {column: _parse_json(record, column, errors) for column in JSON_COLUMNS}
+        for column in NUMBER_COLUMNS:
+            value = record.get(column)
+            if value is not None and not isinstance(value, bool):
+                try:
+                    float(value)
+                except (TypeError, ValueError):
+                    errors.append(PlanError(record.get(ROW_KEY), record.get("test_number"), column,
+                                            f"'{value}' is not a number"))
+        if values["response_schema"] is not None:
+            # a metaschema check takes about a millisecond, plans repeat the same schema on many rows
+            cell = record.get("response_schema")
+            key = cell if isinstance(cell, str) else json.dumps(cell, sort_keys=True, default=str)
+            if key not in schema_errors:
+                schema_errors[key] = _schema_error(values["response_schema"])
+            if schema_errors[key]:
+                errors.append(PlanError(record.get(ROW_KEY), record.get("test_number"), "response_schema",
+                                        schema_errors[key]))
+
+        variables = set()
+        data_source = record.get("data_source")
+        if not is_blank(data_source):
+            if data_source not in data_sources:
+                try:
+                    data_sources[data_source] = (get_variable_names(data_source, plan.test_data_file_name), None)
+                except (OSError, ValueError, KeyError) as e:
+                    data_sources[data_source] = (set(), f"'{data_source}' cannot be read: {e}")
+            variables, error = data_sources[data_source]
+            if error is None and not variables:
+                error = f"'{data_source}' has no rows"
+            if error:
+                errors.append(PlanError(record.get(ROW_KEY), record.get("test_number"), "data_source", error))
+                variables = None  # the '##' keys of the row cannot be checked without its data source
+            if not is_blank(record.get("attachment")):
+                errors.append(PlanError(record.get(ROW_KEY), record.get("test_number"), "data_source",
+                                        "attachments are not sent by data-driven steps"))
+
+        for column in CONFIG_COLUMNS if variables is not None else ():
+            value = values[column] if column in values else record.get(column)
+            for text in _walk_strings(value):
+                for key in CONFIG_PLACEHOLDER_PATTERN.findall(text):
+                    if "##" + key != AUTH_PLACEHOLDER and key not in config_values and key not in variables:
+                        errors.append(PlanError(record.get(ROW_KEY), record.get("test_number"), column,
+                                                f"'##{key}' is not in the configs"))
+
+        attachment = record.get("attachment")
+        if not is_blank(attachment) and not os.path.isfile(os.path.join(attachment_path, str(attachment))):
+            errors.append(PlanError(record.get(ROW_KEY), record.get("test_number"), "attachment",
+                                    f"'{attachment}' not found in {attachment_path}"))
+        if record is first_rows.get(str(record.get("test_number"))):
+            schemas[str(record["test_number"])] = values["response_schema"]
+            payloads[str(record["test_number"])] = values["payload"]
+
+    for sequence in group_step_links((step, first_rows[step].get("use_next"), first_rows[step].get("depends_on"))
+                                     for step in first_rows):
+        # like run_flow: a flow with a depends_on cell runs as a graph
+        graph = any(not is_blank(first_rows[step].get("depends_on")) for step in sequence)
+        for position, step in enumerate(sequence):
+            if payloads.get(step) is not None:
+                _check_references(first_rows[step], payloads[step], position, sequence, parents, graph, schemas,
+                                  errors)
+
+    return sorted(errors, key=lambda error: (error.row or 0))
+
+
+def check_plan(plan, config_values=None, mode="strict", logger=None):
+    """
+    Compile a plan and act on its errors: 'strict' raises PlanCompileError with all of them,
+    'warn' only logs them, 'off' skips the check.
+
+    :return: the errors found
+    :raises PlanCompileError: in strict mode, when the plan has errors
+    """
+    if mode == "off":
+        return []
+    errors = compile_plan(plan, config_values)
+    if errors and mode == "strict":
+        raise PlanCompileError(plan.test_data_file_name, errors)
+    if errors and logger is not None:
+        logger.warning(str(PlanCompileError(plan.test_data_file_name, errors)))
+    return errors
@@ -0,0 +1,279 @@
+import csv
+import fcntl
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+
+from load_config import ROOT_DIR, TEST_DATA_PATH
+from test_data.data_update_helpers import load_config_values
+from test_data.read_excel_api_testdata import group_step_links, is_blank
+
+"""
+Streaming readers for test plans, chosen by the extension of the plan file.
+
+Every reader yields one record (a dict of column -> value) per step with blank cells as None
+and the sheet/file row of the step under '_row'. PlanIndex spools the records once into an
+SQLite file shared by all workers, so a process only holds the step links for grouping and
+the records of the steps it is running, never the whole plan.
+"""
+
+ROW_KEY = "_row"
+PLAN_SPOOL_DIR = os.path.join(ROOT_DIR, ".state", "plans")
+
+
+def _clean(record, row):
+    record = {key: (None if is_blank(value) else value) for key, value in record.items() if key is not None}
+    record[ROW_KEY] = row
+    return record
+
+
+def read_xlsx_records(path, sheet_name):
+    """
+    Stream a worksheet with openpyxl in read-only mode, the first row holds the column names.
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook[sheet_name].iter_rows(values_only=True)
+        header = next(rows, None) or ()
+        columns = [None if is_blank(name) else str(name).strip() for name in header]
+        for row_number, values in enumerate(rows, start=2):
+            if all(is_blank(value) for value in values):
+                continue
+            yield _clean(dict(zip(columns, values)), row_number)
+    finally:
+        workbook.close()
+
+
+def read_csv_records(path, sheet_name=None):
+    """
+    Stream a CSV file, the first line holds the column names. '_row' is the line number.
+    """
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        for record in reader:
+            if all(is_blank(value) for value in record.values()):
+                continue
+            yield _clean(record, reader.line_num)
+
+
+def read_jsonl_records(path, sheet_name=None):
+    """
+    Stream a JSON Lines file with one step object per line. JSON columns may hold objects
+    instead of JSON strings.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{os.path.basename(path)} line {line_number} is not valid JSON: {e}")
+            yield _clean(record, line_number)
+
+
+def read_parquet_records(path, sheet_name=None, batch_size=1024):
+    """
+    Stream a Parquet file batch by batch. Needs the optional pyarrow package.
+    """
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Reading .parquet test plans needs pyarrow: pip install pyarrow")
+
+    row_number = 0
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+        for record in batch.to_pylist():
+            row_number += 1
+            yield _clean(record, row_number)
+
+
+PLAN_READERS = {
+    ".xlsx": read_xlsx_records,
+    ".csv": read_csv_records,
+    ".jsonl": read_jsonl_records,
+    ".parquet": read_parquet_records,
+}
+
+
+def resolve_plan_path(test_data_file_name):
+    # relative names live in test_data/, like read_excel_file_data
+    return os.path.join(TEST_DATA_PATH, test_data_file_name)
+
+
+def iter_plan_records(test_data_file_name, sheet_name="testcases"):
+    """
+    Yield the step records of a plan file. The sheet name only applies to .xlsx plans.
+
+    :param test_data_file_name: plan file name, relative to test_data/ or absolute
+    :param sheet_name: worksheet holding the steps of an .xlsx plan
+    :return: generator of record dictionaries
+    """
+    path = resolve_plan_path(test_data_file_name)
+    extension = os.path.splitext(path)[1].lower()
+    reader = PLAN_READERS.get(extension)
+    if reader is None:
+        raise ValueError(f"No plan reader for '{extension}' files, use one of {sorted(PLAN_READERS)}")
+    return reader(path, sheet_name)
+
+
+def read_config_values(test_data_file_name, config_file_name=None, sheet_name="configs"):
+    """
+    Load the config values used by '##' placeholders.
+
+    They come from config_file_name when given (an .xlsx 'configs' sheet, or a CSV/JSONL/Parquet
+    file with attribute/value or config_name/config_value columns), otherwise from the 'configs'
+    sheet of an .xlsx plan. Other plans without a config file have no config values.
+
+    :return: {attribute: value} with values converted by process_config_value
+    """
+    file_name = config_file_name or test_data_file_name
+    if os.path.splitext(file_name)[1].lower() != ".xlsx":
+        return load_config_values(iter_plan_records(file_name)) if config_file_name else {}
+    try:
+        return load_config_values(iter_plan_records(file_name, sheet_name=sheet_name))
+    except KeyError:
+        # openpyxl raises KeyError for a missing worksheet, the configs sheet is optional
+        return {}
+
+
+def get_json_from_record(record, attribute):
+    """
+    Return a JSON column of a record as a Python object, or None if the cell is empty.
+
+    :raises ValueError: if the cell is not valid JSON
+    """
+    value = record.get(attribute)
+    if value is None or not isinstance(value, str):
+        return value
+    try:
+        return json.loads(value)
+    except json.JSONDecodeError:
+        raise ValueError(f"'{attribute}' of step {record.get('test_number')} (row {record.get(ROW_KEY)}) is not a valid JSON.")
+
+
+def get_number_from_record(record, attribute):
+    """
+    Return a numeric column of a record as a float, or None if the cell is empty.
+    CSV plans hold numbers as text.
+
+    :raises ValueError: if the cell is not a number
+    """
+    value = record.get(attribute)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{attribute}' of step {record.get('test_number')} (row {record.get(ROW_KEY)}) is not a number.")
+
+
+def get_flag_from_record(record, attribute):
+    """
+    Return a yes/no column of a record as a bool. Empty cells are False; TRUE/yes/1 (any case),
+    or a boolean cell, are True.
+    """
+    value = record.get(attribute)
+    if value is None or isinstance(value, bool):
+        return bool(value)
+    return str(value).strip().lower() in ("true", "yes", "1", "1.0")
+
+
+class PlanIndex:
+    """
+    Random access to the steps of a plan without a DataFrame.
+
+    The records are spooled into .state/plans/<plan>-<sheet>-<digest>.sqlite, where the digest
+    covers the plan path, size and modification time. The first process to need a version of
+    the plan builds the spool under a file lock; the other xdist workers reuse it.
+    """
+
+    def __init__(self, test_data_file_name, sheet_name="testcases"):
+        self.test_data_file_name = test_data_file_name
+        self.sheet_name = sheet_name
+        self.path = resolve_plan_path(test_data_file_name)
+        stat = os.stat(self.path)
+        digest = hashlib.sha1(f"{os.path.abspath(self.path)}|{stat.st_size}|{stat.st_mtime_ns}".encode()).hexdigest()[:12]
+        self.spool_prefix = os.path.join(PLAN_SPOOL_DIR, f"{os.path.basename(self.path)}-{sheet_name}-")
+        self.spool_path = f"{self.spool_prefix}{digest}.sqlite"
+        self._connection = None
+
+    @contextmanager
+    def _build_lock(self):
+        os.makedirs(PLAN_SPOOL_DIR, exist_ok=True)
+        with open(f"{self.spool_prefix}lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _build(self):
+        tmp_path = f"{self.spool_path}.{os.getpid()}.tmp"
+        connection = sqlite3.connect(tmp_path)
+        try:
+            connection.execute(
+                "CREATE TABLE steps (row INTEGER, test_number TEXT, use_next TEXT, depends_on TEXT, record TEXT)")
+            connection.executemany(
+                "INSERT INTO steps VALUES (?, ?, ?, ?, ?)",
+                ((record[ROW_KEY], _text(record.get("test_number")), _text(record.get("use_next")),
+                  _text(record.get("depends_on")), json.dumps(record, default=str))
+                 for record in iter_plan_records(self.test_data_file_name, self.sheet_name)))
+            connection.execute("CREATE INDEX steps_test_number ON steps (test_number, row)")
+            connection.commit()
+        finally:
+            connection.close()
+        os.replace(tmp_path, self.spool_path)
+        # older spools of the same plan are stale now
+        for old_spool in glob.glob(f"{glob.escape(self.spool_prefix)}*.sqlite"):
+            if old_spool != self.spool_path:
+                os.remove(old_spool)
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            if not os.path.exists(self.spool_path):
+                with self._build_lock():
+                    if not os.path.exists(self.spool_path):
+                        self._build()
+            self._connection = sqlite3.connect(f"file:{self.spool_path}?mode=ro", uri=True)
+        return self._connection
+
+    def get_step(self, test_number):
+        """
+        :return: the record of the first row with this test number, or None
+        """
+        row = self.connection.execute(
+            "SELECT record FROM steps WHERE test_number = ? ORDER BY row LIMIT 1", (str(test_number),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def iter_links(self):
+        """
+        Yield (test_number, use_next, depends_on) for every step in plan order.
+        """
+        yield from self.connection.execute("SELECT test_number, use_next, depends_on FROM steps ORDER BY row")
+
+    def iter_records(self):
+        """
+        Yield the record of every row in plan order, duplicates of a test number included.
+        """
+        for (record,) in self.connection.execute("SELECT record FROM steps ORDER BY row"):
+            yield json.loads(record)
+
+    def group_sequences(self):
+        """
+        Group the steps into sequences/flows, see group_step_links.
+        """
+        return group_step_links(self.iter_links())
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM steps").fetchone()[0]
+
+
+def _text(value):
+    return None if value is None else str(value)
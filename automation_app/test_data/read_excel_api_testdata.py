@@ -92,11 +92,82 @@ def get_attribute_from_excel(df: pd.DataFrame, testcase_number: int, attribute:
         raise ValueError(f"Attribute '{attribute}' not found for test case number {testcase_number}.")
 
 
+def is_blank(value) -> bool:
+    """
+    True for an empty cell, whatever the plan format made of it: None, NaN or blank text.
+    """
+    if value is None:
+        return True
+    if isinstance(value, float):
+        return value != value
+    if isinstance(value, str):
+        return not value.strip()
+    return False
+
+
+def get_optional_attribute_from_excel(df: pd.DataFrame, testcase_number: int, attribute: str):
+    """
+    Return the attribute for a given test case number, or None if the sheet has no such column.
+    Used for columns that older workbooks do not have.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        The DataFrame containing the test cases.
+
+    testcase_number : int
+        The test case number (0-indexed) to retrieve the attribute for.
+
+    attribute : str
+        The optional attribute to retrieve, e.g. 'connect_timeout_sec'.
+
+    Returns:
+    --------
+    The value of the attribute, or None if the column is missing or the cell is empty.
+    """
+    if attribute not in df.columns:
+        return None
+    value = get_attribute_from_excel(df, testcase_number, attribute)
+    return None if pd.isna(value) else value
+
+
+CONFIG_COLUMNS = (('attribute', 'value'), ('config_name', 'config_value'))
+
+_config_index = (None, {})
+
+
+def get_config_index(df):
+    """
+    Index a configs sheet as {attribute: value}, the first row of an attribute wins.
+    The sheet may use 'attribute'/'value' or 'config_name'/'config_value' columns.
+    The index of the last DataFrame is kept, so repeated lookups do not rescan it.
+
+    Parameters:
+    - df (pandas.DataFrame): The configs sheet.
+
+    Returns:
+    - dict: The raw cell values keyed by attribute.
+    """
+    global _config_index
+    if _config_index[0] is df:
+        return _config_index[1]
+    index = {}
+    for name_column, value_column in CONFIG_COLUMNS:
+        if name_column in df.columns and value_column in df.columns:
+            for name, value in zip(df[name_column], df[value_column]):
+                if not is_blank(name):
+                    index.setdefault(str(name).strip(), value)
+            break
+    _config_index = (df, index)
+    return index
+
+
 def get_value_by_attribute(df, attribute):
     """
     Get the value corresponding to a specified attribute from the DataFrame.
     The excel sheet needs to be in the format - 
     attribute     value
+    (or config_name     config_value)
 
     Parameters:
     - df (pandas.DataFrame): The DataFrame containing the data.
@@ -105,72 +176,166 @@ def get_value_by_attribute(df, attribute):
     Returns:
     - str: The value corresponding to the specified attribute.
     """
-    try:
-        value = df.loc[df['attribute'] == attribute, 'value'].values[0]
-        return value
-    except IndexError:
-        return None
+    return get_config_index(df).get(attribute)
 
 def get_value_by_attribute_as_json(df, attribute):
     """
     Get the value corresponding to a specified attribute from the DataFrame as json.
     The excel sheet needs to be in the format - 
     attribute     value
+    (or config_name     config_value)
 
     Parameters:
     - df (pandas.DataFrame): The DataFrame containing the data.
     - attribute (str): The attribute for which to get the value.
 
     Returns:
-    - str: The value corresponding to the specified attribute.
+    - dict: The parsed value corresponding to the specified attribute.
     """
-    try:
-        value = df.loc[df['attribute'] == attribute, 'value'].values[0]
-        # Convert the JSON string to a dictionary
-        if pd.isna(value):
-            return None
-        attribute_dict = json.loads(value)
-        return value
-    except IndexError:
+    value = get_config_index(df).get(attribute)
+    if is_blank(value):
         return None
+    try:
+        return json.loads(value)
     except json.JSONDecodeError:
-        raise ValueError(f"Schema in Schema_config is not a valid JSON.")
+        raise ValueError(f"Config '{attribute}' is not a valid JSON.")
     
 
-def group_test_sequences(df):
+def parse_depends_on(value):
     """
-    Groups test cases into sequences based on the 'use_next' column in the DataFrame.
+    Split a 'depends_on' cell ("test01_step_1, test01_step_2") into a list of test numbers.
+    """
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return []
+    return [step.strip() for step in str(value).split(",") if step.strip()]
+
+
+def get_step_parents(steps):
+    """
+    Build the dependency graph of a set of steps.
+
+    A step depends on every step listed in its 'depends_on' cell and on the step whose
+    'use_next' points at it, so plain 'use_next' chains are graphs too.
 
     Args:
-        df (pd.DataFrame): The DataFrame containing test cases with 'test_number' and 'use_next' columns.
+        steps (List[Dict]): Steps with 'test_number', 'use_next' and optionally 'depends_on'.
+
+    Returns:
+        Dict[str, List[str]]: The parents of every step, 'depends_on' entries first.
+    """
+    parents = {step['test_number']: parse_depends_on(step.get('depends_on')) for step in steps}
+    for step in steps:
+        next_step = step.get('use_next')
+        if next_step in parents and step['test_number'] not in parents[next_step]:
+            parents[next_step].append(step['test_number'])
+    return parents
+
+
+def group_test_flows(steps):
+    """
+    Groups test cases into flows: the connected components of the 'use_next' and
+    'depends_on' links. Steps of a flow are listed in dependency order, ties in sheet order.
+
+    Args:
+        steps (List[Dict]): Steps with 'test_number', 'use_next' and 'depends_on', in sheet order.
+
+    Returns:
+        List[List[str]]: A list of flows, where each flow is a list of test numbers.
+    """
+    parents = get_step_parents(steps)
+    order = {}
+    for index, step in enumerate(steps):
+        order.setdefault(step['test_number'], index)
+
+    # union-find over the dependency edges
+    root = {step: step for step in parents}
+
+    def find(step):
+        while root[step] != step:
+            root[step] = root[root[step]]
+            step = root[step]
+        return step
+
+    for step, step_parents in parents.items():
+        for parent in step_parents:
+            if parent in root:
+                root[find(step)] = find(parent)
+
+    flows = {}
+    for step in sorted(parents, key=order.get):
+        flows.setdefault(find(step), []).append(step)
+
+    sequences = []
+    for members in flows.values():
+        # Kahn's algorithm, a cycle leaves its steps at the end in sheet order
+        pending = {step: {p for p in parents[step] if p in order} for step in members}
+        sequence = []
+        while pending:
+            ready = [step for step in members if step in pending and not pending[step]]
+            if not ready:
+                sequence.extend(step for step in members if step in pending)
+                break
+            for step in ready:
+                del pending[step]
+                sequence.append(step)
+            for step_parents in pending.values():
+                step_parents.difference_update(ready)
+        sequences.append(sequence)
+    return sequences
+
+
+def group_step_links(links):
+    """
+    Groups steps into sequences from their links alone, so plans read as a stream need no DataFrame.
+
+    Args:
+        links (Iterable[Tuple]): (test_number, use_next, depends_on) per step, in sheet order.
 
     Returns:
         List[List[str]]: A list of sequences, where each sequence is a list of test numbers.
     """
+    links = [(test_number, None if is_blank(use_next) else use_next, None if is_blank(depends_on) else depends_on)
+             for test_number, use_next, depends_on in links]
+    if any(depends_on is not None for _, _, depends_on in links):
+        return group_test_flows([{'test_number': test_number, 'use_next': use_next, 'depends_on': depends_on}
+                                 for test_number, use_next, depends_on in links])
+
+    next_steps = {}  # the first row of a test number decides its 'use_next'
+    for test_number, use_next, _ in links:
+        next_steps.setdefault(test_number, use_next)
+
     sequences = []  # List to store sequences of test cases
     visited = set()  # Set to track already processed test numbers
-    
-    for index, row in df.iterrows():
+
+    for test_number, _, _ in links:
         # Skip the test case if it's already been processed
-        if row['test_number'] in visited:
+        if test_number in visited:
             continue
-        
+
         sequence = []  # Initialize a new sequence
-        current_step = row['test_number']  # Start with the current test_number
-        
-        # Traverse through the sequence based on 'use_next'
-        while current_step:
+        current_step = test_number  # Start with the current test_number
+
+        # Traverse through the sequence based on 'use_next', a loop back ends the sequence
+        while current_step and current_step not in sequence:
             sequence.append(current_step)  # Add the current test number to the sequence
             visited.add(current_step)  # Mark the current test number as visited
+            current_step = next_steps.get(current_step)
 
-            # Retrieve the next step from the 'use_next' column
-            next_row = df[df['test_number'] == current_step]
-            current_step = (
-                next_row['use_next'].values[0] 
-                if not next_row.empty and pd.notna(next_row['use_next'].values[0]) 
-                else None
-            )
-        
         sequences.append(sequence)  # Add the completed sequence to the list of sequences
-    
-    return sequences  # Return all grouped sequences
\ No newline at end of file
+
+    return sequences  # Return all grouped sequences
+
+
+def group_test_sequences(df):
+    """
+    Groups test cases into sequences based on the 'use_next' column in the DataFrame.
+    Sheets with a filled 'depends_on' column are grouped into flows by group_test_flows.
+
+    Args:
+        df (pd.DataFrame): The DataFrame containing test cases with 'test_number' and 'use_next' columns.
+
+    Returns:
+        List[List[str]]: A list of sequences, where each sequence is a list of test numbers.
+    """
+    depends_on = df['depends_on'] if 'depends_on' in df.columns else [None] * len(df)
+    return group_step_links(zip(df['test_number'], df['use_next'], depends_on))
@@ -1,6 +1,90 @@
+import os
 import pytest
 from test_data.config.config import SettingsUpdaterLogger
 from utilities.custom_logger import CustomLogger
+from utilities import latency_regression, profiler, reporting, run_history, work_queue
+from utilities.api_utils.resilience import reset_run_state
+from utilities.api_utils.timeouts import remaining_time
+
+latency_regressions = []  # found by the controller at the end of the run
+# set by runner.py, the session runs the sequences the work queue of this run hands out
+queue_run_id = os.getenv("WORK_QUEUE_RUN_ID")
+
+
+def pytest_configure(config):
+    """Reads the profiler and results sink settings in every process; the controller also picks the run ids
+    for its workers and resets the circuit breakers and retry budget shared by them. A queue runner joins a
+    run that its coordinator started, so it leaves the shared state alone."""
+    profiler.configure()
+    reporting.configure()
+    if not hasattr(config, "workerinput"):
+        profiler.start_run()
+        reporting.start_run()
+        if not queue_run_id:
+            reset_run_state()
+
+
+def pytest_runtestloop(session):
+    """Runs the items in the order the work queue hands them out when the session is a queue runner."""
+    if queue_run_id and not session.config.option.collectonly:
+        return work_queue.run_pulled(session, queue_run_id)
+    return None
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_protocol(item, nextitem):
+    """Buffers the results sink records of the test in the process that runs it and writes them when it ends."""
+    reporting.start_test(item.nodeid)
+    yield
+    reporting.finish_test()
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    outcome = yield
+    reporting.record_phase(outcome.get_result())
+
+
+def pytest_sessionfinish(session):
+    """Workers dump their spans, the controller merges them into one trace and logs the top-N table,
+    then stores the run in the run history and checks it for latency regressions. Queue runners only dump
+    their spans, their coordinator does the rest once all of them are done. A --collect-only session or one
+    that collected no test is not a run, it is kept out of the history."""
+    global latency_regressions
+    if hasattr(session.config, "workerinput") or queue_run_id:
+        profiler.dump_process_spans()
+    else:
+        profiler.finish_run(CustomLogger.log)
+        if session.config.option.collectonly or session.testscollected == 0:
+            return
+        try:
+            run_history.ingest_run(reporting.get_run_id())
+            latency_regressions = latency_regression.detect_regressions(reporting.get_run_id())
+        except Exception as e:
+            # the history is a by-product, it never fails the run
+            CustomLogger.log.error(f"Could not store run {reporting.get_run_id()} in the run history: {e}")
+        if latency_regressions and latency_regression.regression_fails_run():
+            session.exitstatus = pytest.ExitCode.TESTS_FAILED
+
+
+def pytest_terminal_summary(terminalreporter):
+    """Lists the latency regressions of the run below the test summary."""
+    if not latency_regressions:
+        return
+    terminalreporter.section("latency regressions")
+    for regression in latency_regressions:
+        terminalreporter.write_line(
+            f"{regression['method']} {regression['endpoint']}: median {regression['median_latency_ms']:.1f} ms, "
+            f"baseline {regression['baseline_median_ms']:.1f} ms (x{regression['ratio']:.2f})")
+    terminalreporter.write_line(f"{len(latency_regressions)} latency regression(s)")
+
+def pytest_runtest_setup(item):
+    """Once the run deadline has passed, stops the session and skips the remaining tests so the
+    report can still be generated in time."""
+    remaining = remaining_time()
+    if remaining is not None and remaining <= 0:
+        item.session.shouldstop = "Run deadline reached"
+        pytest.skip("Run deadline reached, test not started")
 
 @pytest.fixture(scope="session", autouse=True)
 def loading_configs():
@@ -25,4 +109,4 @@ def loading_configs():
     SettingsUpdaterLogger.log.info("Loading Configs, session level")
 
     yield
-    CustomLogger.log.info("Running session level tearDown")
\ No newline at end of file
+    CustomLogger.log.info("Running session level tearDown")
@@ -1,49 +1,78 @@
+import copy
 import json
 import logging
 import time
 import pytest
 import allure
-import pandas as pd
 
 from api_fixtures.rest_api import RestApi
-from test_data.data_update_helpers import update_payload_with_prev_response, update_payload_with_response
-from utilities.data_verification_utils import is_subset, verify_schema
-from test_data.read_testdata_file import read_excel_file_data
+from test_data.data_update_helpers import update_payload_with_prev_response, update_payload_with_response, update_with_auth_token, \
+    update_payload_with_named_results, get_named_result_references, compile_config_template, get_response_paths
+from utilities.data_verification_utils import diff_json, format_differences, get_diff_options, is_subset, verify_schema
+from test_data.plan_compiler import PlanCompileError, check_plan
+from test_data.plan_readers import PlanIndex, get_flag_from_record, get_json_from_record, get_number_from_record, \
+    read_config_values
 from test_data.read_settings_file import get_rest_api_settings
-from test_data.read_excel_api_testdata import group_test_sequences, get_attribute_from_excel, get_attribute_as_json_from_excel
+from test_data.read_excel_api_testdata import get_step_parents, is_blank
 from utilities.api_utils.api_test_status import ApiTestStatus
+from utilities.api_utils.auth_provider import get_credential_provider
+from utilities.api_utils.data_driven import format_summary, run_data_driven_step
+from utilities.api_utils.fanout import compare_environments, format_comparison, get_environments, get_ignore_fields, \
+    run_environments
+from utilities.api_utils.step_graph import get_ancestors, run_step_graph
+from utilities.api_utils.streaming import build_selector
 from utilities.custom_logger import CustomLogger, customlogger
+from utilities.profiler import span
+from utilities import reporting
 
 test_data_file = get_rest_api_settings("TESTDATA_FILE")
 
-# finding total number of cases
+# the plan is streamed into a shared index, steps are loaded one at a time when their test runs
 testcases_sheet_name = "testcases"
-df = read_excel_file_data(test_data_file, sheet_name=testcases_sheet_name)
+plan = PlanIndex(test_data_file, sheet_name=testcases_sheet_name)
+# '##key' values from the configs sheet (or REST_CONFIG_FILE), loaded once
+config_values = read_config_values(test_data_file, get_rest_api_settings("config_file"))
+CONFIG_FIELDS = ("payload", "use_creds", "base_url", "api_name")
 
-# Helper function to extract test data row as a dictionary
-def extract_test_data(n):
+# every cell, reference and link of the plan is checked once here, a broken plan fails collection
+plan_error = None
+with span("plan_check", "collection"):
+    try:
+        check_plan(plan, config_values, get_rest_api_settings("plan_check") or "strict", CustomLogger.log)
+    except PlanCompileError as e:
+        plan_error = str(e)
+if plan_error:
+    pytest.fail(plan_error, pytrace=False)
+
+# Helper function to extract a step record as the test data dictionary
+def extract_test_data(record):
     return {
-        "test_number": get_attribute_from_excel(df, n, "test_number"),
-        "use_next": get_attribute_from_excel(df, n, "use_next"),
-        "delay_before_test_sec": get_attribute_from_excel(df, n, "delay_before_test_sec"),
-        "use_creds": get_attribute_as_json_from_excel(df, n, "use_creds"),
-        "base_url": get_attribute_from_excel(df, n, "base_url"),
-        "api_name": get_attribute_from_excel(df, n, "api_name"),
-        "request_type": get_attribute_from_excel(df, n, "request_type"),
-        "test_group_name": get_attribute_from_excel(df, n, "test_group_name"),
-        "test_step_name": get_attribute_from_excel(df, n, "test_step_name"),
-        "payload": get_attribute_as_json_from_excel(df, n, "payload"),
-        "attachment": get_attribute_from_excel(df, n, "attachment"),
-        "test_type": get_attribute_from_excel(df, n, "test_type"),
-        "response_schema": get_attribute_as_json_from_excel(df, n, "response_schema"),
-        "expected_outcome": get_attribute_as_json_from_excel(df, n, "expected_outcome"),
-        "un_expected_outcome": get_attribute_as_json_from_excel(df, n, "un_expected_outcome"),
-        "expected_response_header": get_attribute_as_json_from_excel(df, n, "expected_response_header"),
-        "skip_test": get_attribute_from_excel(df, n, "skip_test")
+        "test_number": record.get("test_number"),
+        "use_next": record.get("use_next"),
+        "delay_before_test_sec": get_number_from_record(record, "delay_before_test_sec"),
+        "use_creds": get_json_from_record(record, "use_creds"),
+        "base_url": record.get("base_url"),
+        "api_name": record.get("api_name"),
+        "request_type": record.get("request_type"),
+        "test_group_name": record.get("test_group_name"),
+        "test_step_name": record.get("test_step_name"),
+        "payload": get_json_from_record(record, "payload"),
+        "attachment": record.get("attachment"),
+        "test_type": record.get("test_type"),
+        "response_schema": get_json_from_record(record, "response_schema"),
+        "expected_outcome": get_json_from_record(record, "expected_outcome"),
+        "un_expected_outcome": get_json_from_record(record, "un_expected_outcome"),
+        "expected_response_header": get_json_from_record(record, "expected_response_header"),
+        "skip_test": record.get("skip_test"),
+        "connect_timeout_sec": get_number_from_record(record, "connect_timeout_sec"),
+        "read_timeout_sec": get_number_from_record(record, "read_timeout_sec"),
+        "depends_on": record.get("depends_on"),
+        "stream_response": get_flag_from_record(record, "stream_response"),
+        "data_source": record.get("data_source")
     }
 
 # Group test cases into sequences and log the total number of sequences
-sequences = group_test_sequences(df)
+sequences = plan.group_sequences()
 CustomLogger.log.info(f"Total test Cases: {len(sequences)}")
 
 
@@ -61,30 +90,43 @@ def generate_test_sequence(request):
     sequence = request.param  # Retrieve the sequence from the request parameter
     test_data = []  # Initialize an empty list to store test data for the sequence
     
-    with allure.step("Generating Testdata:"):
+    with reporting.step("Generating Testdata:"):
         for step in sequence:
             # Log the processing of the current step
             TestExcelTestcases.log.info(f"Processing step: {step}")
             
-            # Check if the step exists in the DataFrame
-            filtered_df = df[df['test_number'] == step]
-            if filtered_df.empty:
-                pytest.fail(f"Step {step} not found in the Excel sheet")  # Fail the test if the step is missing
+            # Check if the step exists in the plan
+            with span("fixture.lookup_step", "fixture"):
+                record = plan.get_step(step)
+                if record is None:
+                    pytest.fail(f"Step {step} not found in the test plan")  # Fail the test if the step is missing
 
-            # Get the row index for the current step
-            row_index = df[df['test_number'] == step].index[0]
-            
             # Extract test data for the current step
-            data = extract_test_data(row_index)
+            with span("fixture.extract_test_data", "fixture"):
+                data = extract_test_data(record)
+
+            # a data-driven step keeps its placeholders, every variant fills them before the configs
+            if config_values and is_blank(data['data_source']):
+                with span("fixture.config_substitution", "fixture"):
+                    for field in CONFIG_FIELDS:
+                        data[field] = compile_config_template(data[field])(config_values)
             
             # Skip the test if the 'skip_test' flag is set
             if data['skip_test'] == "skip":
-                allure.dynamic.title(f"{step} :: {data['test_group_name']} - Skip flag true")
+                reporting.set_title(f"{step} :: {data['test_group_name']} - Skip flag true")
                 pytest.skip(f"Step {step} skipped due to skip flag.")
 
             # Log the extracted test data as an Allure step
             allure.step(f"Extracted Test Data for Step: {step}")
             test_data.append(data)  # Append the extracted test data to the list
+
+    # streamed responses only keep what the checks and the placeholders of the sequence read
+    payloads = [data['payload'] for data in test_data]
+    for data in test_data:
+        if data['stream_response'] and is_blank(data['attachment']):
+            data['stream_selector'] = build_selector(
+                [data['expected_outcome'], data['un_expected_outcome']],
+                get_response_paths(payloads, data['test_number']))
     
     return test_data  # Return the list of test data for the sequence
 
@@ -97,121 +139,295 @@ class TestExcelTestcases:
         self.api_test_status = ApiTestStatus()                   
         
 
-    def perform_api_request(self, test_data, auth_header, base_url):
+    def perform_api_request(self, test_data, auth_header, base_url, rest_api=None, api_test_status=None, observations=None):
         """
         Performs the API request, validates the result, and returns response according to the test data provided.
+        Steps running in parallel pass their own rest_api and api_test_status.
+        With observations (a fan-out run), the status code, latency and data of the step are stored in it.
         """
-        with allure.step(f"Running Test: {test_data['test_step_name']}"):
+        rest_api = rest_api or self.rest_api
+        api_test_status = api_test_status or self.api_test_status
+        if not is_blank(test_data['data_source']):
+            return self.perform_data_driven_request(test_data, auth_header, base_url, api_test_status, observations)
+        with reporting.step(f"Running Test: {test_data['test_step_name']}"):
             self.log.info(f"::: test -> {test_data['test_step_name']}")
             self.log.info(f"auth_header = {auth_header}")
 
-            if not pd.isna(test_data['delay_before_test_sec']):
+            if not is_blank(test_data['delay_before_test_sec']):
                 int_delay = int(round(test_data['delay_before_test_sec']))
                 self.log.info(f"Waiting for -> {int_delay}")
-                time.sleep(int_delay)
+                with span("delay_before_test", "wait"):
+                    time.sleep(int_delay)
             
-            if not pd.isna(test_data['attachment']):
-                response = self.rest_api.upload_attachment_api_request(
-                                base_url=base_url,
-                                endpoint=test_data['api_name'],
-                                method=test_data['request_type'],
-                                header=auth_header,
-                                request_body=test_data['payload'],
-                                attachment_name=test_data['attachment']
-                            )
-                
-            else: 
-                response = self.rest_api.perform_api_request(
-                                base_url=base_url,
-                                endpoint=test_data['api_name'],
-                                method=test_data['request_type'],
-                                header=auth_header,
-                                request_body=test_data['payload']
-                            )
-
-            # Response schema test
-            if pd.notna(test_data['response_schema']):
-                response_schema_comparision_result = verify_schema(response.data, test_data['response_schema'])
-                if not response_schema_comparision_result:
-                    allure.attach(json.dumps(test_data['response_schema'], indent=4), name="Expected Response Schema", attachment_type=allure.attachment_type.JSON)
-                self.api_test_status.soft_assert_true(
+            timeout = (test_data['connect_timeout_sec'], test_data['read_timeout_sec'])
+            request_start = time.perf_counter()
+            with span("rest_api.request", "request"):
+                if not is_blank(test_data['attachment']):
+                    response = rest_api.upload_attachment_api_request(
+                                    base_url=base_url,
+                                    endpoint=test_data['api_name'],
+                                    method=test_data['request_type'],
+                                    header=auth_header,
+                                    request_body=test_data['payload'],
+                                    attachment_name=test_data['attachment'],
+                                    timeout=timeout
+                                )
+                    
+                else: 
+                    response = rest_api.perform_api_request(
+                                    base_url=base_url,
+                                    endpoint=test_data['api_name'],
+                                    method=test_data['request_type'],
+                                    header=auth_header,
+                                    request_body=test_data['payload'],
+                                    timeout=timeout,
+                                    stream_selector=test_data.get('stream_selector')
+                                )
+
+            if observations is not None:
+                observations[test_data['test_number']] = {
+                    "status_code": response.status_code if response is not None else None,
+                    "latency_ms": (time.perf_counter() - request_start) * 1000,
+                    "data": response.data if response is not None else None,
+                }
+
+            if response is None:
+                pytest.fail(f"No response for step {test_data['test_number']}: {rest_api.last_error}", pytrace=False)
+
+            # Response schema test, a streamed response only holds fragments so it is not validated
+            if not is_blank(test_data['response_schema']) and test_data.get('stream_selector') is not None:
+                reporting.attach("", name="Schema validation skipped for the streamed response", attachment_type=allure.attachment_type.TEXT)
+            elif not is_blank(test_data['response_schema']):
+                with span("check.schema_validation"):
+                    response_schema_comparision_result = verify_schema(response.data, test_data['response_schema'])
+                api_test_status.soft_assert_true(
                     response_schema_comparision_result,
                     "The response adheres to the expected schema",
                     "Schema Validation Check"
                 )
 
             # Expected outcome test
-            if pd.notna(test_data['expected_outcome']):
-                expected_outcome_is_subset_result = is_subset(response.data, test_data['expected_outcome'])
+            if not is_blank(test_data['expected_outcome']):
+                with span("check.expected_outcome"):
+                    expected_outcome_is_subset_result = is_subset(response.data, test_data['expected_outcome'])
                 if not expected_outcome_is_subset_result:
-                    allure.attach(json.dumps(test_data['expected_outcome'], indent=4), name="Expected Outcome", attachment_type=allure.attachment_type.JSON)
-                self.api_test_status.soft_assert_true(
+                    # only the paths that differ, the response body is attached with the request
+                    with span("check.expected_outcome_diff"):
+                        differences = diff_json(test_data['expected_outcome'], response.data, subset=True, **get_diff_options())
+                    reporting.attach(format_differences(differences), name="Expected Outcome Differences", attachment_type=allure.attachment_type.TEXT)
+                api_test_status.soft_assert_true(
                     expected_outcome_is_subset_result,
                     "The response values align with the expected outcome",
                     "Validation of expected response values"
                 )
 
             # Unexpected outcome test
-            if pd.notna(test_data['un_expected_outcome']):
-                un_expected_outcome_is_subset_result = not is_subset(response.data, test_data['un_expected_outcome'])
+            if not is_blank(test_data['un_expected_outcome']):
+                with span("check.un_expected_outcome"):
+                    un_expected_outcome_is_subset_result = not is_subset(response.data, test_data['un_expected_outcome'])
                 if un_expected_outcome_is_subset_result:
-                    allure.attach(json.dumps(test_data['un_expected_outcome'], indent=4), name="Unexpected Outcome", attachment_type=allure.attachment_type.JSON)
-                self.api_test_status.soft_assert_true(
+                    reporting.attach(json.dumps(test_data['un_expected_outcome'], indent=4), name="Unexpected Outcome", attachment_type=allure.attachment_type.JSON)
+                api_test_status.soft_assert_true(
                     un_expected_outcome_is_subset_result,
                     "The response does not include unexpected values",
                     "Validation against unexpected outcomes"
                 )
             
             # Expected response header test
-            if pd.notna(test_data['expected_response_header']):
+            if not is_blank(test_data['expected_response_header']):
                 try:
                     response_headers = dict(response.headers)
                 except json.JSONDecodeError as e:
                     pytest.fail(f"Failed to response headers: {e}", pytrace=False)
-                allure.attach(json.dumps(response_headers, indent=4), name="Actual Response Headers", attachment_type=allure.attachment_type.JSON)
-                expected_response_header_is_subset_result = is_subset(response_headers, test_data['expected_response_header'])
+                reporting.attach(json.dumps(response_headers, indent=4), name="Actual Response Headers", attachment_type=allure.attachment_type.JSON)
+                with span("check.expected_response_header"):
+                    expected_response_header_is_subset_result = is_subset(response_headers, test_data['expected_response_header'])
                 if not expected_response_header_is_subset_result:
-                    allure.attach(json.dumps(test_data['expected_response_header'], indent=4), name="Expected Response Header", attachment_type=allure.attachment_type.JSON)
-                self.api_test_status.soft_assert_true(
+                    reporting.attach(json.dumps(test_data['expected_response_header'], indent=4), name="Expected Response Header", attachment_type=allure.attachment_type.JSON)
+                api_test_status.soft_assert_true(
                     expected_response_header_is_subset_result,
                     "The response header values align with the expected response headers",
                     "Validation of expected response header"
                 )
 
-            self.api_test_status.assert_final(test_data['test_group_name'])
+            api_test_status.assert_final(test_data['test_group_name'])
             return response.data
 
-    @pytest.mark.parametrize("generate_test_sequence", group_test_sequences(df), indirect=True)
-    def test_exceltestcases(self, generate_test_sequence):
+    def perform_data_driven_request(self, test_data, auth_header, base_url, api_test_status, observations=None):
         """
-        Tests Excel Test cases APIs according to the Excel sheet.
+        Runs a step once per variant of its data_source, concurrently, and checks every variant.
+        The step gets one summary, the failure detail of each failed variant and one checkpoint.
+        Returns the response data of the first variant.
+        """
+        with reporting.step(f"Running Test: {test_data['test_step_name']} ({test_data['data_source']})"):
+            if not is_blank(test_data['delay_before_test_sec']):
+                with span("delay_before_test", "wait"):
+                    time.sleep(int(round(test_data['delay_before_test_sec'])))
 
-        This test runs through a sequence of API requests defined in an Excel sheet.
-        Each sequence represents a series of dependent API calls, where the payload
-        for each step may depend on the response from the previous step.
+            with span("data_driven", "request"):
+                summary = run_data_driven_step(test_data, auth_header, base_url, config_values, test_data_file)
+
+            if observations is not None:
+                observations[test_data['test_number']] = {
+                    "status_code": summary['first_status_code'],
+                    "latency_ms": summary['latency_ms']['p50'],
+                    "data": summary['first_response'],
+                }
+
+            reporting.attach(format_summary(summary, test_data['data_source']), name="Data-Driven Summary",
+                             attachment_type=allure.attachment_type.TEXT)
+            if summary['failures']:
+                reporting.attach(json.dumps(summary['failures'], indent=4, default=str), name="Data-Driven Failures",
+                                 attachment_type=allure.attachment_type.JSON)
+            api_test_status.soft_assert_true(
+                summary['total'] > 0 and summary['failed'] == 0,
+                f"{summary['passed']} of {summary['total']} variants passed",
+                "Validation of data-driven variants"
+            )
+            api_test_status.assert_final(test_data['test_group_name'])
+            return summary['first_response']
+
+    def run_flow_graph(self, sequence_data, auth_header, base_url, observations=None, credentials=None):
+        """
+        Runs a flow as a dependency graph. A step starts once all the steps it depends on
+        (its 'depends_on' cell and the step whose 'use_next' points at it) have passed.
+        '$$' and '$#' refer to the first parent and its first parent, '$@<test_number>.<path>'
+        to any ancestor. A failed step stops its descendants, other branches carry on.
+        """
+        steps = {step_data['test_number']: step_data for step_data in sequence_data}
+        parents = get_step_parents(sequence_data)
+        credentials = credentials or get_credential_provider()
+
+        def run_step(step, results):
+            step_data = steps[step]
+            unknown = get_named_result_references(step_data['payload']) - get_ancestors(step, parents)
+            if unknown:
+                pytest.fail(f"Step {step} uses '$@' results of {sorted(unknown)}, which it does not depend on", pytrace=False)
+
+            parent = parents[step][0] if parents[step] else None
+            grandparent = parents[parent][0] if parent and parents[parent] else None
+            with span("placeholder_substitution"):
+                payload = update_with_auth_token(step_data['payload'], credentials.get_token)
+                payload = update_payload_with_named_results(payload, results)
+                if payload is not None:
+                    payload = update_payload_with_response(payload=payload, response=results.get(grandparent, {}))
+                    payload = update_payload_with_prev_response(payload=payload, response=results.get(parent, {}))
+            step_data['payload'] = payload
+            return self.perform_api_request(step_data, auth_header, base_url,
+                                            rest_api=RestApi(), api_test_status=ApiTestStatus(),
+                                            observations=observations)
+
+        with span("step_graph", "request"):
+            _, failures, not_run = run_step_graph(list(steps), parents, run_step)
+
+        if failures or not_run:
+            # assert_final fails with the group name, which only the first step carries
+            summary = [f"{step}: {'verification failed' if isinstance(error, AssertionError) else error}"
+                       for step, error in failures.items()]
+            if not_run:
+                summary.append(f"not run: {', '.join(not_run)}")
+            reporting.attach("\n".join(summary), name="Flow Summary", attachment_type=allure.attachment_type.TEXT)
+            pytest.fail(f"Flow {sequence_data[0]['test_group_name']} failed - " + "; ".join(summary), pytrace=False)
+
+    def run_linear_flow(self, sequence_data, auth_header, base_url, rest_api=None, api_test_status=None, observations=None,
+                        credentials=None):
+        """
+        Runs the steps of a flow one after the other, each step's payload can use the responses
+        of the steps before it.
         """
-        sequence_data = generate_test_sequence  # Retrieve test sequence data from the fixture
         response = {}  # Initialize an empty dictionary to store the response from each API call 
         response_previous = {} # Initialize an empty dictionary to store the response from Previous API call
-        auth_header = sequence_data[0]['use_creds']
-        
-        allure.dynamic.title(f"{sequence_data[0]['test_group_name']}")
-        base_url = sequence_data[0]['base_url'] # since base url needs to be entered only at first test 
-
+        results = {}  # response data of every finished step, for '$@' placeholders
+        credentials = credentials or get_credential_provider()
         # Iterate over each step in the test sequence
         for step_data in sequence_data:
             # Update the current step's payload with data from the previous API response
-            step_data['payload'] = update_payload_with_response(
-                payload=step_data['payload'],
-                response=response_previous)
-            step_data['payload'] = update_payload_with_prev_response(
-                payload=step_data['payload'],
-                response=response)
+            with span("placeholder_substitution"):
+                step_data['payload'] = update_with_auth_token(step_data['payload'], credentials.get_token)
+                step_data['payload'] = update_payload_with_named_results(step_data['payload'], results)
+                step_data['payload'] = update_payload_with_response(
+                    payload=step_data['payload'],
+                    response=response_previous)
+                step_data['payload'] = update_payload_with_prev_response(
+                    payload=step_data['payload'],
+                    response=response)
             
             response_previous = response
             # Perform the API request for the current step and store the response
-            response = self.perform_api_request(step_data, auth_header, base_url)
+            response = self.perform_api_request(step_data, auth_header, base_url, rest_api=rest_api,
+                                                api_test_status=api_test_status, observations=observations)
+            results[step_data['test_number']] = response
             self.log.info(f"api name is {step_data['api_name']}")
+
+    def run_flow(self, sequence_data, auth_header, base_url, rest_api=None, api_test_status=None, observations=None,
+                 credentials=None):
+        # Flows with a depends_on column run as a dependency graph, independent branches in parallel
+        # credentials replace '##auth' in the payloads, the provider of REST_API_BASE_URL when None
+        if any(step_data['depends_on'] is not None for step_data in sequence_data):
+            self.run_flow_graph(sequence_data, auth_header, base_url, observations=observations, credentials=credentials)
+        else:
+            self.run_linear_flow(sequence_data, auth_header, base_url, rest_api=rest_api,
+                                 api_test_status=api_test_status, observations=observations, credentials=credentials)
+
+    def run_fanout(self, sequence_data, environments):
+        """
+        Runs the flow in every environment at once and attaches a step by step comparison
+        (status codes, latency, body differences) with the first environment.
+        The base_url cell of a flow, when filled, is used in every environment.
+        '##auth' is a token of the environment's own login.
+        """
+        def run_environment(name, env_url, observations):
+            with reporting.step(f"Environment: {name}"):
+                credentials = get_credential_provider(env_url)
+                auth_header = update_with_auth_token(sequence_data[0]['use_creds'], credentials.get_token)
+                base_url = sequence_data[0]['base_url'] if not is_blank(sequence_data[0]['base_url']) else env_url
+                # every environment substitutes placeholders into its own copy of the steps
+                self.run_flow(copy.deepcopy(sequence_data), auth_header, base_url, rest_api=RestApi(),
+                              api_test_status=ApiTestStatus(), observations=observations, credentials=credentials)
+
+        with span("fanout", "request"):
+            outcomes = run_environments(environments, run_environment)
+
+        steps = [step_data['test_number'] for step_data in sequence_data]
+        comparison = compare_environments(steps, outcomes, get_ignore_fields())
+        reporting.attach(format_comparison(comparison, list(environments)), name="Environment Comparison",
+                         attachment_type=allure.attachment_type.TEXT)
+        reporting.attach(json.dumps(comparison, indent=4, default=str), name="Environment Comparison Details",
+                         attachment_type=allure.attachment_type.JSON)
+
+        failed = {name: error for name, (_, error) in outcomes.items() if error is not None}
+        if failed:
+            pytest.fail(f"Flow {sequence_data[0]['test_group_name']} failed in " +
+                        "; ".join(f"{name}: {error}" for name, error in failed.items()), pytrace=False)
+
+    @pytest.mark.parametrize("generate_test_sequence", sequences, indirect=True)
+    def test_exceltestcases(self, generate_test_sequence):
+        """
+        Tests Excel Test cases APIs according to the Excel sheet.
+
+        This test runs through a sequence of API requests defined in an Excel sheet.
+        Each sequence represents a series of dependent API calls, where the payload
+        for each step may depend on the response from the previous step.
+        """
+        sequence_data = generate_test_sequence  # Retrieve test sequence data from the fixture
+        
+        reporting.set_title(f"{sequence_data[0]['test_group_name']}")
+
+        # REST_FANOUT_BASE_URLS runs the flow against every environment at once and compares them
+        environments = get_environments()
+        if environments:
+            self.run_fanout(sequence_data, environments)
+            self.log.info(f"<------Test {sequence_data[0]['test_group_name']} Complete --------->")
+            return
+
+        # '##auth' in use_creds is replaced with the shared, cached login token
+        auth_header = update_with_auth_token(sequence_data[0]['use_creds'], get_credential_provider().get_token)
+
+        base_url = sequence_data[0]['base_url'] # since base url needs to be entered only at first test 
+        if is_blank(base_url):
+            base_url = "use_env_url" # empty cell, fall back to the url from .env
+
+        self.run_flow(sequence_data, auth_header, base_url)
             
         # Log a message indicating the test sequence is complete
-        self.log.info(f"<------Test {sequence_data[0]['test_group_name']} Complete --------->")
\ No newline at end of file
+        self.log.info(f"<------Test {sequence_data[0]['test_group_name']} Complete --------->")
@@ -0,0 +1,230 @@
+import json
+import logging
+import time
+import pytest
+import allure
+
+from api_fixtures.graphql_api import GraphqlApi
+from test_data.data_update_helpers import update_payload_with_prev_response, update_payload_with_response, update_with_auth_token, \
+    compile_config_template
+from test_data.plan_readers import read_config_values
+from utilities.data_verification_utils import is_subset, verify_schema
+from test_data.read_testdata_file import read_excel_file_data
+from test_data.read_settings_file import get_graphql_settings
+from test_data.read_excel_api_testdata import group_test_sequences, get_attribute_from_excel, get_attribute_as_json_from_excel, \
+    is_blank
+from utilities.api_utils.api_test_status import ApiTestStatus
+from utilities.api_utils.auth_provider import get_credential_provider
+from utilities.custom_logger import CustomLogger, customlogger
+from utilities.profiler import span
+from utilities import reporting
+
+test_data_file = get_graphql_settings("TESTDATA_FILE")
+
+# finding total number of cases
+testcases_sheet_name = "graphql"
+df = read_excel_file_data(test_data_file, sheet_name=testcases_sheet_name)
+# '##key' values from the configs sheet, loaded once
+config_values = read_config_values(test_data_file)
+CONFIG_FIELDS = ("variables", "use_creds", "base_url")
+
+# Helper function to extract test data row as a dictionary
+def extract_test_data(n):
+    return {
+        "test_number": get_attribute_from_excel(df, n, "test_number"),
+        "use_next": get_attribute_from_excel(df, n, "use_next"),
+        "delay_before_test_sec": get_attribute_from_excel(df, n, "delay_before_test_sec"),
+        "use_creds": get_attribute_as_json_from_excel(df, n, "use_creds"),
+        "base_url": get_attribute_from_excel(df, n, "base_url"),
+        "operation_name": get_attribute_from_excel(df, n, "operation_name"),
+        "query": get_attribute_from_excel(df, n, "query"),
+        "variables": get_attribute_as_json_from_excel(df, n, "variables"),
+        "test_group_name": get_attribute_from_excel(df, n, "test_group_name"),
+        "test_step_name": get_attribute_from_excel(df, n, "test_step_name"),
+        "test_type": get_attribute_from_excel(df, n, "test_type"),
+        "response_schema": get_attribute_as_json_from_excel(df, n, "response_schema"),
+        "expected_outcome": get_attribute_as_json_from_excel(df, n, "expected_outcome"),
+        "un_expected_outcome": get_attribute_as_json_from_excel(df, n, "un_expected_outcome"),
+        "skip_test": get_attribute_from_excel(df, n, "skip_test")
+    }
+
+# Group test cases into sequences and log the total number of sequences
+sequences = group_test_sequences(df)
+CustomLogger.log.info(f"Total GraphQL test Cases: {len(sequences)}")
+
+
+def plan_batches(sequence_data, max_batch_size):
+    """
+    Split a sequence into batches that can each be sent as one HTTP request.
+
+    A step starts a new batch when its variables use a '$$'/'$#' placeholder (it needs
+    the response of an earlier step), when it has a delay, or when the batch is full.
+
+    Args:
+        sequence_data (List[Dict]): The steps of the sequence.
+        max_batch_size (int): Maximum number of operations per request.
+
+    Returns:
+        List[List[Dict]]: The steps grouped into batches, in order.
+    """
+    batches = []
+    for step_data in sequence_data:
+        variables_text = json.dumps(step_data['variables']) if step_data['variables'] else ""
+        needs_previous = "$$" in variables_text or "$#" in variables_text
+        has_delay = not is_blank(step_data['delay_before_test_sec'])
+        if not batches or needs_previous or has_delay or len(batches[-1]) >= max_batch_size:
+            batches.append([])
+        batches[-1].append(step_data)
+    return batches
+
+
+@pytest.fixture
+def generate_graphql_sequence(request):
+    """
+    Pytest fixture to generate test data for a given GraphQL test sequence.
+
+    Args:
+        request: The pytest request object containing the sequence as a parameter.
+
+    Returns:
+        List[Dict]: A list of dictionaries containing the test data for each step in the sequence.
+    """
+    sequence = request.param
+    test_data = []
+
+    with reporting.step("Generating Testdata:"):
+        for step in sequence:
+            TestGraphqlTestcases.log.info(f"Processing step: {step}")
+
+            with span("fixture.lookup_step", "fixture"):
+                filtered_df = df[df['test_number'] == step]
+                if filtered_df.empty:
+                    pytest.fail(f"Step {step} not found in the Excel sheet")
+                row_index = filtered_df.index[0]
+
+            with span("fixture.extract_test_data", "fixture"):
+                data = extract_test_data(row_index)
+
+            if config_values:
+                with span("fixture.config_substitution", "fixture"):
+                    for field in CONFIG_FIELDS:
+                        data[field] = compile_config_template(data[field])(config_values)
+
+            if data['skip_test'] == "skip":
+                reporting.set_title(f"{step} :: {data['test_group_name']} - Skip flag true")
+                pytest.skip(f"Step {step} skipped due to skip flag.")
+
+            test_data.append(data)
+
+    return test_data
+
+class TestGraphqlTestcases:
+    log = customlogger(logging.DEBUG)
+
+    @pytest.fixture(autouse=True)
+    def class_setup(self, request):
+        self.graphql_api = GraphqlApi()
+        self.api_test_status = ApiTestStatus()
+
+    def verify_result(self, test_data, result):
+        """
+        Validates the result of one GraphQL operation against the test data.
+        """
+        with reporting.step(f"Verifying: {test_data['test_step_name']}"):
+            self.log.info(f"::: test -> {test_data['test_step_name']}")
+            if result is None:
+                pytest.fail(f"No response for step {test_data['test_number']}: {self.graphql_api.last_error}", pytrace=False)
+
+            if test_data['test_type'] == "positive":
+                self.api_test_status.soft_assert_true(
+                    not result.get("errors"),
+                    "The operation returned no GraphQL errors",
+                    "GraphQL Errors Check"
+                )
+
+            if not is_blank(test_data['response_schema']):
+                with span("check.schema_validation"):
+                    response_schema_comparision_result = verify_schema(result, test_data['response_schema'])
+                if not response_schema_comparision_result:
+                    reporting.attach(json.dumps(test_data['response_schema'], indent=4), name="Expected Response Schema", attachment_type=allure.attachment_type.JSON)
+                self.api_test_status.soft_assert_true(
+                    response_schema_comparision_result,
+                    "The response adheres to the expected schema",
+                    "Schema Validation Check"
+                )
+
+            if not is_blank(test_data['expected_outcome']):
+                with span("check.expected_outcome"):
+                    expected_outcome_is_subset_result = is_subset(result, test_data['expected_outcome'])
+                if not expected_outcome_is_subset_result:
+                    reporting.attach(json.dumps(test_data['expected_outcome'], indent=4), name="Expected Outcome", attachment_type=allure.attachment_type.JSON)
+                self.api_test_status.soft_assert_true(
+                    expected_outcome_is_subset_result,
+                    "The response values align with the expected outcome",
+                    "Validation of expected response values"
+                )
+
+            if not is_blank(test_data['un_expected_outcome']):
+                with span("check.un_expected_outcome"):
+                    un_expected_outcome_is_subset_result = not is_subset(result, test_data['un_expected_outcome'])
+                if un_expected_outcome_is_subset_result:
+                    reporting.attach(json.dumps(test_data['un_expected_outcome'], indent=4), name="Unexpected Outcome", attachment_type=allure.attachment_type.JSON)
+                self.api_test_status.soft_assert_true(
+                    un_expected_outcome_is_subset_result,
+                    "The response does not include unexpected values",
+                    "Validation against unexpected outcomes"
+                )
+
+            self.api_test_status.assert_final(test_data['test_group_name'])
+
+    @pytest.mark.parametrize("generate_graphql_sequence", sequences, indirect=True)
+    def test_graphqltestcases(self, generate_graphql_sequence):
+        """
+        Tests GraphQL cases according to the 'graphql' sheet of the workbook.
+
+        Consecutive steps that do not depend on each other's responses are sent as one
+        batched HTTP request; each operation is then verified in sheet order.
+        """
+        sequence_data = generate_graphql_sequence
+        response = {}
+        response_previous = {}
+        auth_header = update_with_auth_token(sequence_data[0]['use_creds'], get_credential_provider(api="graphql").get_token)
+        if auth_header is not None:
+            auth_header = {"Content-Type": "application/json", **auth_header}
+
+        reporting.set_title(f"{sequence_data[0]['test_group_name']}")
+        base_url = sequence_data[0]['base_url']
+        if is_blank(base_url):
+            base_url = "use_env_url"
+
+        for batch in plan_batches(sequence_data, self.graphql_api.max_batch_size):
+            if not is_blank(batch[0]['delay_before_test_sec']):
+                int_delay = int(round(batch[0]['delay_before_test_sec']))
+                self.log.info(f"Waiting for -> {int_delay}")
+                with span("delay_before_test", "wait"):
+                    time.sleep(int_delay)
+
+            operations = []
+            for step_data in batch:
+                with span("placeholder_substitution"):
+                    variables = step_data['variables'] or {}
+                    variables = update_payload_with_response(payload=variables, response=response_previous)
+                    variables = update_payload_with_prev_response(payload=variables, response=response)
+                operations.append({
+                    "query": step_data['query'],
+                    "variables": variables,
+                    "operation_name": None if is_blank(step_data['operation_name']) else step_data['operation_name'],
+                })
+
+            with reporting.step(f"Sending batch of {len(operations)} operation(s)"):
+                with span("graphql_api.request", "request"):
+                    results = self.graphql_api.perform_graphql_batch(operations, base_url=base_url, header=auth_header)
+            if len(results) != len(batch):
+                pytest.fail(f"{len(results)} result(s) for a batch of {len(batch)} operation(s): "
+                            f"{self.graphql_api.last_error}", pytrace=False)
+
+            for step_data, result in zip(batch, results):
+                self.verify_result(step_data, result)
+                response_previous, response = response, result
+
+        self.log.info(f"<------Test {sequence_data[0]['test_group_name']} Complete --------->")
@@ -0,0 +1,7 @@
+import os
+import tempfile
+
+
+def pytest_configure(config):
+    """The framework modules log to $LOG_DIR/automation.log; the unit tests keep their lines out of logs/."""
+    os.environ["LOG_DIR"] = tempfile.mkdtemp(prefix="unit_tests_logs_")
@@ -0,0 +1,116 @@
+import functools
+import os
+import stat
+import time
+
+import pytest
+
+from utilities import shared_state
+from utilities.api_utils import auth_provider
+from utilities.api_utils.auth_provider import CredentialProvider, get_credential_provider
+
+REST_SETTINGS = {"base_url": "http://rest", "username": "rest-user", "password": "secret",
+                 "auth_refresh_margin_sec": "60", "auth_ttl_sec": "600"}
+GRAPHQL_SETTINGS = {"base_url": "http://graphql/", "username": "graphql-user", "password": "secret"}
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.data
+
+
+class FakeClient:
+    # stands in for Client, answers every login with the next queued response
+    def __init__(self):
+        self.logins = []
+        self.responses = []
+
+    def request(self, method, url, json=None, headers=None):
+        self.logins.append((url, json["username"]))
+        return FakeResponse(self.responses.pop(0) if self.responses else
+                            {"token": f"token{len(self.logins)}", "expires_in": 3600})
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    client = FakeClient()
+    monkeypatch.setattr(auth_provider, "Client", client)
+    monkeypatch.setattr(auth_provider, "SharedJsonStore",
+                        functools.partial(shared_state.SharedJsonStore, state_dir=str(tmp_path)))
+    monkeypatch.setattr(auth_provider, "get_rest_api_settings", REST_SETTINGS.get)
+    monkeypatch.setattr(auth_provider, "get_graphql_settings", GRAPHQL_SETTINGS.get)
+    monkeypatch.setattr(auth_provider, "_providers", {})
+    return client
+
+
+def test_workers_share_one_login(client):
+    first, other_worker = CredentialProvider(), CredentialProvider()
+    assert first.get_token() == "token1"
+    assert first.get_token() == "token1"
+    assert other_worker.get_token() == "token1"
+    assert client.logins == [("http://rest/login", "rest-user")]
+
+
+def test_token_cache_is_readable_by_the_owner_only(client):
+    provider = CredentialProvider()
+    provider.get_token()
+    assert stat.S_IMODE(os.stat(provider.store.path).st_mode) == 0o600
+
+
+def test_token_is_refreshed_before_it_expires(client):
+    # 30 seconds left is inside the 60 second refresh margin
+    client.responses = [{"token": "short", "expires_in": 30}, {"token": "long", "expires_in": 3600}]
+    provider = CredentialProvider()
+    assert provider.get_token() == "short"
+    assert provider.get_token() == "long"
+    assert len(client.logins) == 2
+
+
+def test_expiry_is_a_lifetime_an_epoch_or_the_ttl(client):
+    provider = CredentialProvider()
+    now = time.time()
+    assert provider._expiry_from_response({"expires_in": 100}) == pytest.approx(now + 100, abs=5)
+    assert provider._expiry_from_response({"expires_in": now + 500}) == now + 500
+    assert provider._expiry_from_response({}) == pytest.approx(now + 600, abs=5)
+
+
+def test_invalidate_forces_a_new_login(client):
+    provider = CredentialProvider()
+    provider.get_token()
+    provider.invalidate()
+    assert provider.get_token() == "token2"
+
+
+def test_login_without_token_fails(client):
+    client.responses = [{"access": "x"}]
+    with pytest.raises(ValueError, match="no token at 'token'"):
+        CredentialProvider().get_token()
+
+
+def test_each_api_and_environment_has_its_own_login(client):
+    rest, staging = get_credential_provider(), get_credential_provider("http://staging")
+    graphql = get_credential_provider(api="graphql")
+    assert get_credential_provider() is rest
+    assert len({rest.store.path, staging.store.path, graphql.store.path}) == 3
+    for provider in (rest, staging, graphql):
+        provider.get_token()
+    assert client.logins == [("http://rest/login", "rest-user"), ("http://staging/login", "rest-user"),
+                             ("http://graphql/login", "graphql-user")]
+    assert os.path.basename(graphql.store.path).startswith("graphql_auth_token-")
+
+
+def test_failed_transaction_leaves_the_document_unchanged(tmp_path):
+    store = shared_state.SharedJsonStore("state", state_dir=str(tmp_path))
+    with store.transaction() as state:
+        state["a"] = 1
+    with pytest.raises(RuntimeError):
+        with store.transaction() as state:
+            state["a"] = 2
+            raise RuntimeError("boom")
+    assert store.read() == {"a": 1}
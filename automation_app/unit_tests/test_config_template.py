@@ -0,0 +1,52 @@
+import copy
+
+import pandas as pd
+
+from test_data.data_update_helpers import compile_config_template, load_config_values, process_config_value, \
+    update_payload_with_config
+
+CONFIG = {"user": "bob", "count": 5, "flag": True}
+
+
+def test_whole_string_keeps_the_type_inline_becomes_text():
+    render = compile_config_template({"count": "##count", "flag": "##flag", "path": "users/##user/items/##count"})
+    assert render(CONFIG) == {"count": 5, "flag": True, "path": "users/bob/items/5"}
+
+
+def test_placeholders_at_any_depth():
+    data = {"a": [{"b": {"c": ["##user", "x-##count"]}}], "d": "##user"}
+    assert compile_config_template(data)(CONFIG) == {"a": [{"b": {"c": ["bob", "x-5"]}}], "d": "bob"}
+
+
+def test_unknown_keys_and_auth_are_left_for_later():
+    render = compile_config_template({"a": "##missing", "b": "Bearer ##auth", "c": "##auth", "d": "##user/##missing"})
+    assert render(dict(CONFIG, auth="not this")) == {"a": "##missing", "b": "Bearer ##auth", "c": "##auth",
+                                                      "d": "bob/##missing"}
+
+
+def test_structures_without_placeholders_are_reused():
+    untouched = {"x": [1, 2], "y": {"z": "plain ## text"}}
+    data = {"untouched": untouched, "user": "##user"}
+    original = copy.deepcopy(data)
+    rendered = compile_config_template(data)(CONFIG)
+    assert rendered["untouched"] is untouched
+    assert data == original
+    assert compile_config_template(untouched)(CONFIG) is untouched
+
+
+def test_compiled_template_renders_other_configs():
+    render = compile_config_template("users/##user")
+    assert [render({"user": name}) for name in ("a", "b")] == ["users/a", "users/b"]
+
+
+def test_config_values_are_converted_first_row_wins():
+    assert [process_config_value(value) for value in ("int[7]", "num[0042]", "str[9]", "TRUE", "false", "x", None)] == \
+        [7, "0042", "9", True, False, "x", None]
+    records = [{"attribute": "a", "value": "int[1]"}, {"attribute": "a", "value": "2"},
+               {"config_name": "b", "config_value": "x"}, {"attribute": "c", "value": None}]
+    assert load_config_values(records) == {"a": 1, "b": "x"}
+
+
+def test_configs_sheet_as_a_dataframe():
+    sheet = pd.DataFrame({"attribute": ["user", "count"], "value": ["alice", "int[2]"]})
+    assert update_payload_with_config({"u": "##user", "n": ["##count"]}, sheet) == {"u": "alice", "n": [2]}
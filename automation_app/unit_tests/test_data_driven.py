@@ -0,0 +1,120 @@
+import threading
+
+import pytest
+
+from utilities.api_utils import data_driven
+
+SETTINGS = {"base_url": "http://env", "data_driven_concurrency": "4"}
+
+
+class FakeResponse:
+    def __init__(self, status_code, data):
+        self.status_code = status_code
+        self.headers = {"Content-Type": "application/json"}
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    """
+    Echoes the payload back; ids in failing get a 500 with another id, ids in broken raise.
+    """
+    requests = []
+    lock = threading.Lock()
+    failing, broken = set(), set()
+
+    def request(method, url, json=None, headers=None, timeout=None):
+        with lock:
+            requests.append({"method": method, "url": url, "json": json, "headers": headers})
+        if json["id"] in broken:
+            raise ConnectionError("connection refused")
+        if json["id"] in failing:
+            return FakeResponse(500, {"id": -1})
+        return FakeResponse(200, json)
+
+    monkeypatch.setattr(data_driven.Client, "request", staticmethod(request))
+    monkeypatch.setattr(data_driven, "get_rest_api_settings", SETTINGS.get)
+    monkeypatch.setattr(data_driven, "_pool", None)
+    yield requests, failing, broken
+    if data_driven._pool is not None:
+        data_driven._pool.shutdown()
+
+
+def write_source(tmp_path, count):
+    path = tmp_path / "users.csv"
+    path.write_text("id,name\n" + "".join(f"int[{number}],user{number}\n" for number in range(count)),
+                    encoding="utf-8")
+    return str(path)
+
+
+def step(data_source, **fields):
+    test_data = {"test_number": "s1", "request_type": "POST", "data_source": data_source,
+                 "connect_timeout_sec": 1, "read_timeout_sec": 1, "api_name": "users/##name",
+                 "payload": {"id": "##id", "name": "##name", "token": "##token"},
+                 "expected_outcome": {"id": "##id"}, "un_expected_outcome": None,
+                 "expected_response_header": None, "response_schema": None}
+    test_data.update(fields)
+    return test_data
+
+
+def run(test_data, base_url="use_env_url", config_values=None):
+    return data_driven.run_data_driven_step(test_data, {"Authorization": "##token"}, base_url,
+                                            config_values or {"token": "t", "id": "config"}, "plan.csv")
+
+
+def test_variants_are_counted_and_only_failures_kept(tmp_path, sent):
+    requests, failing, broken = sent
+    failing.update({3, 7})
+    broken.add(5)
+    summary = run(step(write_source(tmp_path, 10)))
+
+    assert (summary["total"], summary["passed"], summary["failed"]) == (10, 7, 3)
+    # the sheet row of a CSV variant is its line number
+    assert [(failure["row"], failure["status_code"]) for failure in summary["failures"]] == \
+        [(5, 500), (7, None), (9, 500)]
+    assert summary["failures"][0]["variables"] == {"id": 3, "name": "user3"}
+    assert summary["failures"][0]["failures"][0].startswith("expected_outcome:")
+    assert summary["failures"][1]["failures"] == ["request failed: connection refused"]
+    assert summary["first_response"] == {"id": 0, "name": "user0", "token": "t"}
+    assert summary["first_status_code"] == 200
+    latency = summary["latency_ms"]
+    assert latency["p50"] <= latency["p95"] <= latency["max"]
+
+
+def test_variables_fill_the_placeholders_before_the_configs(tmp_path, sent):
+    requests, _, _ = sent
+    run(step(write_source(tmp_path, 2)))
+    request = sorted(requests, key=lambda request: request["url"])[1]
+    assert request["url"] == "http://env/users/user1"
+    assert request["json"] == {"id": 1, "name": "user1", "token": "t"}
+    assert request["headers"] == {"Authorization": "t"}
+
+
+def test_failures_kept_are_capped_to_the_first_rows(tmp_path, sent, monkeypatch):
+    monkeypatch.setattr(data_driven, "MAX_FAILURES_KEPT", 3)
+    _, failing, _ = sent
+    failing.update(range(20))
+    summary = run(step(write_source(tmp_path, 20)))
+
+    assert (summary["total"], summary["failed"]) == (20, 20)
+    assert [failure["row"] for failure in summary["failures"]] == [2, 3, 4]
+    text = data_driven.format_summary(summary, "users.csv")
+    assert text.startswith("0 of 20 variants of users.csv passed, 20 failed")
+
+
+def test_empty_data_source(tmp_path, sent):
+    summary = run(step(write_source(tmp_path, 0)))
+    assert (summary["total"], summary["failures"], summary["first_response"]) == (0, [], {})
+    assert summary["latency_ms"] == {"p50": None, "p95": None, "max": None}
+    assert data_driven.format_summary(summary, "users.csv").startswith("0 of 0 variants")
+
+
+def test_data_source_names(tmp_path):
+    assert data_driven.parse_data_source("users.csv", "plan.xlsx") == ("users.csv", data_driven.DEFAULT_XLSX_SHEET)
+    assert data_driven.parse_data_source("users.xlsx#accounts", "plan.csv") == ("users.xlsx", "accounts")
+    assert data_driven.parse_data_source("accounts", "plan.xlsx") == ("plan.xlsx", "accounts")
+    with pytest.raises(ValueError):
+        data_driven.parse_data_source("accounts", "plan.csv")
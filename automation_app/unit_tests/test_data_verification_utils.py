@@ -0,0 +1,85 @@
+from utilities.data_verification_utils import diff_json, format_differences
+
+
+def paths(differences):
+    return [(difference["path"], difference["kind"]) for difference in differences]
+
+
+def test_equal_documents_have_no_differences():
+    document = {"a": 1, "b": [1, {"c": None}], "d": {"e": "f"}}
+    assert diff_json(document, document) == []
+
+
+def test_dictionary_differences():
+    differences = diff_json({"a": 1, "b": 2, "c": {"d": "x"}}, {"a": 1, "c": {"d": 1}, "e": True})
+    assert paths(differences) == [("$.b", "missing"), ("$.c.d", "type"), ("$.e", "extra")]
+
+
+def test_int_and_float_are_the_same_type():
+    assert paths(diff_json({"a": 1}, {"a": 1.0})) == []
+    assert paths(diff_json({"a": 1}, {"a": 2.5})) == [("$.a", "changed")]
+
+
+def test_keyed_list_is_aligned_by_id_whatever_the_order():
+    expected = {"items": [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}, {"id": 3, "name": "c"}]}
+    actual = {"items": [{"id": 3, "name": "c"}, {"id": 4, "name": "d"}, {"id": 1, "name": "A"}]}
+    assert paths(diff_json(expected, actual)) == [
+        ("$.items[id=1].name", "changed"), ("$.items[id=2]", "missing"), ("$.items[id=4]", "extra")]
+
+
+def test_list_key_follows_the_configured_patterns():
+    expected = [{"code": "x", "sku_id": 7, "qty": 1}, {"code": "y", "sku_id": 8, "qty": 1}]
+    actual = [{"code": "y", "sku_id": 8, "qty": 2}, {"code": "x", "sku_id": 7, "qty": 1}]
+    assert paths(diff_json(expected, actual, list_keys=("*_id",))) == [("$[sku_id=8].qty", "changed")]
+    assert paths(diff_json(expected, actual, list_keys=("code",))) == [('$[code="y"].qty', "changed")]
+
+
+def test_duplicate_key_values_fall_back_to_unkeyed_alignment():
+    expected = [{"id": 1, "v": "a"}, {"id": 1, "v": "b"}]
+    actual = [{"id": 1, "v": "b"}, {"id": 1, "v": "c"}]
+    assert paths(diff_json(expected, actual)) == [("$[1].v", "changed")]
+
+
+def test_unkeyed_list_matches_identical_items_anywhere():
+    assert paths(diff_json([1, 2, 3], [3, 1, 2])) == []
+    assert paths(diff_json([1, 2, 3], [3, 9, 1])) == [("$[1]", "changed")]
+    assert paths(diff_json([1, 2], [2])) == [("$[0]", "missing")]
+    assert paths(diff_json([1], [1, 5])) == [("$[1]", "extra")]
+
+
+def test_subset_ignores_what_only_actual_has():
+    expected = {"a": 1, "items": [{"id": 2}], "tags": ["x"]}
+    actual = {"a": 1, "b": 2, "items": [{"id": 1}, {"id": 2, "name": "b"}], "tags": ["y", "x"]}
+    assert diff_json(expected, actual, subset=True) == []
+    assert paths(diff_json(expected, actual)) == [
+        ("$.items[id=2].name", "extra"), ("$.items[id=1]", "extra"), ("$.tags[0]", "extra"), ("$.b", "extra")]
+
+
+def test_subset_finds_unordered_partial_items_and_reports_missing_scalars():
+    expected = {"items": [{"name": "b"}, "z"]}
+    actual = {"items": [{"name": "a", "n": 1}, {"name": "b", "n": 2}, "y"]}
+    assert paths(diff_json(expected, actual, subset=True)) == [("$.items[1]", "missing")]
+
+
+def test_differences_are_capped_and_marked_truncated():
+    expected = {f"k{i}": i for i in range(20)}
+    actual = {f"k{i}": -i for i in range(1, 20)}
+    differences = diff_json(expected, actual, max_differences=5)
+    assert len(differences) == 5
+    assert differences.truncated
+    assert format_differences(differences).endswith("... stopped after 5 differences")
+    assert not diff_json(expected, expected, max_differences=5).truncated
+
+
+def test_ignore_patterns_apply_at_any_depth_and_in_list_matching():
+    expected = {"updated_at": 1, "user": {"id": 1, "request_id": "a"}, "events": [{"at": 1, "n": "x"}]}
+    actual = {"updated_at": 2, "user": {"id": 1, "request_id": "b"}, "events": [{"at": 9, "n": "x"}]}
+    assert diff_json(expected, actual, ignore_fields=("updated_at", "request_*", "at")) == []
+    assert paths(diff_json(expected, actual, ignore_fields=("updated_at",))) == [
+        ("$.user.request_id", "changed"), ("$.events[0].at", "changed")]
+
+
+def test_ignored_field_is_not_used_as_list_key():
+    expected = [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}]
+    actual = [{"id": 7, "name": "b"}, {"id": 8, "name": "a"}]
+    assert diff_json(expected, actual, ignore_fields=("id",)) == []
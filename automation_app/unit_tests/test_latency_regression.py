@@ -0,0 +1,96 @@
+from contextlib import closing
+
+import pandas as pd
+import pytest
+
+from utilities import latency_regression, run_history
+
+BASELINE = [100.0, 102.0, 98.0, 101.0, 99.0]
+
+
+def medians(rows):
+    return pd.DataFrame(rows, columns=["run_seq", "endpoint", "method", "median_latency_ms"])
+
+
+def history(values, endpoint="users", method="GET"):
+    return [(run_seq, endpoint, method, value) for run_seq, value in enumerate(values, start=1)]
+
+
+def test_median_above_the_mad_threshold_is_flagged():
+    regressions = latency_regression.find_regressions(medians(history(BASELINE + [130.0])), run_seq=6)
+    assert len(regressions) == 1
+    regression = regressions.iloc[0]
+    assert (regression["endpoint"], regression["method"]) == ("users", "GET")
+    assert regression["baseline_median_ms"] == 100.0
+    assert regression["baseline_mad_ms"] == 1.0
+    # the 20% minimum slowdown is above median + 3 * 1.4826 * MAD here
+    assert regression["threshold_ms"] == pytest.approx(120.0)
+    assert regression["ratio"] == pytest.approx(1.3)
+    assert regression["baseline_runs"] == 5
+
+
+def test_median_within_the_threshold_is_not_flagged():
+    assert latency_regression.find_regressions(medians(history(BASELINE + [115.0])), run_seq=6).empty
+
+
+def test_noisy_baseline_raises_the_threshold():
+    noisy = [100.0, 140.0, 60.0, 120.0, 80.0]
+    rows = medians(history(noisy + [150.0]))
+    # MAD 20 ms, threshold 100 + 3 * 1.4826 * 20
+    assert latency_regression.find_regressions(rows, run_seq=6).empty
+    assert len(latency_regression.find_regressions(rows, run_seq=6, mad_threshold=1)) == 1
+
+
+def test_min_slowdown_keeps_a_stable_endpoint_from_flagging_jitter():
+    rows = medians(history([10.0] * 5 + [11.0]))
+    assert latency_regression.find_regressions(rows, run_seq=6).empty
+    assert len(latency_regression.find_regressions(rows, run_seq=6, min_slowdown=0.05)) == 1
+
+
+def test_too_short_a_baseline_is_not_compared():
+    rows = medians(history(BASELINE[:3] + [500.0]))
+    assert latency_regression.find_regressions(rows, run_seq=4).empty
+    assert len(latency_regression.find_regressions(rows, run_seq=4, min_baseline_runs=3)) == 1
+
+
+def test_baseline_is_per_endpoint_and_limited_to_its_last_runs():
+    # orders was slow long ago, only its last three runs make up its baseline
+    rows = medians(history([500.0, 500.0, 50.0, 50.0, 50.0, 80.0], endpoint="orders")
+                   + history([100.0] * 5 + [100.0]))
+    regressions = latency_regression.find_regressions(rows, run_seq=6, baseline_runs=3, min_baseline_runs=3)
+    assert list(regressions["endpoint"]) == ["orders"]
+    assert regressions.iloc[0]["baseline_median_ms"] == 50.0
+
+
+def test_regressions_are_sorted_slowest_first():
+    rows = medians(history(BASELINE + [130.0], endpoint="a") + history(BASELINE + [200.0], endpoint="b"))
+    assert list(latency_regression.find_regressions(rows, run_seq=6)["endpoint"]) == ["b", "a"]
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(latency_regression, "get_common_settings", lambda name: None)
+    return str(tmp_path / "history.sqlite")
+
+
+def store_runs(db_path, values, endpoint="users"):
+    with closing(run_history.connect(db_path)) as connection, connection:
+        for number, value in enumerate(values, start=1):
+            run_seq = connection.execute("INSERT INTO runs (run_id) VALUES (?)", (f"r{number}",)).lastrowid
+            if value is not None:
+                connection.execute("INSERT INTO endpoint_runs (run_seq, endpoint, method, median_latency_ms) "
+                                   "VALUES (?, ?, 'GET', ?)", (run_seq, endpoint, value))
+
+
+def test_detect_stores_the_regressions_of_a_run(db_path):
+    # runs that did not call the endpoint leave its baseline alone
+    store_runs(db_path, [100.0, None, 102.0, 98.0, None, 101.0, 99.0, 130.0])
+    regressions = latency_regression.detect_regressions("r8", db_path)
+    assert [(row["run_id"], row["endpoint"], row["baseline_runs"]) for row in regressions] == [("r8", "users", 5)]
+    assert latency_regression.stored_regressions(db_path=db_path) == regressions
+
+    # checking the run again replaces its rows
+    assert latency_regression.detect_regressions("r8", db_path) == regressions
+    assert latency_regression.detect_regressions("r7", db_path) == []
+    with pytest.raises(ValueError):
+        latency_regression.detect_regressions("missing", db_path)
@@ -0,0 +1,121 @@
+import os
+
+import pytest
+
+from utilities import log_search
+
+
+@pytest.fixture
+def small_stride(monkeypatch):
+    # a hundred lines then span several index blocks
+    monkeypatch.setattr(log_search, "INDEX_STRIDE", 16)
+
+
+def write_log(path, lines, mode="w"):
+    with open(path, mode, encoding="utf-8") as f:
+        f.writelines(f"{line}\n" for line in lines)
+
+
+def test_read_lines_pages_through_index_blocks(tmp_path, small_stride):
+    log_path = str(tmp_path / "run.log")
+    write_log(log_path, [f"line {number}" for number in range(1, 101)])
+
+    page = log_search.read_lines(log_path, start=30, count=5)
+    assert page["lines"] == ["line 30", "line 31", "line 32", "line 33", "line 34"]
+    assert page["total_lines"] == 100
+    assert page["next_start"] == 35
+
+    last = log_search.read_lines(log_path, start=98, count=5)
+    assert last["lines"] == ["line 98", "line 99", "line 100"]
+    assert last["next_start"] is None
+
+
+def test_unterminated_last_line_is_counted(tmp_path):
+    log_path = str(tmp_path / "run.log")
+    with open(log_path, "w", encoding="utf-8") as f:
+        f.write("a\nb\nc")
+    page = log_search.read_lines(log_path, start=1, count=10)
+    assert page["lines"] == ["a", "b", "c"]
+    assert page["total_lines"] == 3
+
+
+def test_empty_log(tmp_path):
+    log_path = str(tmp_path / "run.log")
+    open(log_path, "w").close()
+    assert log_search.read_lines(log_path)["lines"] == []
+    assert log_search.search(log_path, "x")["matches"] == []
+
+
+def test_index_is_extended_when_the_log_grows(tmp_path, small_stride):
+    log_path = str(tmp_path / "run.log")
+    write_log(log_path, [f"line {number}" for number in range(1, 41)])
+    assert log_search.get_index(log_path).indexed_lines == 40
+
+    write_log(log_path, [f"line {number}" for number in range(41, 81)], mode="a")
+    index = log_search.get_index(log_path)
+    assert index.indexed_lines == 80
+    # lines 1, 17, 33, 49, 65 and the next line to be written, 81
+    assert len(index.offsets) == 6
+    assert log_search.read_lines(log_path, start=70, count=1)["lines"] == ["line 70"]
+
+
+def test_index_is_rebuilt_when_the_log_is_replaced(tmp_path, small_stride):
+    log_path = str(tmp_path / "run.log")
+    write_log(log_path, [f"old {number}" for number in range(1, 61)])
+    log_search.get_index(log_path)
+
+    replacement = str(tmp_path / "run.log.new")
+    write_log(replacement, [f"new {number}" for number in range(1, 21)])
+    os.replace(replacement, log_path)
+    assert log_search.get_index(log_path).indexed_lines == 20
+    assert log_search.read_lines(log_path, start=18, count=5)["lines"] == ["new 18", "new 19", "new 20"]
+
+
+def test_search_reports_line_numbers_and_context(tmp_path, small_stride):
+    log_path = str(tmp_path / "run.log")
+    lines = [f"INFO step {number}" for number in range(1, 101)]
+    lines[49] = "ERROR step 50 failed"
+    lines[89] = "ERROR step 90 failed"
+    write_log(log_path, lines)
+
+    result = log_search.search(log_path, "ERROR", context=1)
+    assert [match["line_number"] for match in result["matches"]] == [50, 90]
+    assert result["matches"][0]["before"] == ["INFO step 49"]
+    assert result["matches"][0]["after"] == ["INFO step 51"]
+    assert result["next_line"] is None
+
+
+def test_search_pages_with_next_line(tmp_path, small_stride):
+    log_path = str(tmp_path / "run.log")
+    write_log(log_path, [f"hit {number}" if number % 10 == 0 else "miss" for number in range(1, 101)])
+
+    first = log_search.search(log_path, "hit", limit=3)
+    assert [match["line_number"] for match in first["matches"]] == [10, 20, 30]
+    assert first["next_line"] == 40
+    second = log_search.search(log_path, "hit", limit=3, from_line=first["next_line"])
+    assert [match["line_number"] for match in second["matches"]] == [40, 50, 60]
+
+
+def test_one_hit_per_line(tmp_path):
+    log_path = str(tmp_path / "run.log")
+    write_log(log_path, ["x x x", "y", "x"])
+    assert [match["line_number"] for match in log_search.search(log_path, "x")["matches"]] == [1, 3]
+
+
+def test_case_insensitive_and_regex_queries(tmp_path):
+    log_path = str(tmp_path / "run.log")
+    write_log(log_path, ["Timeout after 5s", "timeout after 30s", "TIMEOUT", "ok"])
+
+    assert len(log_search.search(log_path, "timeout")["matches"]) == 1
+    assert len(log_search.search(log_path, "timeout", ignore_case=True)["matches"]) == 3
+    regex = log_search.search(log_path, r"^\w+ after \d{2}s$", regex=True)
+    assert [match["line"] for match in regex["matches"]] == ["timeout after 30s"]
+
+
+def test_case_insensitive_match_across_a_chunk_boundary(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_search, "FOLD_CHUNK_SIZE", 64 * 1024)
+    log_path = str(tmp_path / "run.log")
+    # the needle starts 4 bytes before the end of the first 64 KB chunk
+    write_log(log_path, ["a" * (64 * 1024 - 4) + "NEEDLE", "b"])
+    matches = log_search.search(log_path, "needle", ignore_case=True)["matches"]
+    assert [match["line_number"] for match in matches] == [1]
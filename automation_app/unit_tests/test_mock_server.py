@@ -0,0 +1,82 @@
+import json
+
+import jsonschema
+import pytest
+import requests
+
+from api_fixtures.endpoints import RestAPIEndpoints
+from mock_server import build_routes, merge_expected, sample_from_schema, start_mock_server
+
+
+def step(api_name, request_type="get", **columns):
+    return {"api_name": api_name, "request_type": request_type,
+            **{column: json.dumps(value) for column, value in columns.items()}}
+
+
+@pytest.mark.parametrize("schema", [
+    {"type": "object", "properties": {"id": {"type": "integer", "minimum": 5},
+                                      "name": {"type": "string", "minLength": 3},
+                                      "tags": {"type": "array", "minItems": 2, "items": {"enum": ["a", "b"]}}}},
+    {"anyOf": [{"type": "number", "minimum": 1.5}, {"type": "string"}]},
+    {"type": ["boolean", "null"]},
+    {"const": {"status": "ok"}},
+])
+def test_sample_satisfies_its_schema(schema):
+    jsonschema.validate(sample_from_schema(schema), schema)
+
+
+def test_merge_expected_keeps_the_sampled_keys_it_does_not_override():
+    assert merge_expected({"a": 1, "b": {"c": 2, "d": 3}}, {"b": {"c": 9}, "e": [1]}) == \
+        {"a": 1, "b": {"c": 9, "d": 3}, "e": [1]}
+    assert merge_expected({"a": 1}, [1, 2]) == [1, 2]
+
+
+def test_rows_of_one_route_are_merged_in_sheet_order():
+    routes = build_routes([
+        step("/users/", response_schema={"type": "object", "properties": {"id": {"type": "integer"}}},
+             expected_outcome={"status": "new"}, expected_response_header={"X-Version": 1}),
+        step("users", expected_outcome={"status": "active", "count": 2}),
+        step("users", request_type="post", expected_outcome={"created": True}),
+        {"api_name": None, "request_type": "get"},
+    ])
+    assert routes[("GET", "users")] == {"body": {"id": 0, "status": "active", "count": 2},
+                                        "headers": {"X-Version": "1"}}
+    assert routes[("POST", "users")]["body"] == {"created": True}
+    assert routes[("POST", RestAPIEndpoints.LOGIN)]["body"]["token"] == "mock-token"
+    assert len(routes) == 3
+
+
+def test_sheet_login_route_is_kept():
+    routes = build_routes([step(RestAPIEndpoints.LOGIN, request_type="post", expected_outcome={"token": "t"})])
+    assert routes[("POST", RestAPIEndpoints.LOGIN)]["body"] == {"token": "t"}
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(records, **kwargs):
+        server, base_url = start_mock_server(records=records, **kwargs)
+        servers.append(server)
+        return base_url
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_server_answers_routes_and_404s_the_rest(serve):
+    base_url = serve([step("users", expected_outcome={"status": "ok"}, expected_response_header={"X-Version": "2"})])
+    response = requests.get(f"{base_url}/users?page=1", timeout=5)
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok"}
+    assert response.headers["X-Version"] == "2"
+
+    missing = requests.post(f"{base_url}/users", json={"a": 1}, timeout=5)
+    assert missing.status_code == 404
+    assert "No mock route for POST /users" in missing.json()["error"]
+
+
+def test_error_rate_injects_500s(serve):
+    base_url = serve([step("users")], error_rate=1.0)
+    assert requests.get(f"{base_url}/users", timeout=5).status_code == 500
@@ -0,0 +1,153 @@
+import csv
+import json
+import logging
+
+import pytest
+
+from test_data.plan_compiler import PlanCompileError, check_plan, compile_plan
+from test_data.plan_readers import PlanIndex
+
+COLUMNS = ("test_number", "use_next", "depends_on", "api_name", "payload", "response_schema", "expected_outcome",
+           "read_timeout_sec", "attachment", "data_source")
+
+
+def write_plan(tmp_path, steps, name="plan.csv"):
+    path = tmp_path / name
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        for step in steps:
+            writer.writerow({key: json.dumps(value) if isinstance(value, (dict, list)) else value
+                             for key, value in step.items()})
+    return PlanIndex(str(path))
+
+
+def messages(errors):
+    return [(error.row, error.column, error.message) for error in errors]
+
+
+def test_valid_plan_has_no_errors(tmp_path):
+    plan = write_plan(tmp_path, [
+        {"test_number": "s1", "use_next": "s2", "api_name": "users", "payload": {"name": "##user"},
+         "response_schema": {"type": "object", "properties": {"id": {"type": "integer"}}}},
+        {"test_number": "s2", "api_name": "users/##user", "payload": {"id": "$$.id", "token": "##auth"}},
+    ])
+    assert compile_plan(plan, {"user": "bob"}, attachment_path=str(tmp_path)) == []
+
+
+def test_cell_errors_are_reported_with_their_row(tmp_path):
+    plan = write_plan(tmp_path, [
+        {"test_number": "s1", "payload": '{"a": 1,}', "read_timeout_sec": "soon"},
+        {"test_number": "s2", "response_schema": {"type": "objekt"}},
+    ])
+    errors = messages(compile_plan(plan, attachment_path=str(tmp_path)))
+    assert [(row, column) for row, column, _ in errors] == [(2, "payload"), (2, "read_timeout_sec"),
+                                                            (3, "response_schema")]
+    assert errors[0][2].startswith("invalid JSON at line 1")
+    assert errors[1][2] == "'soon' is not a number"
+
+
+def test_missing_config_key(tmp_path):
+    plan = write_plan(tmp_path, [{"test_number": "s1", "api_name": "users/##id", "payload": {"a": "##missing"}}])
+    assert messages(compile_plan(plan, {"id": 1}, attachment_path=str(tmp_path))) == [
+        (2, "payload", "'##missing' is not in the configs")]
+
+
+def test_data_source_columns_count_as_config_keys(tmp_path):
+    (tmp_path / "users.csv").write_text("name,age\nbob,int[3]\n", encoding="utf-8")
+    plan = write_plan(tmp_path, [
+        {"test_number": "s1", "payload": {"name": "##name", "age": "##age"}, "data_source": str(tmp_path / "users.csv")},
+        {"test_number": "s2", "payload": {"name": "##name"}},
+    ])
+    assert messages(compile_plan(plan, attachment_path=str(tmp_path))) == [
+        (3, "payload", "'##name' is not in the configs")]
+
+
+def test_unreadable_data_source(tmp_path):
+    plan = write_plan(tmp_path, [{"test_number": "s1", "payload": {"a": "##a"},
+                                  "data_source": str(tmp_path / "missing.csv")}])
+    errors = messages(compile_plan(plan, attachment_path=str(tmp_path)))
+    assert [(row, column) for row, column, _ in errors] == [(2, "data_source")]
+
+
+def test_references_need_an_earlier_step(tmp_path):
+    plan = write_plan(tmp_path, [
+        {"test_number": "s1", "use_next": "s2", "payload": {"a": "$$.id"}},
+        {"test_number": "s2", "use_next": "s3", "payload": {"a": "$#.id", "b": "$@s3.id"}},
+        {"test_number": "s3", "payload": {"a": "$#.id", "b": "$@s1.id", "c": "$@nope.id"}},
+    ])
+    assert messages(compile_plan(plan, attachment_path=str(tmp_path))) == [
+        (2, "payload", "'$$.id' refers to a step that does not run before this one"),
+        (3, "payload", "'$#.id' refers to a step that does not run before this one"),
+        (3, "payload", "'$@s3.id' refers to step 's3', which does not run before this one"),
+        (4, "payload", "'$@nope.id' refers to step 'nope', which does not exist"),
+    ]
+
+
+def test_reference_path_outside_a_closed_schema(tmp_path):
+    schema = {"type": "object", "additionalProperties": False,
+              "properties": {"items": {"type": "array", "items": {"type": "object", "additionalProperties": False,
+                                                                  "properties": {"id": {"type": "integer"}}}}}}
+    plan = write_plan(tmp_path, [
+        {"test_number": "s1", "use_next": "s2", "response_schema": schema},
+        # like get_value_from_response, a list takes up one part of the path, a digit or not
+        {"test_number": "s2", "payload": {"a": "$$.items.0.id", "b": "$$.items.first.uuid", "c": "$$.total"}},
+    ])
+    assert messages(compile_plan(plan, attachment_path=str(tmp_path))) == [
+        (3, "payload", "'$$.items.first.uuid': 'uuid' is not in the response_schema of step s1"),
+        (3, "payload", "'$$.total': 'total' is not in the response_schema of step s1"),
+    ]
+
+
+def test_graph_flow_reads_its_parents(tmp_path):
+    plan = write_plan(tmp_path, [
+        {"test_number": "a"},
+        {"test_number": "b", "depends_on": "a", "payload": {"x": "$$.id"}},
+        {"test_number": "c", "depends_on": "a", "payload": {"x": "$@b.id"}},
+        {"test_number": "d", "depends_on": "b,c", "payload": {"x": "$#.id", "y": "$@c.id"}},
+    ])
+    assert messages(compile_plan(plan, attachment_path=str(tmp_path))) == [
+        (4, "payload", "'$@b.id' refers to step 'b', which does not run before this one")]
+
+
+def test_links_to_missing_steps_duplicates_and_cycles(tmp_path):
+    plan = write_plan(tmp_path, [
+        {"test_number": "s1", "use_next": "s2"},
+        {"test_number": "s2", "use_next": "s1"},
+        {"test_number": "s3", "use_next": "nope", "depends_on": "gone"},
+        {"test_number": "s3"},
+    ])
+    assert messages(compile_plan(plan, attachment_path=str(tmp_path))) == [
+        (2, "use_next/depends_on", "cycle s1 -> s2 -> s1"),
+        (4, "use_next", "step 'nope' does not exist"),
+        (4, "depends_on", "step 'gone' does not exist"),
+        (5, "test_number", "duplicate of row 4, this row never runs"),
+    ]
+
+
+def test_long_chain_without_cycle_is_checked_without_recursion(tmp_path):
+    steps = [{"test_number": f"s{number}", "use_next": f"s{number + 1}" if number < 3000 else ""}
+             for number in range(1, 3001)]
+    assert compile_plan(write_plan(tmp_path, steps), attachment_path=str(tmp_path)) == []
+
+
+def test_missing_attachment(tmp_path):
+    (tmp_path / "here.txt").write_text("x")
+    plan = write_plan(tmp_path, [{"test_number": "s1", "attachment": "here.txt"},
+                                 {"test_number": "s2", "attachment": "gone.txt"}])
+    errors = messages(compile_plan(plan, attachment_path=str(tmp_path)))
+    assert [(row, column) for row, column, _ in errors] == [(3, "attachment")]
+
+
+def test_check_plan_modes(tmp_path, caplog):
+    plan = write_plan(tmp_path, [{"test_number": "s1", "payload": "{broken"}])
+    with pytest.raises(PlanCompileError) as raised:
+        check_plan(plan, mode="strict")
+    assert len(raised.value.errors) == 1
+    assert "has 1 error(s), no request was sent" in str(raised.value)
+
+    logger = logging.getLogger("plan_check_test")
+    with caplog.at_level(logging.WARNING, logger="plan_check_test"):
+        assert len(check_plan(plan, mode="warn", logger=logger)) == 1
+    assert "invalid JSON" in caplog.text
+    assert check_plan(plan, mode="off") == []
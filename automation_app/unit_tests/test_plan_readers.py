@@ -0,0 +1,141 @@
+import csv
+import json
+import os
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from test_data import plan_readers
+from test_data.plan_readers import PlanIndex, get_flag_from_record, get_json_from_record, get_number_from_record, \
+    iter_plan_records, read_config_values
+
+COLUMNS = ["test_number", "use_next", "depends_on", "payload", "delay_before_test_sec"]
+ROWS = [
+    ["s1", "s2", None, '{"a": 1}', 2],
+    ["s2", None, None, None, None],
+    ["s3", None, "s1", '{"b": [1, 2]}', None],
+]
+
+
+@pytest.fixture(autouse=True)
+def spool_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(plan_readers, "PLAN_SPOOL_DIR", str(tmp_path / "plans"))
+    return tmp_path / "plans"
+
+
+def write_xlsx(path, rows=ROWS, configs=None):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = "testcases"
+    sheet.append(COLUMNS)
+    for row in rows:
+        sheet.append(row)
+    if configs is not None:
+        config_sheet = workbook.create_sheet("configs")
+        config_sheet.append(["attribute", "value"])
+        for row in configs:
+            config_sheet.append(row)
+    workbook.save(path)
+    return str(path)
+
+
+def write_csv(path, rows=ROWS):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        writer.writerows(["" if value is None else value for value in row] for row in rows)
+    return str(path)
+
+
+def write_jsonl(path, rows=ROWS):
+    with open(path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(dict(zip(COLUMNS, row))) + "\n\n")
+    return str(path)
+
+
+def links(records):
+    return [(record["test_number"], record["use_next"], record["depends_on"]) for record in records]
+
+
+@pytest.mark.parametrize("write", [write_xlsx, write_csv, write_jsonl])
+def test_every_format_yields_the_same_steps(tmp_path, write):
+    extension = {write_xlsx: "xlsx", write_csv: "csv", write_jsonl: "jsonl"}[write]
+    records = list(iter_plan_records(write(tmp_path / f"plan.{extension}")))
+    assert links(records) == [("s1", "s2", None), ("s2", None, None), ("s3", None, "s1")]
+    assert get_json_from_record(records[2], "payload") == {"b": [1, 2]}
+    assert get_number_from_record(records[0], "delay_before_test_sec") == 2
+    assert records[1]["payload"] is None
+
+
+def test_rows_are_numbered_as_in_the_file_blank_rows_skipped(tmp_path):
+    rows = [ROWS[0], [None] * len(COLUMNS), ROWS[1]]
+    assert [record["_row"] for record in iter_plan_records(write_xlsx(tmp_path / "plan.xlsx", rows))] == [2, 4]
+    assert [record["_row"] for record in iter_plan_records(write_csv(tmp_path / "plan.csv", rows))] == [2, 4]
+
+
+def test_parquet_plan(tmp_path):
+    pytest.importorskip("pyarrow")
+    path = tmp_path / "plan.parquet"
+    pd.DataFrame(ROWS, columns=COLUMNS).to_parquet(path, index=False)
+    assert links(iter_plan_records(str(path))) == [("s1", "s2", None), ("s2", None, None), ("s3", None, "s1")]
+
+
+def test_unknown_format_and_invalid_jsonl(tmp_path):
+    with pytest.raises(ValueError, match="No plan reader for '.txt' files"):
+        iter_plan_records(str(tmp_path / "plan.txt"))
+    (tmp_path / "plan.jsonl").write_text('{"test_number": "s1"}\n{broken\n')
+    with pytest.raises(ValueError, match="plan.jsonl line 2 is not valid JSON"):
+        list(iter_plan_records(str(tmp_path / "plan.jsonl")))
+
+
+def test_cell_conversions():
+    record = {"test_number": "s1", "_row": 3, "payload": "{broken", "delay": "soon", "flag": "Yes"}
+    with pytest.raises(ValueError, match=r"'payload' of step s1 \(row 3\) is not a valid JSON"):
+        get_json_from_record(record, "payload")
+    with pytest.raises(ValueError, match="is not a number"):
+        get_number_from_record(record, "delay")
+    assert get_flag_from_record(record, "flag") and get_flag_from_record({"flag": True}, "flag")
+    assert not get_flag_from_record({"flag": "no"}, "flag") and not get_flag_from_record({}, "flag")
+
+
+def test_plan_index_groups_and_looks_up_steps(tmp_path):
+    rows = ROWS + [["s2", None, None, '{"duplicate": true}', None]]
+    plan = PlanIndex(write_csv(tmp_path / "plan.csv", rows))
+    assert len(plan) == 4
+    assert plan.group_sequences() == [["s1", "s2", "s3"]]
+    assert plan.get_step("s2")["payload"] is None
+    assert plan.get_step("nope") is None
+    assert [record["_row"] for record in plan.iter_records()] == [2, 3, 4, 5]
+
+
+def test_workers_reuse_the_spool_until_the_plan_changes(tmp_path, spool_dir):
+    path = write_csv(tmp_path / "plan.csv")
+    first = PlanIndex(path)
+    len(first)
+    spool = first.spool_path
+    other_worker = PlanIndex(path)
+    assert other_worker.spool_path == spool
+    modified = os.path.getmtime(spool)
+    len(other_worker)
+    assert os.path.getmtime(spool) == modified
+
+    write_csv(tmp_path / "plan.csv", ROWS[:1])
+    os.utime(path, (1, 1))
+    changed = PlanIndex(path)
+    assert len(changed) == 1
+    assert [name for name in os.listdir(spool_dir) if name.endswith(".sqlite")] == \
+        [os.path.basename(changed.spool_path)]
+
+
+def test_config_values(tmp_path):
+    plan = write_xlsx(tmp_path / "plan.xlsx", configs=[["user", "bob"], ["count", "int[3]"], ["empty", None]])
+    assert read_config_values(plan) == {"user": "bob", "count": 3}
+    assert read_config_values(write_xlsx(tmp_path / "bare.xlsx")) == {}
+
+    csv_plan = write_csv(tmp_path / "plan.csv")
+    assert read_config_values(csv_plan) == {}
+    config_file = tmp_path / "configs.csv"
+    config_file.write_text("config_name,config_value\nflag,TRUE\n", encoding="utf-8")
+    assert read_config_values(csv_plan, str(config_file)) == {"flag": True}
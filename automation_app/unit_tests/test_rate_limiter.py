@@ -0,0 +1,119 @@
+import functools
+import json
+from email.utils import formatdate
+
+import pytest
+
+from utilities import shared_state
+from utilities.api_utils import rate_limiter
+from utilities.api_utils.rate_limiter import RateLimitError, RateLimiter, parse_retry_after
+from utilities.api_utils.timeouts import DeadlineExceeded
+
+LIMITS = {"http://api": {"rate": 2, "burst": 2}, "http://api/search": 1}
+
+
+class FakeResponse:
+    def __init__(self, status_code, retry_after=None):
+        self.status_code = status_code
+        self.headers = {"Retry-After": retry_after} if retry_after is not None else {}
+
+
+@pytest.fixture
+def clock(tmp_path, monkeypatch):
+    # sleeping moves the clock forward, the sleeps are kept to check the pacing
+    now, sleeps = [1_000_000.0], []
+
+    def sleep(seconds):
+        sleeps.append(round(seconds, 3))
+        now[0] += seconds
+    monkeypatch.setattr(rate_limiter.time, "time", lambda: now[0])
+    monkeypatch.setattr(rate_limiter.time, "sleep", sleep)
+    monkeypatch.setattr(rate_limiter, "remaining_time", lambda: None)
+    monkeypatch.setattr(rate_limiter, "SharedJsonStore",
+                        functools.partial(shared_state.SharedJsonStore, state_dir=str(tmp_path)))
+    settings = {"rate_limits": json.dumps(LIMITS), "rate_limit_max_wait_sec": "10"}
+    monkeypatch.setattr(rate_limiter, "get_rest_api_settings", settings.get)
+    return now, sleeps
+
+
+def test_bucket_paces_requests_after_its_burst(clock):
+    _, sleeps = clock
+    limiter = RateLimiter()
+    for _ in range(5):
+        limiter.acquire("http://api/users")
+    assert sleeps == [0.5, 0.5, 0.5]
+
+
+def test_workers_draw_from_the_same_bucket(clock):
+    _, sleeps = clock
+    first, other_worker = RateLimiter(), RateLimiter()
+    first.acquire("http://api/users")
+    first.acquire("http://api/users")
+    other_worker.acquire("http://api/users")
+    assert sleeps == [0.5]
+
+
+def test_longest_prefix_wins(clock):
+    _, sleeps = clock
+    limiter = RateLimiter()
+    assert limiter.bucket_key("http://api/search?q=x") == "http://api/search"
+    assert limiter.bucket_key("http://api/users") == "http://api"
+    assert limiter.bucket_key("http://other/users") is None
+    limiter.acquire("http://api/search")
+    limiter.acquire("http://api/search")
+    assert sleeps == [1.0]
+
+
+def test_unlimited_host_skips_the_store(clock, tmp_path):
+    RateLimiter().acquire("http://other/users")
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_retry_after_blocks_the_host_for_every_worker(clock):
+    _, sleeps = clock
+    first, other_worker = RateLimiter(), RateLimiter()
+    other_worker.acquire("http://other/users")
+    assert first.record_response("http://other/users", FakeResponse(429, "3")) == 3
+    other_worker.acquire("http://other/users")
+    assert sleeps == [3]
+    other_worker.acquire("http://other/users")
+    assert sleeps == [3]
+
+
+def test_retry_after_drains_the_bucket(clock):
+    _, sleeps = clock
+    limiter = RateLimiter()
+    limiter.acquire("http://api/users")
+    limiter.record_response("http://api/users", FakeResponse(503, "2"))
+    limiter.acquire("http://api/users")
+    # the block, then the bucket refills from the end of the block
+    assert sleeps == [2, 0.5]
+
+
+def test_answers_without_a_usable_retry_after_are_ignored(clock):
+    limiter = RateLimiter()
+    assert limiter.record_response("http://api/users", FakeResponse(200, "5")) is None
+    assert limiter.record_response("http://api/users", FakeResponse(429)) is None
+    assert limiter.record_response("http://api/users", FakeResponse(429, "soon")) is None
+
+
+def test_retry_after_as_an_http_date(clock):
+    now, _ = clock
+    assert parse_retry_after(formatdate(now[0] + 30, usegmt=True)) == pytest.approx(30)
+    assert parse_retry_after(formatdate(now[0] - 30, usegmt=True)) == 0
+    assert parse_retry_after("") is None
+
+
+def test_wait_longer_than_the_maximum_fails(clock):
+    limiter = RateLimiter()
+    limiter.record_response("http://api/users", FakeResponse(429, "60"))
+    with pytest.raises(RateLimitError, match="more than 10s"):
+        limiter.acquire("http://api/users")
+
+
+def test_wait_past_the_run_deadline_fails(clock, monkeypatch):
+    limiter = RateLimiter()
+    limiter.record_response("http://api/users", FakeResponse(429, "5"))
+    monkeypatch.setattr(rate_limiter, "remaining_time", lambda: 2)
+    with pytest.raises(DeadlineExceeded):
+        limiter.acquire("http://api/users")
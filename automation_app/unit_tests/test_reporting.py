@@ -0,0 +1,60 @@
+import allure
+import allure_commons
+import pytest
+from allure_commons.logger import AllureFileLogger
+from allure_commons.model2 import TestResult as AllureTestResult
+from allure_commons.reporter import AllureReporter
+
+from utilities import reporting
+
+
+class Listener:
+    # stands in for the allure-pytest listener, which keeps its reporter as allure_logger
+    def __init__(self):
+        self.allure_logger = AllureReporter()
+
+
+@pytest.fixture
+def allure_test(tmp_path, monkeypatch):
+    monkeypatch.setattr(reporting, "_written_attachments", set())
+    listener, file_logger = Listener(), AllureFileLogger(str(tmp_path))
+    allure_commons.plugin_manager.register(listener)
+    allure_commons.plugin_manager.register(file_logger)
+    test = AllureTestResult(uuid="test-uuid", name="test")
+    listener.allure_logger.schedule_test(test.uuid, test)
+    yield listener, test
+    allure_commons.plugin_manager.unregister(listener)
+    allure_commons.plugin_manager.unregister(file_logger)
+
+
+def test_same_body_is_written_once_under_its_hash(tmp_path, allure_test):
+    _, test = allure_test
+    body = '{"a": 1}'
+    reporting.attach(body, name="Expected Outcome", attachment_type=allure.attachment_type.JSON)
+    reporting.attach(body, name="Expected Outcome", attachment_type=allure.attachment_type.JSON)
+    reporting.attach("other", name="Checkpoint")
+
+    same = f"{reporting.attachment_prefix(body.encode())}-attachment.json"
+    other = f"{reporting.attachment_prefix(b'other')}-attachment.txt"
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted([same, other])
+    assert (tmp_path / same).read_text() == body
+    assert [attachment.source for attachment in test.attachments] == [same, same, other]
+
+
+def test_file_another_worker_wrote_is_not_written_again(tmp_path, allure_test):
+    _, test = allure_test
+    file_name = f"{reporting.attachment_prefix(b'body')}-attachment.txt"
+    (tmp_path / file_name).write_text("body")
+    reporting.attach("body", name="Checkpoint")
+    assert [path.name for path in tmp_path.iterdir()] == [file_name]
+    assert [attachment.source for attachment in test.attachments] == [file_name]
+
+
+def test_falls_back_to_allure_attach_without_the_reporter_internals(tmp_path, allure_test, monkeypatch):
+    listener, _ = allure_test
+    listener.allure_logger = object()
+    attached = []
+    monkeypatch.setattr(allure, "attach", lambda body, name, attachment_type: attached.append((body, name)))
+    reporting.attach("body", name="Checkpoint")
+    assert attached == [("body", "Checkpoint")]
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,132 @@
+import functools
+import os
+
+import pytest
+
+from utilities import shared_state
+from utilities.api_utils import resilience
+from utilities.api_utils.resilience import CircuitBreakers, CircuitOpenError, RetryPolicy, reset_run_state
+
+SETTINGS = {"circuit_breaker_threshold": "2", "circuit_breaker_cooldown_sec": "30", "max_retries": "2",
+            "retry_backoff_sec": "1", "retry_backoff_cap_sec": "3", "retry_budget": "3"}
+HOST = "http://api"
+
+
+@pytest.fixture(autouse=True)
+def state_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(resilience, "SharedJsonStore",
+                        functools.partial(shared_state.SharedJsonStore, state_dir=str(tmp_path)))
+    monkeypatch.setattr(resilience, "STATE_DIR", str(tmp_path))
+    monkeypatch.setattr(resilience, "get_rest_api_settings", SETTINGS.get)
+    monkeypatch.setenv("RUN_ID", "run1")
+    return tmp_path
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(resilience.time, "time", lambda: now[0])
+    return now
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breakers = CircuitBreakers()
+    breakers.record_failure(HOST, ConnectionError("refused"))
+    breakers.before_request(HOST)
+    breakers.record_failure(HOST, ConnectionError("refused"))
+    assert breakers.is_open(HOST)
+    with pytest.raises(CircuitOpenError, match="after 2 consecutive connection failures"):
+        breakers.before_request(HOST)
+
+
+def test_success_resets_the_failure_count(clock):
+    breakers = CircuitBreakers()
+    breakers.record_failure(HOST, ConnectionError("refused"))
+    breakers.record_success(HOST)
+    breakers.record_failure(HOST, ConnectionError("refused"))
+    assert not breakers.is_open(HOST)
+
+
+def test_half_open_lets_one_trial_through_and_its_success_closes(clock):
+    breakers, other_worker = CircuitBreakers(), CircuitBreakers()
+    for _ in range(2):
+        breakers.record_failure(HOST, ConnectionError("refused"))
+    clock[0] += 31
+    breakers.before_request(HOST)
+    # the trial restarted the cooldown, every other request still fails fast
+    with pytest.raises(CircuitOpenError):
+        other_worker.before_request(HOST)
+
+    breakers.record_success(HOST)
+    assert not breakers.is_open(HOST)
+    other_worker.before_request(HOST)
+
+
+def test_failed_trial_opens_the_breaker_for_another_cooldown(clock):
+    breakers = CircuitBreakers()
+    for _ in range(2):
+        breakers.record_failure(HOST, ConnectionError("refused"))
+    clock[0] += 31
+    breakers.before_request(HOST)
+    breakers.record_failure(HOST, ConnectionError("still refused"))
+    clock[0] += 20
+    with pytest.raises(CircuitOpenError):
+        breakers.before_request(HOST)
+    clock[0] += 11
+    breakers.before_request(HOST)
+
+
+def test_breakers_are_per_host(clock):
+    breakers = CircuitBreakers()
+    for _ in range(2):
+        breakers.record_failure(HOST, ConnectionError("refused"))
+    breakers.before_request("http://other")
+    assert resilience.host_key("https://api.example.com:8443/users?a=1") == "https://api.example.com:8443"
+
+
+def test_only_idempotent_methods_are_retried():
+    policy = RetryPolicy()
+    assert policy.can_retry("get", 0) and policy.can_retry("PUT", 1)
+    assert not policy.can_retry("GET", 2)
+    assert not policy.can_retry("POST", 0)
+
+
+def test_retry_budget_is_shared_by_the_run():
+    first, other_worker = RetryPolicy(), RetryPolicy()
+    assert [first.take_budget(), other_worker.take_budget(), first.take_budget()] == [True, True, True]
+    assert not other_worker.take_budget()
+
+    reset_run_state()
+    assert first.take_budget()
+
+
+def test_backoff_is_full_jitter_up_to_the_cap(monkeypatch):
+    bounds, sleeps = [], []
+    monkeypatch.setattr(resilience.random, "uniform", lambda low, high: bounds.append((low, high)) or high)
+    monkeypatch.setattr(resilience.time, "sleep", sleeps.append)
+    policy = RetryPolicy()
+    for attempt in range(3):
+        policy.sleep_before_retry(attempt)
+    assert bounds == [(0, 1), (0, 2), (0, 3)]
+    assert sleeps == [1, 2, 3]
+
+
+def test_concurrent_runs_keep_their_own_state(state_dir, monkeypatch):
+    RetryPolicy().take_budget()
+    monkeypatch.setenv("RUN_ID", "run2")
+    policy = RetryPolicy()
+    for _ in range(3):
+        policy.take_budget()
+    reset_run_state()
+    monkeypatch.setenv("RUN_ID", "run1")
+    assert RetryPolicy().store.read() == {"used": 1}
+
+
+def test_reset_removes_the_stale_stores_of_other_runs(state_dir):
+    RetryPolicy(resilience.run_store_name("retry_budget", "old")).take_budget()
+    RetryPolicy(resilience.run_store_name("retry_budget", "recent")).take_budget()
+    stale = state_dir / "retry_budget-old.json"
+    os.utime(stale, (0, 0))
+    reset_run_state()
+    assert not stale.exists()
+    assert (state_dir / "retry_budget-recent.json").exists()
@@ -0,0 +1,119 @@
+import fcntl
+import os
+import tarfile
+import time
+from contextlib import closing
+
+import pytest
+
+from utilities import reporting, run_artifacts, run_history
+
+DAY = 86400
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def artifacts(tmp_path, monkeypatch):
+    settings = {"artifacts_dir": str(tmp_path / "artifacts"), "run_history_db": str(tmp_path / "history.sqlite"),
+                "artifacts_keep_uncompressed": "10", "artifacts_max_age_days": "30",
+                "artifacts_max_total_mb": "100", "run_history_max_age_days": "180"}
+    monkeypatch.setattr(run_artifacts, "get_common_settings", settings.get)
+    monkeypatch.setattr(run_history, "get_common_settings", settings.get)
+    monkeypatch.setattr(reporting, "get_results_dir", lambda: str(tmp_path / "results"))
+    os.makedirs(tmp_path / "results")
+    return settings
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # manifests and retention read time.time(), the tests create runs in the past
+    now = [time.time()]
+    monkeypatch.setattr(run_artifacts.time, "time", lambda: now[0])
+    return now
+
+
+def make_run(clock, run_id, age_days, size_bytes=100, finished=True):
+    saved, clock[0] = clock[0], clock[0] - age_days * DAY
+    path = run_artifacts.create_run(run_id, "rest")
+    with open(os.path.join(path, "logs", "run.log"), "wb") as f:
+        # random bytes, so packing does not shrink them
+        f.write(os.urandom(size_bytes))
+    if finished:
+        run_artifacts.finish_run(path)
+    clock[0] = saved
+    return path
+
+
+def stored(compressed=None):
+    return [run["run_id"] for run in run_artifacts.list_runs()
+            if compressed is None or run["compressed"] == compressed]
+
+
+def test_runs_past_the_age_limit_are_deleted(artifacts, clock):
+    make_run(clock, "old", age_days=40)
+    make_run(clock, "crashed", age_days=40, finished=False)
+    make_run(clock, "old_latest", age_days=50)
+    make_run(clock, "new", age_days=1)
+    run_artifacts.set_latest("rest", "old_latest")
+
+    result = run_artifacts.maintain()
+    assert sorted(result["deleted"]) == ["crashed", "old"]
+    assert stored() == ["new", "old_latest"]
+    assert run_artifacts.latest_run("rest") == run_artifacts.run_dir("old_latest")
+
+
+def test_runs_beyond_the_newest_ones_are_packed_once(artifacts, clock):
+    artifacts["artifacts_keep_uncompressed"] = "2"
+    for age in range(1, 6):
+        make_run(clock, f"r{age}", age_days=age)
+    make_run(clock, "running", age_days=6, finished=False)
+    run_artifacts.set_latest("rest", "r4")
+
+    assert run_artifacts.maintain()["compressed"] == ["r3", "r5"]
+    assert stored(compressed=True) == ["r3", "r5"]
+    assert stored(compressed=False) == ["r1", "r2", "r4", "running"]
+    with tarfile.open(run_artifacts.run_dir("r3") + run_artifacts.ARCHIVE_SUFFIX) as archive:
+        assert "r3/logs/run.log" in archive.getnames()
+    assert run_artifacts.maintain()["compressed"] == []
+
+
+def test_oldest_runs_are_deleted_while_over_the_total_size(artifacts, clock):
+    artifacts["artifacts_keep_uncompressed"] = "1"
+    artifacts["artifacts_max_total_mb"] = "3.5"
+    for age in range(1, 5):
+        make_run(clock, f"r{age}", age_days=age, size_bytes=MB)
+    make_run(clock, "running", age_days=6, size_bytes=MB, finished=False)
+    run_artifacts.set_latest("rest", "r4")
+
+    result = run_artifacts.maintain()
+    # the latest run and the unfinished run count towards the total but are never deleted
+    assert result["deleted"] == ["r3", "r2"]
+    assert stored() == ["r1", "r4", "running"]
+
+
+def test_results_and_history_of_deleted_runs_go_with_them(artifacts, clock, tmp_path):
+    make_run(clock, "old", age_days=40)
+    make_run(clock, "kept", age_days=40)
+    run_artifacts.set_latest("rest", "kept")
+    for run_id, age_days in (("old", 40), ("kept", 40), ("orphan", 40), ("recent", 1)):
+        path = reporting.results_path(run_id)
+        with open(path, "w") as f:
+            f.write("{}\n")
+        stamp = os.path.getmtime(path) - age_days * DAY
+        os.utime(path, (stamp, stamp))
+    with closing(run_history.connect()) as connection, connection:
+        connection.execute("INSERT INTO runs (run_id, stop) VALUES ('ancient', 0)")
+
+    result = run_artifacts.maintain()
+    assert result["deleted"] == ["old"]
+    assert sorted(result["results_deleted"]) == ["old", "orphan"]
+    assert sorted(reporting.list_runs()) == ["kept", "recent"]
+    assert result["history_deleted"] == ["ancient"]
+
+
+def test_maintain_skips_while_another_process_holds_the_lock(artifacts, clock):
+    make_run(clock, "old", age_days=40)
+    with open(os.path.join(run_artifacts.get_artifacts_dir(), run_artifacts.LOCK_FILE), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        assert run_artifacts.maintain() is None
+    assert stored() == ["old"]
@@ -0,0 +1,132 @@
+import json
+import time
+from contextlib import closing
+
+import pytest
+
+from utilities import reporting, run_history
+
+DAY_MS = 86400 * 1000
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(reporting, "get_results_dir", lambda: str(tmp_path))
+    return str(tmp_path / "history.sqlite")
+
+
+def write_run(run_id, tests, stop_ms=None):
+    """
+    Write a native results file: tests maps a nodeid to (outcome, [(method, endpoint, status_code, latency_ms), ...]).
+    """
+    stop_ms = stop_ms or int(time.time() * 1000)
+    records = []
+    for number, (nodeid, (outcome, requests)) in enumerate(tests.items()):
+        test_id, step_id = f"{run_id}-t{number}", f"{run_id}-s{number}"
+        records.append({"type": "step", "id": step_id, "test": test_id, "step": None, "name": f"step {number}",
+                        "status": "failed" if outcome == "failed" else "passed"})
+        for method, endpoint, status_code, latency_ms in requests:
+            records.append({"type": "request", "test": test_id, "step": step_id, "method": method,
+                            "endpoint": endpoint, "url": f"http://host/{endpoint}", "status_code": status_code,
+                            "latency_ms": latency_ms})
+        records.append({"type": "test", "id": test_id, "run_id": run_id, "nodeid": nodeid, "title": nodeid,
+                        "outcome": outcome, "message": None, "start": stop_ms - 1000, "stop": stop_ms})
+    with open(reporting.results_path(run_id), "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(record) + "\n" for record in records)
+
+
+def test_ingest_stores_the_run_and_its_rollups(db_path):
+    write_run("r1", {
+        "test_a": ("passed", [("GET", "users", 200, 10.0), ("GET", "users", 200, 30.0), ("GET", "users", 200, 20.0)]),
+        "test_b": ("failed", [("POST", "users", 500, 50.0), ("GET", "orders", None, 5.0)]),
+        "test_c": ("skipped", []),
+    })
+    assert run_history.ingest_run("r1", db_path) == 1
+
+    run = run_history.list_runs(db_path=db_path)[0]
+    assert (run["run_id"], run["total"], run["passed"], run["failed"], run["skipped"]) == ("r1", 3, 1, 1, 1)
+    trends = run_history.endpoint_trends(db_path=db_path)
+    assert sorted(trends) == ["GET orders", "GET users", "POST users"]
+    assert trends["GET users"] == [{"run_id": "r1", "requests": 3, "failures": 0, "failure_rate": 0.0,
+                                    "mean_latency_ms": 20.0, "max_latency_ms": 30.0}]
+    # no response counts as a failure, as does a request in a failed step
+    assert trends["GET orders"][0]["failures"] == 1
+    assert trends["POST users"][0]["failure_rate"] == 1.0
+    with closing(run_history.connect(db_path)) as connection:
+        medians = dict(connection.execute("SELECT endpoint || ' ' || method, median_latency_ms FROM endpoint_runs"))
+    assert medians == {"users GET": 20.0, "users POST": 50.0, "orders GET": 5.0}
+
+
+def test_ingesting_a_run_again_replaces_it_in_place(db_path):
+    write_run("r1", {"test_a": ("passed", [("GET", "users", 200, 10.0)])})
+    write_run("r2", {"test_a": ("passed", [("GET", "users", 200, 10.0)])})
+    run_history.ingest_run("r1", db_path)
+    run_history.ingest_run("r2", db_path)
+
+    write_run("r1", {"test_a": ("failed", [("GET", "users", 500, 99.0)])})
+    assert run_history.ingest_run("r1", db_path) == 1
+    assert [run["run_id"] for run in run_history.list_runs(db_path=db_path)] == ["r2", "r1"]
+    assert [point["max_latency_ms"] for point in run_history.endpoint_trends(db_path=db_path)["GET users"]] == \
+        [99.0, 10.0]
+
+
+def test_trends_cover_the_last_runs_and_filter_by_endpoint(db_path):
+    for number in range(1, 5):
+        write_run(f"r{number}", {"test_a": ("passed", [("GET", "users", 200, float(number)),
+                                                       ("GET", "orders", 200, 1.0)])})
+        run_history.ingest_run(f"r{number}", db_path)
+    trends = run_history.endpoint_trends(last_runs=2, endpoint="users", db_path=db_path)
+    assert list(trends) == ["GET users"]
+    assert [point["run_id"] for point in trends["GET users"]] == ["r3", "r4"]
+
+
+def test_flakiness_counts_outcome_flips(db_path):
+    outcomes = {"test_flaky": ["passed", "failed", "passed", "failed"],
+                "test_broken": ["failed", "failed", "failed", "failed"],
+                "test_stable": ["passed", "passed", "skipped", "passed"]}
+    for number in range(4):
+        write_run(f"r{number}", {nodeid: (runs[number], []) for nodeid, runs in outcomes.items()})
+        run_history.ingest_run(f"r{number}", db_path)
+
+    flaky = {row["nodeid"]: row for row in run_history.flaky_sequences(db_path=db_path)}
+    assert [row["nodeid"] for row in run_history.flaky_sequences(db_path=db_path)] == \
+        ["test_flaky", "test_broken", "test_stable"]
+    assert (flaky["test_flaky"]["flips"], flaky["test_flaky"]["flakiness"]) == (3, 1.0)
+    assert (flaky["test_broken"]["failed"], flaky["test_broken"]["flakiness"]) == (4, 0.0)
+    # skipped runs are left out
+    assert flaky["test_stable"]["runs"] == 3
+    assert run_history.flaky_sequences(last_runs=1, db_path=db_path)[0]["flakiness"] == 0.0
+
+
+def test_slowest_steps_across_runs(db_path, monkeypatch):
+    monkeypatch.setattr(run_history, "SLOWEST_PER_RUN", 2)
+    write_run("r1", {"test_a": ("passed", [("GET", "a", 200, 5.0), ("GET", "b", 200, 50.0), ("GET", "c", 200, 7.0)])})
+    write_run("r2", {"test_a": ("passed", [("GET", "d", 200, 40.0)])})
+    run_history.ingest_run("r1", db_path)
+    run_history.ingest_run("r2", db_path)
+
+    slowest = run_history.slowest_steps(limit=10, db_path=db_path)
+    assert [(row["run_id"], row["endpoint"]) for row in slowest] == [("r1", "b"), ("r2", "d")]
+    assert [row["endpoint"] for row in run_history.slowest_steps(db_path=db_path)] == ["b", "d"]
+    assert [row["endpoint"] for row in run_history.slowest_steps(last_runs=1, db_path=db_path)] == ["d"]
+
+
+def test_prune_deletes_old_runs_with_their_rows(db_path):
+    now_ms = int(time.time() * 1000)
+    write_run("old", {"test_a": ("passed", [("GET", "users", 200, 1.0)])}, stop_ms=now_ms - 10 * DAY_MS)
+    write_run("new", {"test_a": ("passed", [("GET", "users", 200, 1.0)])}, stop_ms=now_ms - DAY_MS)
+    run_history.ingest_run("old", db_path)
+    run_history.ingest_run("new", db_path)
+
+    assert run_history.prune(7, db_path) == ["old"]
+    assert [run["run_id"] for run in run_history.list_runs(db_path=db_path)] == ["new"]
+    with closing(run_history.connect(db_path)) as connection:
+        for table in run_history.RUN_TABLES:
+            assert connection.execute(f"SELECT COUNT(*) FROM {table} WHERE run_seq = 1").fetchone()[0] == 0
+
+
+def test_default_path_follows_the_results_dir(db_path, tmp_path, monkeypatch):
+    monkeypatch.setattr(run_history, "get_common_settings", lambda name: None)
+    assert run_history.get_db_path() == str(tmp_path / run_history.DB_FILE_NAME)
+    monkeypatch.setattr(run_history, "get_common_settings", {"run_history_db": "/elsewhere/h.sqlite"}.get)
+    assert run_history.get_db_path() == "/elsewhere/h.sqlite"
@@ -0,0 +1,93 @@
+import threading
+import time
+
+import pytest
+
+from test_data.data_update_helpers import update_payload_with_named_results
+from test_data.read_excel_api_testdata import get_step_parents, group_step_links
+from utilities.api_utils.step_graph import get_ancestors, run_step_graph
+
+#     a
+#    / \
+#   b   c
+#   |   |
+#   d   e
+#    \ /
+#     f
+PARENTS = {"a": [], "b": ["a"], "c": ["a"], "d": ["b"], "e": ["c"], "f": ["d", "e"]}
+STEPS = list(PARENTS)
+
+
+def test_steps_start_after_all_their_parents():
+    finished = []
+
+    def run_step(step, results):
+        assert set(PARENTS[step]) <= set(results)
+        finished.append(step)
+        return step.upper()
+
+    results, failures, not_run = run_step_graph(STEPS, PARENTS, run_step, max_workers=3)
+    assert results == {step: step.upper() for step in STEPS}
+    assert failures == {} and not_run == []
+    assert finished[0] == "a" and finished[-1] == "f"
+
+
+def test_independent_branches_run_concurrently():
+    both_running = threading.Barrier(2, timeout=5)
+
+    def run_step(step, results):
+        if step in ("b", "c"):
+            # deadlocks unless b and c are in flight at the same time
+            both_running.wait()
+
+    results, failures, _ = run_step_graph(STEPS, PARENTS, run_step, max_workers=2)
+    assert failures == {}
+    assert len(results) == 6
+
+
+def test_failed_step_stops_its_descendants_only():
+    ran = []
+
+    def run_step(step, results):
+        ran.append(step)
+        if step == "b":
+            raise AssertionError("b failed")
+        if step == "c":
+            time.sleep(0.05)
+
+    results, failures, not_run = run_step_graph(STEPS, PARENTS, run_step, max_workers=2)
+    assert list(failures) == ["b"] and str(failures["b"]) == "b failed"
+    assert sorted(not_run) == ["d", "f"]
+    assert sorted(results) == ["a", "c", "e"]
+    assert "d" not in ran and "f" not in ran
+
+
+def test_steps_of_a_cycle_are_not_run():
+    parents = {"a": [], "b": ["a", "c"], "c": ["b"]}
+    results, failures, not_run = run_step_graph(list(parents), parents, lambda step, results: None)
+    assert list(results) == ["a"]
+    assert sorted(not_run) == ["b", "c"]
+
+
+def test_ancestors_are_transitive():
+    assert get_ancestors("f", PARENTS) == {"a", "b", "c", "d", "e"}
+    assert get_ancestors("a", PARENTS) == set()
+
+
+def test_parents_come_from_depends_on_and_use_next():
+    steps = [{"test_number": "a", "use_next": "b"}, {"test_number": "b", "depends_on": "x, y"},
+             {"test_number": "c", "depends_on": "a,b"}]
+    assert get_step_parents(steps) == {"a": [], "b": ["x", "y", "a"], "c": ["a", "b"]}
+
+
+def test_flows_are_grouped_in_dependency_order():
+    links = [("f", None, "d,e"), ("a", None, None), ("b", None, "a"), ("c", None, "a"),
+             ("d", None, "b"), ("e", None, "c"), ("z", None, None)]
+    assert group_step_links(links) == [["a", "b", "c", "d", "e", "f"], ["z"]]
+
+
+def test_named_results_read_any_ancestor():
+    results = {"a": {"id": 7, "items": [{"sku": "x"}]}, "b": {"id": 8}}
+    payload = {"first": "$@a.id", "sku": "$@a.items.0.sku", "whole": "$@b", "nested": [{"id": "$@b.id"}]}
+    assert update_payload_with_named_results(payload, results) == \
+        {"first": 7, "sku": "x", "whole": {"id": 8}, "nested": [{"id": 8}]}
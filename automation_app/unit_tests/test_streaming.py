@@ -0,0 +1,95 @@
+import io
+import json
+
+import pytest
+
+from test_data.data_update_helpers import get_value_from_response
+from utilities.api_utils.streaming import ANY_ITEM, KEEP, StreamLimitExceeded, build_selector, extract_fragments, \
+    spool_response
+from utilities.data_verification_utils import is_subset
+
+DOCUMENT = {
+    "status": "ok",
+    "total": 3,
+    "items": [
+        {"id": 1, "name": "a", "tags": ["x"], "blob": "z" * 100},
+        {"id": 2, "name": "b", "tags": ["y"], "blob": "z" * 100},
+        {"id": 3, "name": "c", "tags": [], "blob": "z" * 100},
+    ],
+    "meta": {"page": 1, "debug": {"trace": list(range(50))}},
+}
+
+
+def extract(selector, document=DOCUMENT, budget=1024 * 1024):
+    return extract_fragments(io.BytesIO(json.dumps(document).encode()), selector, budget)
+
+
+def test_selector_from_expected_and_paths():
+    selector = build_selector([{"status": "ok", "items": [{"id": 1}, {"name": "b"}]}, None], ["meta.page"])
+    assert selector == {"status": KEEP, "items": {ANY_ITEM: {"id": KEEP, "name": KEEP}}, "meta": {"page": KEEP}}
+    assert build_selector() == {}
+
+
+def test_only_the_selected_keys_are_kept():
+    selector = build_selector([{"status": "ok", "items": [{"id": 2}]}], ["meta.page"])
+    assert extract(selector) == {"status": "ok", "items": [{"id": 1}, {"id": 2}, {"id": 3}], "meta": {"page": 1}}
+
+
+def test_pruned_document_gives_the_same_subset_result():
+    for expected in ({"items": [{"id": 2, "name": "b"}]}, {"items": [{"id": 2, "name": "c"}]}, {"total": 3}):
+        assert is_subset(extract(build_selector([expected])), expected) == is_subset(DOCUMENT, expected)
+
+
+def test_paths_follow_get_value_from_response():
+    for path in ("items.1.name", "items.first", "meta.debug.trace.2", "total"):
+        assert get_value_from_response(path, extract(build_selector(paths=[path]))) == \
+            get_value_from_response(path, DOCUMENT)
+
+
+def test_digit_path_keeps_the_index_of_its_element():
+    assert extract(build_selector(paths=["items.2.id"])) == {"items": [None, None, {"id": 3}]}
+
+
+def test_empty_selector_keeps_an_empty_document():
+    assert extract({}) == {}
+
+
+def test_scalar_and_list_documents():
+    assert extract(KEEP, document=5) == 5
+    assert extract({ANY_ITEM: {"id": KEEP}}, document=[{"id": 1, "x": 2}]) == [{"id": 1}]
+
+
+def test_budget_counts_kept_fragments_only():
+    selector = build_selector(paths=["total"])
+    assert extract(selector, budget=200) == {"total": 3}
+    with pytest.raises(StreamLimitExceeded):
+        extract(build_selector(paths=["items"]), budget=200)
+
+
+def test_invalid_json():
+    with pytest.raises(ValueError):
+        extract_fragments(io.BytesIO(b'{"a": [1, 2'), KEEP, 1024)
+    with pytest.raises(ValueError):
+        extract_fragments(io.BytesIO(b""), KEEP, 1024)
+
+
+class FakeResponse:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        yield from self.chunks
+
+    def close(self):
+        self.closed = True
+
+
+def test_spool_response_moves_to_disk_above_the_threshold():
+    response = FakeResponse([b"a" * 600, b"b" * 600])
+    spool, size = spool_response(response, in_memory_bytes=1000)
+    with spool:
+        assert size == 1200
+        assert response.closed
+        assert spool._rolled
+        assert spool.read() == b"a" * 600 + b"b" * 600
@@ -0,0 +1,110 @@
+import pytest
+
+from utilities import work_queue
+from utilities.work_queue import WorkQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.sqlite"))
+    queue.settings.update(lease_sec=60, batch_size=2, max_attempts=3)
+    return queue
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # lease expiry reads time.time(), the tests move it forward by hand
+    now = [1_000_000.0]
+    monkeypatch.setattr(work_queue.time, "time", lambda: now[0])
+    return now
+
+
+def test_lease_hands_out_tasks_in_plan_order_once(queue):
+    queue.create_run("r", ["t1", "t2", "t3", "t4", "t5"])
+    assert queue.lease("r", "a") == ["t1", "t2"]
+    assert queue.lease("r", "b") == ["t3", "t4"]
+    assert queue.lease("r", "a", max_tasks=5) == ["t5"]
+
+
+def test_start_and_complete(queue):
+    queue.create_run("r", ["t1"])
+    assert queue.lease("r", "a") == ["t1"]
+    assert queue.start("r", "a", "t1")
+    assert not queue.start("r", "b", "t1")
+    assert queue.complete("r", "a", "t1", "passed", duration_sec=1.5)
+    status = queue.status("r")
+    assert status["drained"]
+    assert status["outcomes"] == {"passed": 1}
+
+
+def test_first_outcome_wins_and_is_counted_once(queue):
+    queue.create_run("r", ["t1", "t2"])
+    queue.lease("r", "a", max_tasks=1)
+    queue.lease("r", "b", max_tasks=1)
+    assert queue.complete("r", "a", "t1", "passed")
+    assert not queue.complete("r", "b", "t1", "failed")
+    assert not queue.complete("r", "a", "t1", "passed")
+    status = queue.status("r")
+    assert status["outcomes"] == {"passed": 1}
+    assert {runner["runner"]: runner["completed"] for runner in status["runners"]} == {"a": 1, "b": 0}
+
+
+def test_idle_runner_steals_half_of_the_largest_backlog_from_its_end(queue):
+    queue.create_run("r", [f"t{number}" for number in range(1, 7)])
+    assert queue.lease("r", "a", max_tasks=4) == ["t1", "t2", "t3", "t4"]
+    assert queue.lease("r", "b", max_tasks=1) == ["t5"]
+    assert queue.lease("r", "c", max_tasks=1) == ["t6"]
+    assert queue.start("r", "a", "t1")
+
+    # a has 3 leased tasks not started, c takes the last ones of them
+    assert queue.lease("r", "c", max_tasks=4) == ["t4", "t3"]
+    assert not queue.start("r", "a", "t4")
+    assert queue.start("r", "a", "t2")
+    assert queue.start("r", "c", "t3")
+
+
+def test_running_tasks_are_never_stolen(queue):
+    queue.create_run("r", ["t1", "t2"])
+    queue.lease("r", "a")
+    queue.start("r", "a", "t1")
+    queue.start("r", "a", "t2")
+    assert queue.lease("r", "b") == []
+
+
+def test_expired_lease_is_requeued(queue, clock):
+    queue.create_run("r", ["t1", "t2", "t3"])
+    assert queue.lease("r", "a") == ["t1", "t2"]
+    queue.start("r", "a", "t1")
+
+    clock[0] += 61
+    assert queue.lease("r", "b", max_tasks=3) == ["t1", "t2", "t3"]
+    assert not queue.start("r", "a", "t2")
+    # the presumed dead runner still finished its task, its outcome counts
+    assert queue.complete("r", "a", "t1", "passed")
+
+
+def test_heartbeat_keeps_the_lease(queue, clock):
+    queue.create_run("r", ["t1", "t2"])
+    queue.lease("r", "a", max_tasks=1)
+    clock[0] += 50
+    assert queue.heartbeat("r", "a") == 1
+    clock[0] += 50
+    assert queue.lease("r", "b") == ["t2"]
+
+
+def test_task_fails_after_max_attempts(queue, clock):
+    queue.create_run("r", ["t1"])
+    for _ in range(3):
+        assert queue.lease("r", "a") == ["t1"]
+        clock[0] += 61
+    assert queue.lease("r", "a") == []
+    status = queue.status("r")
+    assert status["drained"]
+    assert status["outcomes"] == {"failed": 1}
+
+
+def test_create_run_replaces_an_earlier_run_with_the_same_id(queue):
+    queue.create_run("r", ["t1", "t2"])
+    queue.lease("r", "a")
+    queue.create_run("r", ["t3"])
+    assert queue.lease("r", "b") == ["t3"]
@@ -1,6 +1,7 @@
 import logging
 import allure
 import utilities.custom_logger as custom_logger
+from utilities import reporting
 
 """
 A class for checkpoints and logging them as well as assertion
@@ -29,19 +30,19 @@ class ApiTestStatus:
                 if result:
                     self.result_list.append("PASS")
                     self.log.info(f"### VERIFICATION SUCCESSFUL :: {result_message}")
-                    allure.attach(result_message, name=f"Checkpoint Passed -> {checkpoint_name}", attachment_type=allure.attachment_type.TEXT)
+                    reporting.checkpoint(checkpoint_name, True, result_message)
                 else:
                     self.result_list.append("FAIL")
                     self.log.error(f"### VERIFICATION FAILED :: {result_message}")
-                    allure.attach(result_message, name=f"Checkpoint Failed -> {checkpoint_name}", attachment_type=allure.attachment_type.TEXT)
+                    reporting.checkpoint(checkpoint_name, False, result_message)
             else:
                 self.result_list.append("FAIL")
                 self.log.error(f"### VERIFICATION FAILED :: {result_message}")
-                allure.attach(result_message, name=f"Checkpoint Failed -> {checkpoint_name}", attachment_type=allure.attachment_type.TEXT)
+                reporting.checkpoint(checkpoint_name, False, result_message)
         except Exception as e:
             self.result_list.append("FAIL")
             self.log.error(f"### EXCEPTION OCCURRED :: {e}")
-            allure.attach(result_message, name=f"Checkpoint Failed -> {checkpoint_name}", attachment_type=allure.attachment_type.TEXT)
+            reporting.checkpoint(checkpoint_name, False, result_message)
 
     def assert_true(self, result, result_message):
         """
@@ -55,11 +56,11 @@ class ApiTestStatus:
         """
         if result:
             self.log.info(f"### VERIFICATION SUCCESSFUL :: {result_message}")
-            allure.attach(result_message, name="Assertion Passed", attachment_type=allure.attachment_type.TEXT)
+            reporting.attach(result_message, name="Assertion Passed", attachment_type=allure.attachment_type.TEXT)
             assert True
         else:
             self.log.error(f"### VERIFICATION FAILED :: {result_message}")
-            allure.attach(result_message, name="Assertion Failed", attachment_type=allure.attachment_type.TEXT)
+            reporting.attach(result_message, name="Assertion Failed", attachment_type=allure.attachment_type.TEXT)
             assert False, result_message
 
     def soft_assert_false(self, result, result_message,  checkpoint_name=''):
@@ -78,19 +79,19 @@ class ApiTestStatus:
                 if result is False:
                     self.result_list.append("PASS")
                     self.log.info(f"### VERIFICATION SUCCESSFUL :: {result_message}")
-                    allure.attach(result_message, name=f"Checkpoint Passed -> {checkpoint_name}", attachment_type=allure.attachment_type.TEXT)
+                    reporting.checkpoint(checkpoint_name, True, result_message)
                 else:
                     self.result_list.append("FAIL")
                     self.log.error(f"### VERIFICATION FAILED :: {result_message}")
-                    allure.attach(result_message, name=f"Checkpoint Failed -> {checkpoint_name}", attachment_type=allure.attachment_type.TEXT)
+                    reporting.checkpoint(checkpoint_name, False, result_message)
             else:
                 self.result_list.append("FAIL")
                 self.log.error(f"### VERIFICATION FAILED :: {result_message}")
-                allure.attach(result_message, name=f"Checkpoint Failed -> {checkpoint_name}", attachment_type=allure.attachment_type.TEXT)
+                reporting.checkpoint(checkpoint_name, False, result_message)
         except Exception as e:
             self.result_list.append("FAIL")
             self.log.error(f"### EXCEPTION OCCURRED :: {e}")
-            allure.attach(result_message, name=f"Checkpoint Failed -> {checkpoint_name}", attachment_type=allure.attachment_type.TEXT)
+            reporting.checkpoint(checkpoint_name, False, result_message)
 
     def assert_false(self, result, result_message):
         """
@@ -104,11 +105,11 @@ class ApiTestStatus:
         """
         if result is False:
             self.log.info(f"### VERIFICATION SUCCESSFUL :: {result_message}")
-            allure.attach(result_message, name="Assertion Passed", attachment_type=allure.attachment_type.TEXT)
+            reporting.attach(result_message, name="Assertion Passed", attachment_type=allure.attachment_type.TEXT)
             assert True
         else:
             self.log.error(f"### VERIFICATION FAILED :: {result_message}")
-            allure.attach(result_message, name="Assertion Failed", attachment_type=allure.attachment_type.TEXT)
+            reporting.attach(result_message, name="Assertion Failed", attachment_type=allure.attachment_type.TEXT)
             assert False, result_message
 
     def assert_final(self, result_message):
@@ -122,10 +123,10 @@ class ApiTestStatus:
         if "FAIL" in self.result_list:
             self.result_list.clear()
             self.log.error(f"### TEST FAILED :: {result_message}")
-            allure.attach("", name=f"Test Failed -> {result_message}", attachment_type=allure.attachment_type.TEXT)
+            reporting.attach("", name=f"Test Failed -> {result_message}", attachment_type=allure.attachment_type.TEXT)
             assert False, result_message
         else:
             self.result_list.clear()
             self.log.info(f"### TEST PASSED :: {result_message}")
-            allure.attach("", name=f"Test Pass -> {result_message}", attachment_type=allure.attachment_type.TEXT)
+            reporting.attach("", name=f"Test Pass -> {result_message}", attachment_type=allure.attachment_type.TEXT)
             assert True
\ No newline at end of file
@@ -0,0 +1,120 @@
+import hashlib
+import logging
+import time
+
+from api_fixtures.endpoints import RestAPIEndpoints
+from test_data.data_update_helpers import get_value_from_response
+from test_data.read_settings_file import get_graphql_settings, get_rest_api_settings
+from utilities import custom_logger
+from utilities.api_utils.requests import Client
+from utilities.shared_state import SharedJsonStore
+
+"""
+Credential provider shared by all sequences and pytest-xdist workers.
+
+The token from the LOGIN endpoint is cached with its expiry in a file-locked store, one per
+API, base url and username, readable by the owner only. The REST and GraphQL APIs log in with
+their own base url and credentials; the login response is read the same way for both. Only the process that finds the token missing
+or about to expire logs in; the other workers wait on the lock and then read the fresh token.
+"""
+
+
+def _store_key(url, username):
+    return hashlib.sha256(f"{url}|{username}".encode()).hexdigest()[:16]
+
+
+class CredentialProvider:
+    log = custom_logger.customlogger(logging.DEBUG)
+
+    def __init__(self, store_name=None, base_url=None, api="rest"):
+        get_api_settings = get_graphql_settings if api == "graphql" else get_rest_api_settings
+        self.url = (base_url or get_api_settings("base_url") or "").rstrip("/")
+        self.username = get_api_settings("username")
+        # another API, environment or user never reuses the cached token
+        store_name = store_name or f"{api}_auth_token-{_store_key(self.url, self.username)}"
+        self.store = SharedJsonStore(store_name, mode=0o600)
+        self.password = get_api_settings("password")
+        self.token_path = get_rest_api_settings("auth_token_path") or "token"
+        self.expires_path = get_rest_api_settings("auth_expires_path") or "expires_in"
+        self.default_ttl = float(get_rest_api_settings("auth_ttl_sec") or 3600)
+        self.refresh_margin = float(get_rest_api_settings("auth_refresh_margin_sec") or 60)
+        self._token = None
+        self._expires_at = 0.0
+
+    def _is_fresh(self, expires_at):
+        return time.time() < expires_at - self.refresh_margin
+
+    def _expiry_from_response(self, data):
+        """
+        Read the expiry from the login response. Small numbers are a lifetime in seconds,
+        large ones an epoch timestamp. Falls back to REST_AUTH_TTL_SEC.
+        """
+        expires = get_value_from_response(self.expires_path, data) if isinstance(data, (dict, list)) else None
+        try:
+            expires = float(expires)
+        except (TypeError, ValueError):
+            return time.time() + self.default_ttl
+        return expires if expires > 1_000_000_000 else time.time() + expires
+
+    def _login(self):
+        """
+        Log in with the username/password of the API (REST_USERNAME or GRAPHQL_USERNAME).
+
+        :return: (token, expires_at)
+        """
+        full_url = f"{self.url}/{RestAPIEndpoints.LOGIN}"
+        self.log.info(f"Requesting a new auth token from {full_url}")
+        response = Client.request(
+            method="POST",
+            url=full_url,
+            json={"username": self.username, "password": self.password},
+            headers={"Content-Type": "application/json"},
+        )
+        response.raise_for_status()
+        data = response.json()
+        token = get_value_from_response(self.token_path, data)
+        if not token:
+            raise ValueError(f"Login response has no token at '{self.token_path}'")
+        return token, self._expiry_from_response(data)
+
+    def get_token(self):
+        """
+        Return a valid token, logging in only when the shared cache is empty or about to expire.
+
+        :return: the auth token
+        """
+        if self._token and self._is_fresh(self._expires_at):
+            return self._token
+
+        with self.store.transaction() as state:
+            if not (state.get("token") and self._is_fresh(state.get("expires_at", 0))):
+                state["token"], state["expires_at"] = self._login()
+                self.log.info("Auth token refreshed and cached for all workers")
+            self._token, self._expires_at = state["token"], state["expires_at"]
+        return self._token
+
+    def invalidate(self):
+        """
+        Drop the cached token, e.g. after the backend rejected it.
+        """
+        with self.store.transaction() as state:
+            state.clear()
+        self._token, self._expires_at = None, 0.0
+
+
+_providers = {}
+
+
+def get_credential_provider(base_url=None, api="rest"):
+    """
+    Return the process-wide CredentialProvider of an API and base url.
+
+    :param base_url: url of the environment to log in to, the API's base url when None
+    :param api: "rest" or "graphql", whose settings give the url and credentials
+    """
+    key = (api, base_url)
+    provider = _providers.get(key)
+    if provider is None:
+        # fan-out threads may race here, the store lock keeps them to one login
+        provider = _providers.setdefault(key, CredentialProvider(base_url=base_url, api=api))
+    return provider
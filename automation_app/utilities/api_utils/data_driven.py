@@ -0,0 +1,256 @@
+import json
+import logging
+import os
+import threading
+import time
+from array import array
+from collections import ChainMap
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from test_data.data_update_helpers import compile_config_template, process_config_value
+from test_data.plan_readers import PLAN_READERS, ROW_KEY, iter_plan_records
+from test_data.read_settings_file import get_rest_api_settings
+from utilities import custom_logger, reporting
+from utilities.api_utils.requests import Client
+from utilities.data_verification_utils import diff_json, format_differences, is_subset
+
+"""
+Data-driven steps: one row of the plan expanded into a request per row of a data source.
+
+The data_source cell names a data file in test_data/ ('users.csv', 'users.xlsx#accounts', a
+.jsonl or .parquet file) or a sheet of the .xlsx plan ('users'). Every data row is a variant:
+its columns fill the '##<column>' placeholders of the step, before the configs, in payload,
+api_name, base_url, use_creds and the expected outcome, header and schema columns.
+
+All the variants run inside the step's test item. They are read lazily and sent from one
+thread pool kept for the whole session, at most twice REST_DATA_DRIVEN_CONCURRENCY in flight,
+so the pooled Session of each thread keeps its connections and memory does not grow with the
+data source: results are folded into counts and latencies as they arrive and only failed
+variants are kept, up to MAX_FAILURES_KEPT. Variants are checked without Allure steps or
+attachments of their own; the step gets one summary and the failure detail of the failed variants.
+"""
+
+log = custom_logger.customlogger(logging.DEBUG)
+
+DEFAULT_CONCURRENCY = 16
+DEFAULT_XLSX_SHEET = "data"  # sheet of a data_source workbook named without '#<sheet>'
+VARIANT_FIELDS = ("payload", "api_name", "expected_outcome", "un_expected_outcome", "expected_response_header",
+                  "response_schema")
+MAX_DIFFERENCES_PER_VARIANT = 5
+MAX_FAILURES_SHOWN = 50  # in the summary text
+MAX_FAILURES_KEPT = 1000  # in the failures attachment, the first ones by sheet row; the others are only counted
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_concurrency():
+    return int(get_rest_api_settings("data_driven_concurrency") or DEFAULT_CONCURRENCY)
+
+
+def _get_pool(size):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=size, thread_name_prefix="variant")
+    return _pool
+
+
+def parse_data_source(data_source, plan_file):
+    """
+    :param data_source: the data_source cell, '<file>', '<file>#<sheet>' or '<sheet of the plan>'
+    :param plan_file: the plan file name
+    :return: (file name, sheet name) to read the variants from
+    """
+    name, _, sheet = str(data_source).strip().partition("#")
+    if os.path.splitext(name)[1].lower() in PLAN_READERS:
+        return name, sheet or DEFAULT_XLSX_SHEET
+    if not str(plan_file).lower().endswith(".xlsx"):
+        raise ValueError(f"data_source '{data_source}' is not a data file, and a {os.path.splitext(plan_file)[1]} "
+                         f"plan has no sheets")
+    return plan_file, name
+
+
+def _variable(value):
+    # typed like the configs sheet: int[5] -> 5, true/false -> booleans
+    return process_config_value(value) if isinstance(value, str) else value
+
+
+def iter_variants(data_source, plan_file):
+    """
+    Yield (sheet row, variables) for every row of a data source.
+    """
+    file_name, sheet_name = parse_data_source(data_source, plan_file)
+    for record in iter_plan_records(file_name, sheet_name):
+        yield record[ROW_KEY], {key: _variable(value) for key, value in record.items() if key != ROW_KEY}
+
+
+def get_variable_names(data_source, plan_file):
+    """
+    :return: the columns of the first row of a data source
+    """
+    for _, variables in iter_variants(data_source, plan_file):
+        return set(variables)
+    return set()
+
+
+def _schema_validator(schema):
+    from jsonschema.validators import validator_for
+
+    validator_class = validator_for(schema)
+    validator_class.check_schema(schema)
+    return validator_class(schema)
+
+
+def _check_variant(expected, data, headers, validator):
+    """
+    :return: the failed checks of a variant's response, one message each
+    """
+    failures = []
+    if validator is not None:
+        error = next(validator.iter_errors(data), None)
+        if error is not None:
+            path = "$" + "".join(f"[{part}]" if isinstance(part, int) else f".{part}" for part in error.absolute_path)
+            failures.append(f"response_schema {path}: {error.message}")
+    if expected["expected_outcome"] is not None and not is_subset(data, expected["expected_outcome"]):
+        differences = diff_json(expected["expected_outcome"], data, subset=True,
+                                max_differences=MAX_DIFFERENCES_PER_VARIANT)
+        failures.append("expected_outcome:\n" + format_differences(differences))
+    if expected["un_expected_outcome"] is not None and is_subset(data, expected["un_expected_outcome"]):
+        failures.append(f"un_expected_outcome: the response contains {json.dumps(expected['un_expected_outcome'])}")
+    if expected["expected_response_header"] is not None and not is_subset(headers, expected["expected_response_header"]):
+        differences = diff_json(expected["expected_response_header"], headers, subset=True,
+                                max_differences=MAX_DIFFERENCES_PER_VARIANT)
+        failures.append("expected_response_header:\n" + format_differences(differences))
+    return failures
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else None
+
+
+def run_data_driven_step(test_data, auth_header, base_url, config_values, plan_file):
+    """
+    Send the request of a data-driven step once per variant of its data source, concurrently.
+
+    :param test_data: the step, as extract_test_data returns it, with its '##' placeholders left in
+    :param auth_header: header of the sequence
+    :param base_url: base url of the sequence, 'use_env_url' for the one from the settings
+    :param config_values: config values, variables of a variant take precedence over them
+    :param plan_file: plan file name, for data sources that are sheets of the plan
+    :return: summary with total, passed, failed, elapsed_sec, requests_per_sec, latency_ms
+        (p50, p95, max), failures (sheet row, variables, status code and failed checks of the
+        first MAX_FAILURES_KEPT failed variants by row), first_response and first_status_code
+        (of the first variant, whose data '$$' of later steps read)
+    """
+    templates = {field: compile_config_template(test_data[field]) for field in VARIANT_FIELDS}
+    header_template = compile_config_template(auth_header)
+    base_url_template = compile_config_template(base_url)
+    env_url = get_rest_api_settings("base_url")
+    timeout = (test_data["connect_timeout_sec"], test_data["read_timeout_sec"])
+    method = test_data["request_type"]
+    # the schema is compiled once, unless a variable changes it
+    shared_validator = _schema_validator(test_data["response_schema"]) if test_data["response_schema"] is not None else None
+    first_response = {}
+
+    def run_variant(index, variant):
+        row, variables = variant
+        values = ChainMap(variables, config_values or {})
+        rendered = {field: template(values) for field, template in templates.items()}
+        url = base_url_template(values)
+        url = f"{env_url if url == 'use_env_url' else url}/{rendered['api_name']}"
+        header = header_template(values)
+        header = header if header is not None else {"Content-Type": "application/json"}
+        result = {"row": row, "variables": variables, "status_code": None, "latency_ms": None, "failures": []}
+
+        start = time.perf_counter()
+        try:
+            response = Client.request(method=method, url=url, json=rendered["payload"], headers=header, timeout=timeout)
+        except Exception as e:
+            result["latency_ms"] = (time.perf_counter() - start) * 1000
+            result["failures"].append(f"request failed: {e}")
+            reporting.record_request(method, rendered["api_name"], url, None, result["latency_ms"] / 1000)
+            return result
+        try:
+            data = response.json()
+        except ValueError:
+            data = []
+        result["latency_ms"] = (time.perf_counter() - start) * 1000
+        result["status_code"] = response.status_code
+        reporting.record_request(method, rendered["api_name"], url, response.status_code, result["latency_ms"] / 1000)
+        if index == 0:
+            first_response.update(data=data, status_code=response.status_code)
+
+        schema = rendered["response_schema"]
+        try:
+            validator = shared_validator if schema is test_data["response_schema"] else (
+                _schema_validator(schema) if schema is not None else None)
+            result["failures"] = _check_variant(rendered, data, dict(response.headers), validator)
+        except Exception as e:
+            result["failures"].append(f"checks failed: {e}")
+        return result
+
+    latencies, failures = array("d"), []
+    failed = 0
+
+    def collect(result):
+        nonlocal failed
+        latencies.append(result["latency_ms"])
+        if result["failures"]:
+            failed += 1
+            failures.append(result)
+            if len(failures) >= 2 * MAX_FAILURES_KEPT:
+                failures.sort(key=lambda failure: failure["row"])
+                del failures[MAX_FAILURES_KEPT:]
+
+    concurrency = get_concurrency()
+    pool = _get_pool(concurrency)
+    pending = set()
+    start = time.perf_counter()
+    for index, variant in enumerate(iter_variants(test_data["data_source"], plan_file)):
+        if len(pending) >= 2 * concurrency:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                collect(future.result())
+        pending.add(pool.submit(run_variant, index, variant))
+    for future in pending:
+        collect(future.result())
+    elapsed = time.perf_counter() - start
+
+    total = len(latencies)
+    failures = sorted(failures, key=lambda failure: failure["row"])[:MAX_FAILURES_KEPT]
+    latencies = sorted(latencies)
+    log.info(f"Data-driven step {test_data['test_number']}: {total - failed} of {total} "
+             f"variants passed in {elapsed:.2f}s")
+    return {
+        "total": total,
+        "passed": total - failed,
+        "failed": failed,
+        "elapsed_sec": elapsed,
+        "requests_per_sec": total / elapsed if elapsed > 0 else None,
+        "latency_ms": {"p50": _percentile(latencies, 0.5), "p95": _percentile(latencies, 0.95),
+                       "max": latencies[-1] if latencies else None},
+        "failures": failures,
+        "first_response": first_response.get("data", {}),
+        "first_status_code": first_response.get("status_code"),
+    }
+
+
+def format_summary(summary, data_source):
+    """
+    :return: the totals, throughput and latency of a data-driven step, then its failed variants
+    """
+    latency = summary["latency_ms"]
+    lines = [f"{summary['passed']} of {summary['total']} variants of {data_source} passed, {summary['failed']} failed",
+             f"{summary['elapsed_sec']:.2f}s, {summary['requests_per_sec'] or 0:.1f} requests/s"]
+    if latency["p50"] is not None:
+        lines.append(f"latency p50 {latency['p50']:.1f} ms, p95 {latency['p95']:.1f} ms, max {latency['max']:.1f} ms")
+    for failure in summary["failures"][:MAX_FAILURES_SHOWN]:
+        lines.append("")
+        lines.append(f"row {failure['row']} {json.dumps(failure['variables'], default=str)} -> {failure['status_code']}")
+        lines.extend("  " + line for message in failure["failures"] for line in message.splitlines())
+    if summary["failed"] > MAX_FAILURES_SHOWN:
+        lines.append("")
+        lines.append(f"... {summary['failed'] - MAX_FAILURES_SHOWN} more failed variants, the first "
+                     f"{len(summary['failures'])} by row are in Data-Driven Failures")
+    return "\n".join(lines)
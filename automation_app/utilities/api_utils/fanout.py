@@ -0,0 +1,125 @@
+import json
+import logging
+import textwrap
+from concurrent.futures import ThreadPoolExecutor
+
+from test_data.read_settings_file import get_rest_api_settings
+from utilities import custom_logger
+from utilities.data_verification_utils import diff_json, format_differences, get_diff_options
+
+"""
+Runs every sequence against several environments at once and compares them step by step.
+
+REST_FANOUT_BASE_URLS names the environments, {"staging": "https://...", "production": "https://..."}.
+Each sequence runs once per environment, concurrently, so a fan-out run takes about as long as
+the slowest environment rather than the sum. Every sequence gets a fresh pool, like the steps of a
+flow graph: allure-pytest ties a thread to the test it first reported to, so a pool kept across
+tests would report the environment steps of later tests to the first one.
+The first environment is the baseline: every other one is compared with it on status code,
+latency and the JSON body, where keys matching REST_FANOUT_IGNORE_FIELDS are skipped.
+"""
+
+log = custom_logger.customlogger(logging.DEBUG)
+
+DEFAULT_IGNORE_FIELDS = "*_at,*timestamp*,*time,date,*token*,request_id,trace_id,etag"
+MAX_DIFFERENCES_SHOWN = 20  # per step and environment in the comparison text
+
+def get_environments():
+    """
+    :return: {name: base url} in the order of REST_FANOUT_BASE_URLS, empty when fan-out is off
+    """
+    raw = get_rest_api_settings("fanout_base_urls")
+    environments = json.loads(raw) if raw else {}
+    if not isinstance(environments, dict):
+        raise ValueError("REST_FANOUT_BASE_URLS must be a JSON object of environment name to base url")
+    return {str(name): str(url).rstrip("/") for name, url in environments.items()}
+
+
+def get_ignore_fields():
+    raw = get_rest_api_settings("fanout_ignore_fields")
+    raw = DEFAULT_IGNORE_FIELDS if raw is None else raw
+    return tuple(field.strip() for field in raw.split(",") if field.strip())
+
+
+def run_environments(environments, run_environment):
+    """
+    Run a sequence in every environment concurrently.
+
+    :param environments: {name: base url}
+    :param run_environment: called as run_environment(name, base_url, observations) in a pool
+        thread; it fills observations with {test_number: observation} for the steps it runs
+    :return: {name: (observations, exception or None)}
+    """
+    futures = {}
+    outcomes = {}
+    # a fresh pool per sequence, allure keeps its test context per thread
+    with ThreadPoolExecutor(max_workers=len(environments), thread_name_prefix="fanout") as pool:
+        for name, base_url in environments.items():
+            observations = {}
+            futures[name] = (observations, pool.submit(run_environment, name, base_url, observations))
+
+        for name, (observations, future) in futures.items():
+            try:
+                future.result()
+                outcomes[name] = (observations, None)
+            except BaseException as e:
+                if isinstance(e, KeyboardInterrupt):
+                    raise
+                log.error(f"Sequence failed in environment {name}: {e}")
+                outcomes[name] = (observations, e)
+    return outcomes
+
+
+def compare_environments(steps, outcomes, ignore_fields=()):
+    """
+    Compare each step of every environment with the baseline (first) environment.
+
+    :param steps: test numbers of the sequence, in order
+    :param outcomes: result of run_environments
+    :return: one dictionary per step with the status code and latency per environment, the body
+        differences per environment and whether anything differs
+    """
+    names = list(outcomes)
+    baseline = names[0]
+    options = get_diff_options()
+    rows = []
+    for step in steps:
+        observed = {name: outcomes[name][0].get(step) for name in names}
+        row = {
+            "test_number": step,
+            "status_code": {name: (obs or {}).get("status_code") for name, obs in observed.items()},
+            "latency_ms": {name: (obs or {}).get("latency_ms") for name, obs in observed.items()},
+            "differences": {},
+        }
+        for name in names[1:]:
+            if observed[baseline] is not None and observed[name] is not None:
+                row["differences"][name] = diff_json(observed[baseline].get("data"), observed[name].get("data"),
+                                                     ignore_fields, **options)
+        row["differs"] = (len(set(row["status_code"].values())) > 1
+                          or any(row["differences"].values())
+                          or any(obs is None for obs in observed.values()))
+        rows.append(row)
+    return rows
+
+
+def format_comparison(rows, names):
+    """
+    :return: the comparison as a text table followed by the body differences of each step
+    """
+    header = ["step", *[f"{name} status" for name in names], *[f"{name} ms" for name in names], "same"]
+    lines = [" | ".join(header)]
+    for row in rows:
+        cells = [str(row["test_number"])]
+        cells += [str(row["status_code"][name]) if row["status_code"][name] is not None else "-" for name in names]
+        cells += [f"{row['latency_ms'][name]:.1f}" if row["latency_ms"][name] is not None else "-" for name in names]
+        cells.append("no" if row["differs"] else "yes")
+        lines.append(" | ".join(cells))
+
+    for row in rows:
+        for name, differences in row["differences"].items():
+            if not differences:
+                continue
+            lines.append("")
+            lines.append(f"{row['test_number']}: {len(differences)} difference(s) of {name} from {names[0]}")
+            lines.append(textwrap.indent(format_differences(differences, MAX_DIFFERENCES_SHOWN), "  "))
+    return "\n".join(lines)
@@ -0,0 +1,160 @@
+import json
+import logging
+import os
+import time
+from email.utils import parsedate_to_datetime
+
+from test_data.read_settings_file import get_rest_api_settings
+from utilities import custom_logger
+from utilities.api_utils.resilience import host_key
+from utilities.api_utils.timeouts import DeadlineExceeded, remaining_time
+from utilities.shared_state import SharedJsonStore
+
+"""
+Token-bucket rate limiting for the Client layer, shared by all pytest-xdist workers.
+
+REST_RATE_LIMITS maps url prefixes (a base_url or a single endpoint) to a bucket, e.g.
+{"https://staging.example.com": {"rate": 10, "burst": 20}, "https://staging.example.com/search": 2}.
+A request draws from the bucket of the longest matching prefix. Retry-After answers block the
+bucket (or the whole host, if it has no bucket) for every worker until the time has passed.
+"""
+
+THROTTLED_STATUS_CODES = {429, 503}
+
+
+class RateLimitError(Exception):
+    """
+    Raised when a request would have to wait longer than REST_RATE_LIMIT_MAX_WAIT_SEC.
+    """
+
+
+def parse_retry_after(value):
+    """
+    :param value: Retry-After header, either delay seconds or an HTTP date
+    :return: seconds to wait, or None if the header is missing or invalid
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """
+    Each bucket holds up to 'burst' tokens and refills at 'rate' tokens per second. The bucket
+    state lives in a file-locked store, so the limit holds for the whole machine, not per worker.
+    """
+    log = custom_logger.customlogger(logging.DEBUG)
+
+    def __init__(self, store_name="rate_limits"):
+        self.store = SharedJsonStore(store_name)
+        self.max_wait = float(get_rest_api_settings("rate_limit_max_wait_sec") or 120)
+        self.limits = {}
+        for prefix, limit in json.loads(get_rest_api_settings("rate_limits") or "{}").items():
+            limit = limit if isinstance(limit, dict) else {"rate": limit}
+            rate = float(limit["rate"])
+            self.limits[prefix.rstrip("/")] = (rate, float(limit.get("burst", max(rate, 1))))
+        # longest prefix first, so an endpoint limit wins over its base_url limit
+        self.prefixes = sorted(self.limits, key=len, reverse=True)
+        self._store_version = None
+        self._blocked_until = {}
+
+    def bucket_key(self, url):
+        for prefix in self.prefixes:
+            if url.startswith(prefix):
+                return prefix
+        return None
+
+    def acquire(self, url):
+        """
+        Wait until the request may be sent.
+
+        :raises RateLimitError: if the wait exceeds REST_RATE_LIMIT_MAX_WAIT_SEC
+        :raises DeadlineExceeded: if the wait would outlive the run deadline
+        """
+        key = self.bucket_key(url)
+        host = host_key(url)
+        if key is None and not self._host_blocked(host):
+            # unlimited host that no worker has seen a Retry-After from, skip the store transaction
+            return
+        waited = 0.0
+        while True:
+            wait = self._take_token(key, host)
+            if wait <= 0:
+                if waited:
+                    self.log.info(f"Rate limited {url} for {waited:.2f}s")
+                return
+            waited += wait
+            remaining = remaining_time()
+            if remaining is not None and wait > remaining:
+                raise DeadlineExceeded(f"Rate limit for {key or host} would outlive the run deadline")
+            if waited > self.max_wait:
+                raise RateLimitError(f"Rate limit for {key or host} needs more than {self.max_wait:.0f}s of waiting")
+            time.sleep(wait)
+
+    def _host_blocked(self, host):
+        """
+        Whether any worker recorded a Retry-After block of the host that has not passed yet. The
+        store is only read again when its file changed, every write replaces it with a new inode.
+        """
+        try:
+            stat = os.stat(self.store.path)
+        except FileNotFoundError:
+            return False
+        version = (stat.st_ino, stat.st_mtime_ns)
+        if version != self._store_version:
+            self._store_version = version
+            self._blocked_until = {name: bucket["blocked_until"] for name, bucket in self.store.read().items()
+                                   if bucket.get("blocked_until")}
+        return self._blocked_until.get(host, 0) > time.time()
+
+    def _take_token(self, key, host):
+        """
+        :return: 0 if a token was taken, else the seconds to wait before trying again
+        """
+        now = time.time()
+        with self.store.transaction() as buckets:
+            blocked_until = max(buckets.get(key, {}).get("blocked_until", 0) if key else 0,
+                                buckets.get(host, {}).get("blocked_until", 0))
+            if blocked_until > now:
+                return blocked_until - now
+            if key is None:
+                return 0
+            rate, burst = self.limits[key]
+            bucket = buckets.setdefault(key, {})
+            bucket.setdefault("tokens", burst)
+            bucket.setdefault("updated", now)
+            bucket["tokens"] = min(burst, bucket["tokens"] + (now - bucket["updated"]) * rate)
+            bucket["updated"] = now
+            if bucket["tokens"] >= 1:
+                bucket["tokens"] -= 1
+                return 0
+            return (1 - bucket["tokens"]) / rate
+
+    def record_response(self, url, response):
+        """
+        Honor the Retry-After header of a 429/503 answer by blocking the bucket for all workers.
+
+        :return: the Retry-After delay in seconds, or None when the answer is not throttled
+        """
+        if response.status_code not in THROTTLED_STATUS_CODES:
+            return None
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        if retry_after is None:
+            return None
+        key = self.bucket_key(url) or host_key(url)
+        with self.store.transaction() as buckets:
+            bucket = buckets.setdefault(key, {})
+            bucket["blocked_until"] = max(bucket.get("blocked_until", 0), time.time() + retry_after)
+            # drain the bucket, the server just told us it is over its limit; it refills from the block's end
+            if "tokens" in bucket:
+                bucket["tokens"] = 0
+                bucket["updated"] = bucket["blocked_until"]
+        self.log.info(f"{response.status_code} from {url}, Retry-After {retry_after:.2f}s for {key}")
+        return retry_after
@@ -1,8 +1,49 @@
-import requests
-from requests import Response
+from __future__ import annotations
+
+import threading
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from requests import Response
 
 
 class Client:
+    _breakers = None
+    _retry_policy = None
+    _rate_limiter = None
+    _init_lock = threading.Lock()
+    _local = threading.local()
+
+    @classmethod
+    def _resilience(cls):
+        # created on first request, they read settings and open the shared state stores
+        with cls._init_lock:
+            if cls._breakers is None:
+                from utilities.api_utils.rate_limiter import RateLimiter
+                from utilities.api_utils.resilience import CircuitBreakers, RetryPolicy
+
+                cls._retry_policy = RetryPolicy()
+                cls._rate_limiter = RateLimiter()
+                cls._breakers = CircuitBreakers()
+        return cls._breakers, cls._retry_policy, cls._rate_limiter
+
+    @classmethod
+    def _session(cls):
+        """
+        One pooled Session per thread, so keep-alive connections are reused across requests
+        while parallel steps never share a Session. Cookies are not kept between requests,
+        as with a plain requests.request call.
+        """
+        session = getattr(cls._local, "session", None)
+        if session is None:
+            import requests
+            from http.cookiejar import DefaultCookiePolicy
+
+            session = requests.Session()
+            session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+            cls._local.session = session
+        return session
+
     @staticmethod
     def request(method: str, url: str, **kwargs) -> Response:
         """
@@ -14,7 +55,49 @@ class Client:
             params – (optional) Dictionary, list of tuples or bytes to send in the query string for the Request. # noqa
             json – (optional) A JSON serializable Python object to send in the body of the Request. # noqa
             headers – (optional) Dictionary of HTTP Headers to send with the Request.
+            timeout – (optional) (connect, read) tuple, either part None to use the configured default. # noqa
+            stream – (optional) if True, the body is not downloaded until it is read. # noqa
+
+        Requests to a host whose circuit breaker is open raise CircuitOpenError without
+        touching the network. Connection failures and 502/503/504 answers to idempotent
+        methods are retried with jittered backoff while the run-wide retry budget lasts.
+        Requests wait for a token of their REST_RATE_LIMITS bucket; 429 answers are retried
+        for any method after their Retry-After, shared with all workers.
+        Every attempt carries an explicit timeout capped by the run deadline; once the
+        deadline has passed DeadlineExceeded is raised instead of sending.
         """
-        return requests.request(method, url, **kwargs)
+        import requests  # imported on first request, keeps it out of test collection
+        from utilities.api_utils.resilience import RETRYABLE_STATUS_CODES, host_key
+        from utilities.api_utils.timeouts import resolve_timeout
 
+        breakers, retry_policy, rate_limiter = Client._resilience()
+        host = host_key(url)
+        connect_timeout, read_timeout = kwargs.pop("timeout", None) or (None, None)
+        attempt = 0
+        while True:
+            breakers.before_request(host)
+            rate_limiter.acquire(url)
+            timeout = resolve_timeout(url, connect_timeout, read_timeout)
+            try:
+                response = Client._session().request(method, url, timeout=timeout, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                breakers.record_failure(host, e)
+                if breakers.is_open(host) or not retry_policy.can_retry(method, attempt) or not retry_policy.take_budget():
+                    raise
+                retry_policy.sleep_before_retry(attempt)
+                attempt += 1
+                continue
 
+            breakers.record_success(host)
+            retry_after = rate_limiter.record_response(url, response)
+            # a 429 was not processed by the server, so it is safe to resend for any method
+            retryable = (response.status_code == 429 and attempt < retry_policy.max_retries
+                         or response.status_code in RETRYABLE_STATUS_CODES and retry_policy.can_retry(method, attempt))
+            if retryable and retry_policy.take_budget():
+                response.close()  # frees the connection of a stream=True response
+                if retry_after is None:
+                    retry_policy.sleep_before_retry(attempt)
+                # with Retry-After, rate_limiter.acquire() waits for the block to pass
+                attempt += 1
+                continue
+            return response
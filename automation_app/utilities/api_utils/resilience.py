@@ -0,0 +1,157 @@
+import glob
+import logging
+import os
+import random
+import time
+from urllib.parse import urlsplit
+
+from test_data.read_settings_file import get_rest_api_settings
+from utilities import custom_logger
+from utilities.reporting import get_run_id
+from utilities.shared_state import STATE_DIR, SharedJsonStore
+
+"""
+Per-host circuit breakers and a run-wide retry budget for the Client layer.
+
+Both live in file-locked stores named after the RUN_ID, so every pytest-xdist worker and
+queue runner of a run sees the same breaker state and draws from the same retry budget, while
+runs started side by side keep their own. reset_run_state() is called once per run by the
+controller process.
+"""
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE", "TRACE"}
+RETRYABLE_STATUS_CODES = {502, 503, 504}
+RUN_STORES = ("circuit_breakers", "retry_budget")
+STALE_RUN_STATE_SEC = 24 * 3600  # stores of other runs untouched for this long are removed
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of sending a request to a host whose circuit breaker is open.
+    """
+
+
+def run_store_name(name, run_id=None):
+    return f"{name}-{run_id or get_run_id()}"
+
+
+def host_key(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class CircuitBreakers:
+    """
+    Trips the breaker of a host after 'threshold' consecutive connection failures.
+    While open, requests to the host fail immediately. After 'cooldown' seconds one
+    trial request is let through (half-open); its outcome closes or re-opens the breaker.
+    """
+    log = custom_logger.customlogger(logging.DEBUG)
+
+    def __init__(self, store_name=None):
+        self.store = SharedJsonStore(store_name or run_store_name("circuit_breakers"))
+        self.threshold = int(get_rest_api_settings("circuit_breaker_threshold") or 3)
+        self.cooldown = float(get_rest_api_settings("circuit_breaker_cooldown_sec") or 300)
+        self._hosts_with_failures = set()
+
+    def before_request(self, host):
+        """
+        :raises CircuitOpenError: if the breaker of the host is open
+        """
+        state = self.store.read().get(host)
+        if not state:
+            return
+        self._hosts_with_failures.add(host)
+        opened_at = state.get("opened_at")
+        if opened_at is None:
+            return
+        if time.time() - opened_at < self.cooldown:
+            raise CircuitOpenError(
+                f"Circuit breaker open for {host} after {state['failures']} consecutive connection failures "
+                f"({state.get('last_error')}); failing fast"
+            )
+        with self.store.transaction() as states:
+            # half-open: the first caller after the cooldown gets the trial request
+            current = states.get(host, {})
+            if current.get("opened_at") == opened_at:
+                current["opened_at"] = time.time()
+                states[host] = current
+                self.log.info(f"Circuit breaker half-open for {host}, sending a trial request")
+                return
+        raise CircuitOpenError(f"Circuit breaker open for {host}; trial request already in flight")
+
+    def record_failure(self, host, error):
+        with self.store.transaction() as states:
+            state = states.setdefault(host, {"failures": 0, "opened_at": None})
+            state["failures"] += 1
+            state["last_error"] = str(error)[:200]
+            if state["failures"] >= self.threshold and state["opened_at"] is None:
+                state["opened_at"] = time.time()
+                self.log.error(f"Circuit breaker tripped for {host} after {state['failures']} connection failures")
+        self._hosts_with_failures.add(host)
+
+    def record_success(self, host):
+        # only touch the shared store when this process has seen the host fail
+        if host not in self._hosts_with_failures:
+            return
+        with self.store.transaction() as states:
+            if states.pop(host, None) is not None:
+                self.log.info(f"Circuit breaker closed for {host}")
+        self._hosts_with_failures.discard(host)
+
+    def is_open(self, host):
+        state = self.store.read().get(host)
+        return bool(state and state.get("opened_at") is not None)
+
+
+class RetryPolicy:
+    """
+    Bounded retries with full-jitter exponential backoff for idempotent methods, drawing
+    from a retry budget shared by the whole run.
+    """
+    log = custom_logger.customlogger(logging.DEBUG)
+
+    def __init__(self, store_name=None):
+        self.store = SharedJsonStore(store_name or run_store_name("retry_budget"))
+        self.max_retries = int(get_rest_api_settings("max_retries") or 2)
+        self.backoff = float(get_rest_api_settings("retry_backoff_sec") or 0.5)
+        self.backoff_cap = float(get_rest_api_settings("retry_backoff_cap_sec") or 8)
+        self.budget = int(get_rest_api_settings("retry_budget") or 100)
+
+    def can_retry(self, method, attempt):
+        return method.upper() in IDEMPOTENT_METHODS and attempt < self.max_retries
+
+    def take_budget(self):
+        """
+        Consume one retry from the run-wide budget.
+
+        :return: False when the budget is exhausted
+        """
+        with self.store.transaction() as state:
+            used = state.get("used", 0)
+            if used >= self.budget:
+                return False
+            state["used"] = used + 1
+        return True
+
+    def sleep_before_retry(self, attempt):
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff * 2 ** attempt))
+        self.log.info(f"Retrying in {delay:.2f}s (attempt {attempt + 1} of {self.max_retries})")
+        time.sleep(delay)
+
+
+def reset_run_state(run_id=None):
+    """
+    Close all breakers and refill the retry budget of a run, and remove the stores of runs that
+    ended long ago. Called at the start of a run. Rate limit buckets belong to the hosts, not to a
+    run, they are shared by concurrent runs and never reset.
+    """
+    for name in RUN_STORES:
+        with SharedJsonStore(run_store_name(name, run_id)).transaction() as state:
+            state.clear()
+        for path in glob.glob(os.path.join(STATE_DIR, f"{name}-*")):
+            try:
+                if time.time() - os.path.getmtime(path) > STALE_RUN_STATE_SEC:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,101 @@
+import logging
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from test_data.read_settings_file import get_rest_api_settings
+from utilities import custom_logger
+
+"""
+Runs the steps of a flow as a dependency graph.
+
+A step starts as soon as all its parents have finished, so independent branches run
+concurrently and a flow takes as long as its critical path. When a step fails, its
+descendants are not run; the other branches carry on.
+"""
+
+log = custom_logger.customlogger(logging.DEBUG)
+
+
+def get_ancestors(step, parents):
+    """
+    :param step: test number of the step
+    :param parents: {test_number: [parent test numbers]}
+    :return: set of all test numbers the step (transitively) depends on
+    """
+    ancestors = set()
+    stack = list(parents.get(step, []))
+    while stack:
+        parent = stack.pop()
+        if parent not in ancestors:
+            ancestors.add(parent)
+            stack.extend(parents.get(parent, []))
+    return ancestors
+
+
+def run_step_graph(steps, parents, run_step, max_workers=None):
+    """
+    Run the steps in dependency order with up to max_workers steps in flight.
+
+    :param steps: test numbers of the flow, in sheet/dependency order
+    :param parents: {test_number: [parent test numbers]}
+    :param run_step: called as run_step(step, results) in a worker thread; results holds the
+        result of every finished step, which includes all ancestors of the step. Its return
+        value is stored as the result of the step, raising marks the step failed.
+    :param max_workers: parallel steps, REST_DAG_MAX_WORKERS when None
+    :return: (results, failures, not_run) - {step: result}, {step: exception} and the steps
+        that were not run because a parent failed or they are part of a cycle
+    """
+    max_workers = max_workers or int(get_rest_api_settings("dag_max_workers") or 4)
+    children = defaultdict(list)
+    for step in steps:
+        for parent in parents.get(step, []):
+            children[parent].append(step)
+    # parents outside the flow are ignored, the grouping never produces them
+    waiting = {step: {p for p in parents.get(step, []) if p in steps} for step in steps}
+
+    results, failures, not_run = {}, {}, []
+    running = {}
+
+    # a fresh pool per flow, allure keeps its step context per thread
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="step") as pool:
+        def submit_ready():
+            for step in steps:
+                if step in waiting and not waiting[step]:
+                    del waiting[step]
+                    running[pool.submit(run_step, step, results)] = step
+
+        submit_ready()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                step = running.pop(future)
+                try:
+                    results[step] = future.result()
+                except BaseException as e:
+                    if isinstance(e, KeyboardInterrupt):
+                        raise
+                    failures[step] = e
+                    log.error(f"Step {step} failed, its dependents will not run: {e}")
+                    for descendant in _descendants(step, children):
+                        if waiting.pop(descendant, None) is not None:
+                            not_run.append(descendant)
+                    continue
+                for child in children[step]:
+                    if child in waiting:
+                        waiting[child].discard(step)
+            submit_ready()
+
+    if waiting:
+        log.error(f"Steps {list(waiting)} are part of a dependency cycle and were not run")
+        not_run.extend(waiting)
+    return results, failures, not_run
+
+
+def _descendants(step, children):
+    found, stack = set(), list(children.get(step, []))
+    while stack:
+        child = stack.pop()
+        if child not in found:
+            found.add(child)
+            stack.extend(children.get(child, []))
+    return found
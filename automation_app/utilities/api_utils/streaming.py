@@ -0,0 +1,206 @@
+import tempfile
+
+from test_data.read_settings_file import get_rest_api_settings
+
+"""
+Bounded-memory handling of very large JSON responses.
+
+The body is spooled to a temporary file (kept in memory only below a threshold) and then
+parsed incrementally with ijson. A selector says which fragments to keep: the keys named in
+expected/unexpected outcomes and the '$$'/'$#'/'$@' placeholder paths, following the rules of
+is_subset and get_value_from_response. Everything else is skipped while parsing, and the kept
+fragments may not exceed a byte budget.
+"""
+
+KEEP = True  # selector leaf: keep the whole value
+ANY_ITEM = "*"  # selector key applied to every element of a list
+CHUNK_SIZE = 64 * 1024
+MAX_SPOOL_MEMORY = 8 * 1024 * 1024
+
+
+class StreamLimitExceeded(Exception):
+    """
+    Raised when the fragments kept from a streamed response exceed the memory budget.
+    """
+
+
+def get_stream_limits():
+    """
+    Split REST_STREAM_MEMORY_CAP_MB (default 64) between the in-memory part of the spool, a
+    quarter of the cap but at most 8 MB, and the budget for the kept fragments.
+
+    :return: (spool bytes, fragment budget bytes)
+    """
+    cap = int(float(get_rest_api_settings("stream_memory_cap_mb") or 64) * 1024 * 1024)
+    spool_bytes = min(MAX_SPOOL_MEMORY, cap // 4)
+    return spool_bytes, cap - spool_bytes
+
+
+def merge_selectors(first, second):
+    if first is None:
+        return second
+    if second is None:
+        return first
+    if first is KEEP or second is KEEP:
+        return KEEP
+    merged = dict(first)
+    for key, child in second.items():
+        merged[key] = merge_selectors(merged.get(key), child)
+    return merged
+
+
+def selector_from_expected(expected):
+    """
+    Selector keeping what is_subset(response, expected) looks at. List items of the expected
+    value can match any element, so the merged item selector applies to every element.
+    """
+    if isinstance(expected, dict):
+        return {key: selector_from_expected(value) for key, value in expected.items()}
+    if isinstance(expected, list):
+        item_selector = None
+        for item in expected:
+            item_selector = merge_selectors(item_selector, selector_from_expected(item))
+        return {ANY_ITEM: item_selector or KEEP}
+    return KEEP
+
+
+def selector_from_path(path):
+    """
+    Selector keeping the value get_value_from_response(path, response) returns.
+    """
+    selector = KEEP
+    for part in reversed(path.split(".") if path else []):
+        selector = {part: selector}
+    return selector
+
+
+def build_selector(expected_values=(), paths=()):
+    """
+    :param expected_values: expected/unexpected outcomes the response is compared with
+    :param paths: dot paths read by placeholders of other steps
+    :return: the merged selector, or {} when nothing is referenced
+    """
+    selector = None
+    for expected in expected_values:
+        if expected is not None:
+            selector = merge_selectors(selector, selector_from_expected(expected))
+    for path in paths:
+        selector = merge_selectors(selector, selector_from_path(path))
+    return selector if selector is not None else {}
+
+
+def spool_response(response, in_memory_bytes):
+    """
+    Copy the body of a streamed requests.Response to a temporary file, which stays in memory
+    up to in_memory_bytes and moves to disk above it.
+
+    :return: (file positioned at the start, body size in bytes)
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=in_memory_bytes)
+    size = 0
+    try:
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            spool.write(chunk)
+            size += len(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    finally:
+        response.close()
+    spool.seek(0)
+    return spool, size
+
+
+class _FragmentBuilder:
+    def __init__(self, events, budget):
+        self.events = events
+        self.budget = budget
+        self.used = 0
+
+    def _charge(self, value):
+        self.used += 64 + (len(value) if isinstance(value, str) else 0)
+        if self.used > self.budget:
+            raise StreamLimitExceeded(
+                f"Fragments kept from the streamed response exceed {self.budget} bytes, "
+                f"narrow the expected outcome or placeholder paths")
+
+    def skip(self, event):
+        depth = 1 if event in ("start_map", "start_array") else 0
+        while depth:
+            event, _ = next(self.events)
+            if event in ("start_map", "start_array"):
+                depth += 1
+            elif event in ("end_map", "end_array"):
+                depth -= 1
+
+    def read(self, event, value, selector):
+        if selector is None:
+            self.skip(event)
+            return None
+        if event == "start_map":
+            result = {}
+            self._charge(result)
+            while True:
+                event, key = next(self.events)
+                if event == "end_map":
+                    return result
+                child = KEEP if selector is KEEP else selector.get(key)
+                event, value = next(self.events)
+                if child is None:
+                    self.skip(event)
+                else:
+                    self._charge(key)
+                    result[key] = self.read(event, value, child)
+        if event == "start_array":
+            result = []
+            self._charge(result)
+            index = 0
+            while True:
+                event, value = next(self.events)
+                if event == "end_array":
+                    return result
+                child = KEEP if selector is KEEP else self._item_selector(selector, index)
+                if child is None:
+                    self.skip(event)
+                else:
+                    # pad skipped elements so digit paths keep their index
+                    result.extend([None] * (index - len(result)))
+                    result.append(self.read(event, value, child))
+                index += 1
+        self._charge(value)
+        return value
+
+    @staticmethod
+    def _item_selector(selector, index):
+        # a digit part picks that element, any other part picks the first (get_value_from_response)
+        child = merge_selectors(selector.get(ANY_ITEM), selector.get(str(index)))
+        if index == 0:
+            for key, key_child in selector.items():
+                if key != ANY_ITEM and not key.isdigit():
+                    child = merge_selectors(child, key_child)
+        return child
+
+
+def extract_fragments(body, selector, budget):
+    """
+    Parse a JSON body incrementally and keep only the parts the selector names.
+
+    :param body: binary file object holding the JSON document
+    :param selector: selector from build_selector
+    :param budget: maximum bytes (approximate) of kept fragments
+    :return: the pruned document
+    :raises StreamLimitExceeded: if the kept fragments exceed the budget
+    :raises ValueError: if the body is not valid JSON
+    :raises ImportError: if the optional ijson package is missing
+    """
+    try:
+        import ijson
+    except ImportError:
+        raise ImportError("Streamed responses need the ijson package: pip install ijson")
+
+    events = iter(ijson.basic_parse(body, use_float=True, buf_size=CHUNK_SIZE))
+    try:
+        event, value = next(events)
+        return _FragmentBuilder(events, budget).read(event, value, selector)
+    except (ijson.JSONError, StopIteration) as e:
+        raise ValueError(f"The streamed response is not valid JSON: {e}")
@@ -0,0 +1,71 @@
+import json
+import time
+from urllib.parse import urlsplit
+
+from test_data.read_settings_file import get_common_settings, get_rest_api_settings
+
+"""
+Connect/read timeouts for every request and the whole-run deadline.
+
+Timeouts resolve in order: the row's connect_timeout_sec/read_timeout_sec columns, the
+host entry of REST_HOST_TIMEOUTS, then REST_CONNECT_TIMEOUT_SEC/REST_READ_TIMEOUT_SEC.
+RUN_DEADLINE (epoch seconds) is set by entrypoint_docker.py; no request may outlive it.
+"""
+
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 30.0
+
+
+class DeadlineExceeded(Exception):
+    """
+    Raised instead of sending a request once the run deadline has passed.
+    """
+
+
+_host_timeouts = None
+
+
+def _host_timeout_map():
+    global _host_timeouts
+    if _host_timeouts is None:
+        raw = get_rest_api_settings("host_timeouts")
+        _host_timeouts = json.loads(raw) if raw else {}
+    return _host_timeouts
+
+
+def run_deadline():
+    """
+    :return: the run deadline as an epoch timestamp, or None when the run has no deadline
+    """
+    deadline = get_common_settings("run_deadline")
+    return float(deadline) if deadline else None
+
+
+def remaining_time():
+    """
+    :return: seconds left until the run deadline, or None when the run has no deadline
+    """
+    deadline = run_deadline()
+    return None if deadline is None else deadline - time.time()
+
+
+def resolve_timeout(url, connect=None, read=None):
+    """
+    Resolve the (connect, read) timeout for a request and cap it by the run deadline.
+
+    :param url: the request url, its host selects the REST_HOST_TIMEOUTS entry
+    :param connect: connect timeout from the row, None to fall back
+    :param read: read timeout from the row, None to fall back
+    :return: (connect_timeout, read_timeout) in seconds
+    :raises DeadlineExceeded: if the run deadline has passed
+    """
+    host_timeout = _host_timeout_map().get(urlsplit(url).netloc) or [None, None]
+    connect = connect or host_timeout[0] or float(get_rest_api_settings("connect_timeout_sec") or DEFAULT_CONNECT_TIMEOUT)
+    read = read or host_timeout[1] or float(get_rest_api_settings("read_timeout_sec") or DEFAULT_READ_TIMEOUT)
+
+    remaining = remaining_time()
+    if remaining is not None:
+        if remaining <= 0:
+            raise DeadlineExceeded("Run deadline reached, request not sent")
+        connect, read = min(connect, remaining), min(read, remaining)
+    return float(connect), float(read)
@@ -0,0 +1,74 @@
+import gzip
+import logging
+import os
+import shutil
+
+from utilities import custom_logger
+
+"""
+Pre-compressed variants of large static files such as the single-file Allure report.
+
+precompress() writes <file>.gz and, when the optional brotli package is installed, <file>.br
+next to the file once, when it is generated. pick_variant() chooses the variant to serve for an
+Accept-Encoding header, so serving a report costs no compression work per request.
+"""
+
+log = custom_logger.customlogger(logging.DEBUG)
+
+# preferred first, brotli is smaller than gzip for HTML
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def precompress(path):
+    """
+    Write the .gz and .br variants of a file, replacing older ones.
+
+    :return: paths of the written variants
+    """
+    written = []
+    gz_path = f"{path}.gz"
+    with open(path, "rb") as source, open(f"{gz_path}.tmp", "wb") as target:
+        # mtime=0 keeps the bytes (and so the ETag) stable for the same report
+        with gzip.GzipFile(fileobj=target, mode="wb", compresslevel=9, mtime=0) as compressed:
+            shutil.copyfileobj(source, compressed, 1024 * 1024)
+    os.replace(f"{gz_path}.tmp", gz_path)
+    written.append(gz_path)
+
+    brotli = _brotli()
+    br_path = f"{path}.br"
+    if brotli is not None:
+        with open(path, "rb") as source:
+            data = brotli.compress(source.read(), mode=brotli.MODE_TEXT, quality=11)
+        with open(f"{br_path}.tmp", "wb") as target:
+            target.write(data)
+        os.replace(f"{br_path}.tmp", br_path)
+        written.append(br_path)
+    elif os.path.exists(br_path):
+        # a stale variant of an older report must not be served
+        os.remove(br_path)
+
+    for variant in written:
+        log.info(f"Pre-compressed {os.path.basename(path)}: {os.path.getsize(path)} -> {os.path.getsize(variant)} bytes ({variant})")
+    return written
+
+
+def pick_variant(path, accept_encodings):
+    """
+    :param path: the uncompressed file
+    :param accept_encodings: werkzeug Accept object of the Accept-Encoding header
+    :return: (path to serve, content encoding or None); a variant older than the file is ignored
+    """
+    mtime = os.path.getmtime(path)
+    for encoding, suffix in ENCODINGS:
+        variant = f"{path}{suffix}"
+        if accept_encodings.quality(encoding) > 0 and os.path.exists(variant) and os.path.getmtime(variant) >= mtime:
+            return variant, encoding
+    return path, None
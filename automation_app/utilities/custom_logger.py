@@ -1,22 +1,35 @@
-import inspect
 import logging
+import os
+import sys
 
 
 def customlogger(logLevel=logging.DEBUG):
     """
     gets the name of the class/method from where this method is called.
-    A list of named tuples FrameInfo(frame, filename, lineno, function, 
-    code_context, index) is returned.
-    so, 1,3 is filename and function respectively.
+    The caller's frame is read directly instead of through inspect.stack(),
+    which would load the source of every frame on the stack.
+
+    The file handler is created with delay=True, so the log file is only opened
+    on the first record instead of when the module defining the logger is imported.
+    Calling this again for the same logger name reuses the existing handler.
+
+    The log goes to $LOG_DIR/automation.log, set per run by the launcher, and to
+    logs/automation.log relative to the working directory without it.
 
     """
-    loggerName = inspect.stack()[1][3]
+    loggerName = sys._getframe(1).f_code.co_name
     logger = logging.getLogger(loggerName)
 
     # by default, log all messages
     logger.setLevel(logging.DEBUG)
 
-    fileHandler = logging.FileHandler("logs/automation.log", mode='a')
+    if any(getattr(handler, "_custom_logger", False) for handler in logger.handlers):
+        return logger
+
+    log_dir = os.getenv("LOG_DIR") or "logs"
+    os.makedirs(log_dir, exist_ok=True)
+    fileHandler = logging.FileHandler(os.path.join(log_dir, "automation.log"), mode='a', delay=True)
+    fileHandler._custom_logger = True
     fileHandler.setLevel(logLevel)
 
     formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s: %(message)s',
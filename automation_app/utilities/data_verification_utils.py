@@ -1,5 +1,9 @@
-from jsonschema import ValidationError, validate
 import allure
+import fnmatch
+import re
+from itertools import islice
+from test_data.read_settings_file import get_rest_api_settings
+from utilities import reporting
 from utilities.custom_logger import CustomLogger
 import json
 import math
@@ -32,6 +36,8 @@ def verify_schema(response, response_schema):
     If certain keys are marked to be skipped in the schema (such as those with 
     `additionalProperties`), the function skips validating the order of the nested 
     keys but ensures the top-level key is still included.
+    On failure, every validation error (up to MAX_DIFFERENCES) is attached as a path-level
+    difference instead of the whole schema.
 
     Args:
         response (dict): The JSON response whose key order needs to be verified.
@@ -41,20 +47,47 @@ def verify_schema(response, response_schema):
         bool: True if the key order of the response matches the schema, otherwise False.
 
     Raises:
-        ValidationError: If the response does not conform to the schema.
-        AssertionError: If the key order in the response does not match the expected order.
+        SchemaError: If the schema itself is invalid.
     """
-    try:
-        validate(instance=response, schema=response_schema)
+    # jsonschema is slow to import and only needed when a row has a response_schema
+    from jsonschema.validators import validator_for
+
+    validator_class = validator_for(response_schema)
+    validator_class.check_schema(response_schema)
+    validator = validator_class(response_schema)
+    errors = list(islice(validator.iter_errors(response), MAX_DIFFERENCES + 1))
+    if not errors:
         CustomLogger.log.info("Response schema validated")
         return True
-    except ValidationError as e:
-        error_message = "Schema Validation Failed"
-        CustomLogger.log.info(e.message)
-        CustomLogger.log.info(f"Path to the error: {'/'.join(map(str, e.path))}")
-        error = f"Path to the error: {'/'.join(map(str, e.path))} -> and error is \n-> {e.message}"
-        allure.attach(error, name=f"{error_message} -> click for details", attachment_type=allure.attachment_type.TEXT)
-        return False
+
+    differences = JsonDiff()
+    for error in errors[:MAX_DIFFERENCES]:
+        differences.extend(_schema_differences(error))
+    differences.truncated = len(errors) > MAX_DIFFERENCES
+    for difference in differences:
+        CustomLogger.log.info(f"Schema validation: {difference['kind']} {difference['path']}")
+    reporting.attach(format_differences(differences), name="Schema Validation Failed -> click for details",
+                     attachment_type=allure.attachment_type.TEXT)
+    return False
+
+
+def _schema_differences(error):
+    """
+    Path-level differences of one jsonschema ValidationError, in the form of diff_json.
+    """
+    path = "$" + "".join(f"[{part}]" if isinstance(part, int) else f".{part}" for part in error.absolute_path)
+    instance = error.instance
+    if error.validator == "required" and isinstance(instance, dict):
+        return [{"path": f"{path}.{name}", "kind": "missing", "expected": "required", "actual": None}
+                for name in error.validator_value if name not in instance]
+    if error.validator == "additionalProperties" and isinstance(instance, dict) and not error.schema.get("patternProperties"):
+        properties = error.schema.get("properties", {})
+        return [{"path": f"{path}.{name}", "kind": "extra", "expected": None, "actual": value}
+                for name, value in instance.items() if name not in properties]
+    if error.validator == "type":
+        return [{"path": path, "kind": "type", "expected": error.validator_value, "actual": instance}]
+    return [{"path": path, "kind": "changed", "expected": f"{error.validator}: {error.validator_value}", "actual": instance}]
+
 
 def parse_nan(data):
     """
@@ -79,3 +112,259 @@ def parse_nan(data):
     else:
         raise ValueError("Input must be a JSON string or a dictionary")
 
+
+MAX_DIFFERENCES = 50
+DEFAULT_LIST_KEYS = ("id", "key", "uuid", "*_id", "*Id", "name", "code")
+MAX_VALUE_CHARS = 200  # per value in format_differences
+SUBSET_MATCH_BUDGET = 10000  # is_subset calls per list when looking for an unordered match
+
+
+_MISSING = object()
+
+
+class JsonDiff(list):
+    """
+    Differences found by diff_json; truncated is True when it stopped at max_differences.
+    """
+    truncated = False
+
+
+class _DiffLimitReached(Exception):
+    pass
+
+
+def _compile_patterns(patterns):
+    patterns = [pattern for pattern in patterns or () if pattern]
+    return re.compile("|".join(fnmatch.translate(pattern) for pattern in patterns)) if patterns else None
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _is_scalar(value):
+    return value is None or isinstance(value, (str, int, float, bool))
+
+
+class _Differ:
+    """
+    One diff_json call. Dictionary keys are looked up, not searched, and list items are matched
+    through dictionaries of their key values or fingerprints, so a document is walked about once.
+    """
+
+    def __init__(self, ignore_fields, subset, list_keys, max_differences):
+        self.ignore = _compile_patterns(ignore_fields)
+        self.subset = subset
+        self.list_keys = [re.compile(fnmatch.translate(pattern)) for pattern in list_keys]
+        self.max_differences = max_differences
+        self.differences = JsonDiff()
+        self._ignored = {}
+
+    def add(self, path, kind, expected, actual):
+        if len(self.differences) >= self.max_differences:
+            self.differences.truncated = True
+            raise _DiffLimitReached
+        self.differences.append({"path": path, "kind": kind, "expected": expected, "actual": actual})
+
+    def is_ignored(self, key):
+        if self.ignore is None:
+            return False
+        ignored = self._ignored.get(key)
+        if ignored is None:
+            ignored = self._ignored[key] = self.ignore.match(str(key)) is not None
+        return ignored
+
+    def diff(self, expected, actual, path):
+        if self.ignore is None and expected == actual:
+            return
+        if isinstance(expected, dict) and isinstance(actual, dict):
+            for key, value in expected.items():
+                if self.is_ignored(key):
+                    continue
+                if key not in actual:
+                    self.add(f"{path}.{key}", "missing", value, None)
+                else:
+                    self.diff(value, actual[key], f"{path}.{key}")
+            if not self.subset:
+                for key, value in actual.items():
+                    if key not in expected and not self.is_ignored(key):
+                        self.add(f"{path}.{key}", "extra", None, value)
+        elif isinstance(expected, list) and isinstance(actual, list):
+            self.diff_list(expected, actual, path)
+        elif type(expected) is not type(actual) and not (_is_number(expected) and _is_number(actual)):
+            self.add(path, "type", expected, actual)
+        elif expected != actual:
+            self.add(path, "changed", expected, actual)
+
+    def list_key(self, expected, actual):
+        """
+        :return: the first field of list_keys that every expected item has, with a unique
+                 scalar value, or None when the list is not keyed
+        """
+        if not expected or not all(isinstance(item, dict) for item in expected):
+            return None
+        for pattern in self.list_keys:
+            for field in expected[0]:
+                if not pattern.match(field) or self.is_ignored(field):
+                    continue
+                values = set()
+                for item in expected:
+                    value = item.get(field, _MISSING)
+                    if not _is_scalar(value) or value in values:
+                        break
+                    values.add(value)
+                else:
+                    if any(isinstance(item, dict) and field in item for item in actual):
+                        return field
+        return None
+
+    def diff_list(self, expected, actual, path):
+        key = self.list_key(expected, actual)
+        if key is not None:
+            self.diff_keyed_list(expected, actual, path, key)
+        else:
+            self.diff_unkeyed_list(expected, actual, path)
+
+    def diff_keyed_list(self, expected, actual, path, key):
+        actual_by_key = {}
+        unkeyed = []
+        for index, item in enumerate(actual):
+            value = item.get(key) if isinstance(item, dict) else None
+            if _is_scalar(value) and value is not None and value not in actual_by_key:
+                actual_by_key[value] = item
+            else:
+                unkeyed.append(index)
+        for item in expected:
+            value = item[key]
+            item_path = f"{path}[{key}={json.dumps(value, default=str)}]"
+            if value in actual_by_key:
+                self.diff(item, actual_by_key.pop(value), item_path)
+            else:
+                self.add(item_path, "missing", item, None)
+        if not self.subset:
+            for value, item in actual_by_key.items():
+                self.add(f"{path}[{key}={json.dumps(value, default=str)}]", "extra", None, item)
+            for index in unkeyed:
+                self.add(f"{path}[{index}]", "extra", None, actual[index])
+
+    def fingerprint(self, value):
+        if _is_scalar(value):
+            return isinstance(value, bool), value
+        if self.ignore is not None:
+            value = self.strip_ignored(value)
+        return json.dumps(value, sort_keys=True, default=str)
+
+    def strip_ignored(self, value):
+        if isinstance(value, dict):
+            return {key: self.strip_ignored(item) for key, item in value.items() if not self.is_ignored(key)}
+        if isinstance(value, list):
+            return [self.strip_ignored(item) for item in value]
+        return value
+
+    def diff_unkeyed_list(self, expected, actual, path):
+        # identical items are matched whatever their position, the rest are paired in order
+        actual_by_fingerprint = {}
+        for index, item in enumerate(actual):
+            actual_by_fingerprint.setdefault(self.fingerprint(item), []).append(index)
+        remaining_expected = []
+        for index, item in enumerate(expected):
+            indexes = actual_by_fingerprint.get(self.fingerprint(item))
+            if indexes:
+                indexes.pop(0)
+            else:
+                remaining_expected.append(index)
+        remaining_actual = sorted(index for indexes in actual_by_fingerprint.values() for index in indexes)
+
+        if self.subset and remaining_expected:
+            # an expected item only has to be contained in one of the response items
+            budget = SUBSET_MATCH_BUDGET
+            unmatched = []
+            for index in remaining_expected:
+                found = False
+                for actual_index in remaining_actual:
+                    if budget <= 0:
+                        break
+                    budget -= 1
+                    if is_subset(actual[actual_index], expected[index]):
+                        found = True
+                        break
+                if not found:
+                    unmatched.append(index)
+            # a scalar paired with an unrelated item says nothing, it is missing
+            remaining_expected = [index for index in unmatched if isinstance(expected[index], (dict, list))]
+            for index in unmatched:
+                if not isinstance(expected[index], (dict, list)):
+                    self.add(f"{path}[{index}]", "missing", expected[index], None)
+
+        for expected_index, actual_index in zip(remaining_expected, remaining_actual):
+            self.diff(expected[expected_index], actual[actual_index], f"{path}[{actual_index}]")
+        for expected_index in remaining_expected[len(remaining_actual):]:
+            self.add(f"{path}[{expected_index}]", "missing", expected[expected_index], None)
+        if not self.subset:
+            for actual_index in remaining_actual[len(remaining_expected):]:
+                self.add(f"{path}[{actual_index}]", "extra", None, actual[actual_index])
+
+
+def diff_json(expected, actual, ignore_fields=(), subset=False, list_keys=DEFAULT_LIST_KEYS,
+              max_differences=MAX_DIFFERENCES, path="$"):
+    """
+    Minimal path-level difference between two JSON documents.
+
+    Lists of objects are aligned by a key field, the first pattern of list_keys that every
+    expected item has with a unique value (e.g. $.items[id=42]). Other lists match identical items
+    whatever their position and pair the rest in order. Keys matching a pattern of ignore_fields
+    (fnmatch, e.g. 'updated_at' or '*_id') are skipped at any depth.
+
+    Args:
+        expected: the reference document.
+        actual: the document compared with it.
+        ignore_fields (iterable): key patterns to skip.
+        subset (bool): compare as is_subset(actual, expected) does, keys and items that only
+            actual has are not differences.
+        list_keys (iterable): key field patterns, in order of preference.
+        max_differences (int): the diff stops after this many differences.
+        path (str): path of the documents, used as the prefix of the reported paths.
+
+    Returns:
+        JsonDiff: list with one dictionary per difference with 'path', 'kind' ('missing', 'extra',
+        'changed' or 'type') and the 'expected'/'actual' values.
+    """
+    differ = _Differ(ignore_fields, subset, list_keys, max_differences)
+    try:
+        differ.diff(expected, actual, path)
+    except _DiffLimitReached:
+        pass
+    return differ.differences
+
+
+def get_diff_options():
+    """
+    :return: list_keys and max_differences of diff_json from REST_DIFF_LIST_KEYS and REST_DIFF_MAX_DIFFERENCES
+    """
+    list_keys = get_rest_api_settings("diff_list_keys")
+    max_differences = get_rest_api_settings("diff_max_differences")
+    return {
+        "list_keys": tuple(key.strip() for key in list_keys.split(",") if key.strip()) if list_keys else DEFAULT_LIST_KEYS,
+        "max_differences": int(max_differences) if max_differences else MAX_DIFFERENCES,
+    }
+
+
+def _short(value):
+    text = json.dumps(value, default=str)
+    return text if len(text) <= MAX_VALUE_CHARS else f"{text[:MAX_VALUE_CHARS]}... ({len(text)} chars)"
+
+
+def format_differences(differences, limit=None):
+    """
+    :param differences: result of diff_json
+    :param limit: number of differences shown, all when None
+    :return: one line per difference, values cut at MAX_VALUE_CHARS
+    """
+    shown = differences if limit is None else differences[:limit]
+    lines = [f"{difference['kind']:<8} {difference['path']}: {_short(difference['expected'])} -> {_short(difference['actual'])}"
+             for difference in shown]
+    if len(shown) < len(differences):
+        lines.append(f"... {len(differences) - len(shown)} more")
+    if getattr(differences, "truncated", False):
+        lines.append(f"... stopped after {len(differences)} differences")
+    return "\n".join(lines)
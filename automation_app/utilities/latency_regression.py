@@ -0,0 +1,122 @@
+import logging
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+from test_data.read_settings_file import get_common_settings
+from utilities import custom_logger, run_history
+
+"""
+Latency-regression detection against a rolling baseline of earlier runs.
+
+For each endpoint the baseline is the median and the MAD (median absolute deviation) of its
+median latency in the previous LATENCY_BASELINE_RUNS runs that called it, so runs of another
+test type or plan in the same history do not push its own runs out of the baseline. An endpoint
+regressed when this run's median is above median + LATENCY_MAD_THRESHOLD * 1.4826 * MAD (1.4826
+scales the MAD to a standard deviation) and at least LATENCY_MIN_SLOWDOWN slower than the
+baseline median, so a very stable endpoint does not flag a jitter of a few milliseconds. All
+endpoints are compared at once with pandas group-bys over the endpoint_runs rollup of the run
+history.
+"""
+
+log = custom_logger.customlogger(logging.DEBUG)
+
+MAD_TO_SIGMA = 1.4826
+KEY = ["endpoint", "method"]
+
+
+def get_detection_settings():
+    return {
+        "baseline_runs": int(get_common_settings("latency_baseline_runs") or 10),
+        "min_baseline_runs": int(get_common_settings("latency_min_baseline_runs") or 5),
+        "mad_threshold": float(get_common_settings("latency_mad_threshold") or 3),
+        "min_slowdown": float(get_common_settings("latency_min_slowdown") or 0.2),
+    }
+
+
+def regression_fails_run():
+    return str(get_common_settings("latency_regression_fail")).lower() in ("1", "true", "yes")
+
+
+def find_regressions(medians, run_seq, baseline_runs=10, min_baseline_runs=5, mad_threshold=3.0, min_slowdown=0.2):
+    """
+    Compare the endpoint medians of run_seq with the last baseline_runs earlier runs of each endpoint.
+
+    :param medians: DataFrame with run_seq, endpoint, method and median_latency_ms columns
+    :param run_seq: the run to check
+    :return: DataFrame with one row per regressed endpoint, slowest regression first
+    """
+    earlier = medians[medians["run_seq"] < run_seq].sort_values("run_seq")
+    baseline = earlier.groupby(KEY).tail(baseline_runs)
+    current = medians[medians["run_seq"] == run_seq].set_index(KEY)["median_latency_ms"]
+
+    grouped = baseline.groupby(KEY)["median_latency_ms"]
+    baseline_median = grouped.median()
+    deviation = (baseline["median_latency_ms"] - grouped.transform("median")).abs()
+    stats = pd.DataFrame({
+        "baseline_median_ms": baseline_median,
+        "baseline_mad_ms": deviation.groupby([baseline["endpoint"], baseline["method"]]).median(),
+        "baseline_runs": grouped.count(),
+    })
+    stats = stats.join(current.rename("median_latency_ms"), how="inner")
+    stats["threshold_ms"] = np.maximum(
+        stats["baseline_median_ms"] + mad_threshold * MAD_TO_SIGMA * stats["baseline_mad_ms"],
+        stats["baseline_median_ms"] * (1 + min_slowdown))
+    stats["ratio"] = stats["median_latency_ms"] / stats["baseline_median_ms"]
+    regressed = stats[(stats["baseline_runs"] >= min_baseline_runs) & (stats["median_latency_ms"] > stats["threshold_ms"])]
+    return regressed.sort_values("ratio", ascending=False).reset_index()
+
+
+def detect_regressions(run_id, db_path=None):
+    """
+    Check a stored run against its baseline and store the regressions in the run history.
+
+    :return: list of regression dictionaries, slowest regression first
+    """
+    settings = get_detection_settings()
+    with closing(run_history.connect(db_path)) as connection, connection:
+        row = connection.execute("SELECT seq FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        if row is None:
+            raise ValueError(f"Run {run_id} is not in the run history")
+        run_seq = row["seq"]
+        # the run and the last baseline_runs runs before it of each of its endpoints
+        medians = pd.read_sql_query("""
+            SELECT run_seq, endpoint, method, median_latency_ms FROM (
+                SELECT e.run_seq, e.endpoint, e.method, e.median_latency_ms,
+                       ROW_NUMBER() OVER (PARTITION BY e.endpoint, e.method ORDER BY e.run_seq DESC) AS position
+                FROM endpoint_runs e
+                JOIN endpoint_runs c ON c.endpoint = e.endpoint AND c.method = e.method AND c.run_seq = ?
+                WHERE e.run_seq <= ? AND e.median_latency_ms IS NOT NULL
+            ) WHERE position <= ?
+        """, connection, params=(run_seq, run_seq, settings["baseline_runs"] + 1))
+        regressions = find_regressions(medians, run_seq, **settings)
+
+        connection.execute("DELETE FROM latency_regressions WHERE run_seq = ?", (run_seq,))
+        columns = ["endpoint", "method", "median_latency_ms", "baseline_median_ms", "baseline_mad_ms",
+                   "threshold_ms", "ratio", "baseline_runs"]
+        connection.executemany(
+            f"INSERT INTO latency_regressions (run_seq, {', '.join(columns)}) VALUES (?{', ?' * len(columns)})",
+            [(run_seq, *values) for values in regressions[columns].itertuples(index=False)])
+
+    for regression in regressions.itertuples():
+        log.warning(f"Latency regression {regression.method} {regression.endpoint}: median "
+                    f"{regression.median_latency_ms:.1f} ms vs baseline {regression.baseline_median_ms:.1f} ms "
+                    f"(x{regression.ratio:.2f}, threshold {regression.threshold_ms:.1f} ms)")
+    return stored_regressions(run_id, db_path)
+
+
+def stored_regressions(run_id=None, db_path=None):
+    """
+    :return: the regressions found for a run, the latest run when run_id is None
+    """
+    run_filter = "r.run_id = ?" if run_id is not None else "r.seq = (SELECT MAX(seq) FROM runs)"
+    with closing(run_history.connect(db_path)) as connection:
+        rows = connection.execute(f"""
+            SELECT r.run_id, g.endpoint, g.method, g.median_latency_ms, g.baseline_median_ms, g.baseline_mad_ms,
+                   g.threshold_ms, ROUND(g.ratio, 3) AS ratio, g.baseline_runs
+            FROM latency_regressions g JOIN runs r ON r.seq = g.run_seq
+            WHERE {run_filter}
+            ORDER BY g.ratio DESC
+        """, (run_id,) if run_id is not None else ()).fetchall()
+    return [dict(row) for row in rows]
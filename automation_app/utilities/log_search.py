@@ -0,0 +1,287 @@
+import bisect
+import mmap
+import os
+import re
+import struct
+import threading
+import zlib
+from array import array
+
+import numpy as np
+
+"""
+Search and paging of large log files without reading them into memory.
+
+A sparse line index keeps the byte offset of every INDEX_STRIDE-th line in .index/<log>.idx
+next to the log. It is extended from the last indexed byte whenever the log is searched or
+paged, so only lines written since then are scanned, and it is rebuilt when the log was
+replaced. Going to line N reads one offset and skips at most INDEX_STRIDE - 1 lines from there.
+Searches run over an mmap of the log, with bytes.find for substrings and re for patterns.
+A case-insensitive substring is found in lower-cased chunks, which is much faster than a
+regex with IGNORECASE.
+"""
+
+INDEX_STRIDE = 1024
+INDEX_DIR = ".index"
+CHUNK_SIZE = 64 * 1024 * 1024
+HEAD_BYTES = 4096
+# version, inode, head crc, indexed bytes, indexed lines
+HEADER = struct.Struct("<QQQQQ")
+INDEX_VERSION = 1
+MAX_LINE_BYTES = 64 * 1024  # longer lines are cut when returned
+FOLD_CHUNK_SIZE = 4 * 1024 * 1024
+
+_lock = threading.Lock()
+
+
+class LineIndex:
+    """
+    Sparse line-offset index of a log: offsets[k] is the byte offset of line k * INDEX_STRIDE + 1.
+    """
+
+    def __init__(self, inode=0, head_crc=0, indexed_bytes=0, indexed_lines=0, offsets=None):
+        self.inode = inode
+        self.head_crc = head_crc
+        self.indexed_bytes = indexed_bytes  # end of the last complete line
+        self.indexed_lines = indexed_lines  # complete lines up to indexed_bytes
+        self.offsets = offsets if offsets is not None else array("Q", [0])
+
+    @classmethod
+    def load(cls, index_path):
+        try:
+            with open(index_path, "rb") as f:
+                data = f.read()
+            version, inode, head_crc, indexed_bytes, indexed_lines = HEADER.unpack_from(data)
+        except (OSError, struct.error):
+            return cls()
+        if version != INDEX_VERSION:
+            return cls()
+        offsets = array("Q")
+        offsets.frombytes(data[HEADER.size:])
+        return cls(inode, head_crc, indexed_bytes, indexed_lines, offsets)
+
+    def save(self, index_path):
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        with open(f"{index_path}.tmp", "wb") as f:
+            f.write(HEADER.pack(INDEX_VERSION, self.inode, self.head_crc, self.indexed_bytes, self.indexed_lines))
+            f.write(self.offsets.tobytes())
+        os.replace(f"{index_path}.tmp", index_path)
+
+    def line_start_hint(self, line_number):
+        """
+        :return: (byte offset, line number) of the nearest indexed line at or before line_number
+        """
+        k = min((line_number - 1) // INDEX_STRIDE, len(self.offsets) - 1)
+        return self.offsets[k], k * INDEX_STRIDE + 1
+
+    def line_of_offset_hint(self, offset):
+        """
+        :return: (byte offset, line number) of the nearest indexed line starting at or before offset
+        """
+        k = bisect.bisect_right(self.offsets, offset) - 1
+        return self.offsets[k], k * INDEX_STRIDE + 1
+
+
+def _index_path(log_path):
+    directory, name = os.path.split(log_path)
+    return os.path.join(directory, INDEX_DIR, f"{name}.idx")
+
+
+def _head_crc(f, indexed_bytes):
+    # checksum of the start of the indexed part, tells a rewritten log from an appended one
+    f.seek(0)
+    return zlib.crc32(f.read(min(HEAD_BYTES, indexed_bytes)))
+
+
+def _extend(index, f, size):
+    """
+    Index the complete lines between index.indexed_bytes and size.
+    """
+    position = index.indexed_bytes
+    f.seek(position)
+    while position < size:
+        chunk = f.read(min(CHUNK_SIZE, size - position))
+        if not chunk:
+            break
+        newlines = np.flatnonzero(np.frombuffer(chunk, dtype=np.uint8) == 10)
+        if len(newlines):
+            # line numbers ended by these newlines, the line after a multiple of the stride starts a block
+            ended = index.indexed_lines + 1 + np.arange(len(newlines), dtype=np.uint64)
+            block_starts = newlines[ended % INDEX_STRIDE == 0] + position + 1
+            index.offsets.extend(int(offset) for offset in block_starts)
+            index.indexed_lines += len(newlines)
+            index.indexed_bytes = position + int(newlines[-1]) + 1
+        position += len(chunk)
+
+
+def get_index(log_path):
+    """
+    Load the index of a log and bring it up to date with what was written since.
+    A log that was replaced or truncated is indexed again from the start.
+    """
+    index_path = _index_path(log_path)
+    with _lock, open(log_path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        index = LineIndex.load(index_path)
+        if (index.inode != stat.st_ino or stat.st_size < index.indexed_bytes
+                or _head_crc(f, index.indexed_bytes) != index.head_crc):
+            index = LineIndex(inode=stat.st_ino, head_crc=_head_crc(f, 0))
+        if stat.st_size > index.indexed_bytes:
+            _extend(index, f, stat.st_size)
+            index.head_crc = _head_crc(f, index.indexed_bytes)
+            index.save(index_path)
+    return index
+
+
+def _open_map(log_path):
+    with open(log_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _skip_lines(mapped, offset, count):
+    for _ in range(count):
+        end = mapped.find(b"\n", offset)
+        if end == -1:
+            return len(mapped)
+        offset = end + 1
+    return offset
+
+
+def _line_end(mapped, offset):
+    end = mapped.find(b"\n", offset)
+    return len(mapped) if end == -1 else end
+
+
+def _decode(mapped, start, end):
+    return mapped[start:min(end, start + MAX_LINE_BYTES)].decode("utf-8", errors="replace").rstrip("\r")
+
+
+def _read_lines(mapped, offset, count):
+    lines = []
+    while len(lines) < count and offset < len(mapped):
+        end = _line_end(mapped, offset)
+        lines.append(_decode(mapped, offset, end))
+        offset = end + 1
+    return lines
+
+
+def _context_before(mapped, line_start, count):
+    lines = []
+    while len(lines) < count and line_start > 0:
+        previous = mapped.rfind(b"\n", 0, line_start - 1) + 1
+        lines.append(_decode(mapped, previous, line_start - 1))
+        line_start = previous
+    return lines[::-1]
+
+
+def read_lines(log_path, start=1, count=200):
+    """
+    Page through a log by line number.
+
+    :param start: first line, 1-based
+    :return: dictionary with the lines, their range and the total line count
+    """
+    index = get_index(log_path)
+    mapped = _open_map(log_path)
+    total = index.indexed_lines + (1 if mapped is not None and len(mapped) > index.indexed_bytes else 0)
+    result = {"file": os.path.basename(log_path), "start": start, "lines": [], "total_lines": total, "next_start": None}
+    if mapped is None:
+        return result
+    with mapped:
+        offset, line_number = index.line_start_hint(start)
+        offset = _skip_lines(mapped, offset, start - line_number)
+        result["lines"] = _read_lines(mapped, offset, count)
+    if start + len(result["lines"]) <= total:
+        result["next_start"] = start + len(result["lines"])
+    return result
+
+
+class FoldedNeedle(bytes):
+    """
+    Lower-cased substring matched against lower-cased text (ASCII case folding).
+    """
+
+
+def compile_query(query, regex=False, ignore_case=False):
+    """
+    :return: a compiled bytes pattern for a regex, a FoldedNeedle for a case-insensitive
+             substring, the query bytes otherwise
+    :raises re.error: if the regex is invalid
+    """
+    needle = query.encode("utf-8")
+    if regex:
+        # MULTILINE so ^ and $ anchor at each line of the mapped log
+        return re.compile(needle, re.MULTILINE | (re.IGNORECASE if ignore_case else 0))
+    if ignore_case:
+        return FoldedNeedle(needle.lower())
+    return needle
+
+
+def _find_folded(mapped, needle, offset):
+    # chunks start small for dense hits and double up to FOLD_CHUNK_SIZE, they overlap by
+    # len(needle) - 1 bytes so a match across a chunk boundary is not missed
+    chunk_size = 64 * 1024
+    while offset < len(mapped):
+        position = mapped[offset:offset + chunk_size + len(needle) - 1].lower().find(needle)
+        if position != -1:
+            return offset + position
+        offset += chunk_size
+        chunk_size = min(chunk_size * 2, FOLD_CHUNK_SIZE)
+    return -1
+
+
+def _find(mapped, query, offset):
+    if isinstance(query, FoldedNeedle):
+        return _find_folded(mapped, query, offset)
+    if isinstance(query, bytes):
+        return mapped.find(query, offset)
+    match = query.search(mapped, offset) if offset <= len(mapped) else None
+    return -1 if match is None else match.start()
+
+
+def _matches(mapped, query, offset):
+    while True:
+        position = _find(mapped, query, offset)
+        if position == -1:
+            return
+        yield position
+        offset = _line_end(mapped, position) + 1
+
+
+def search(log_path, query, regex=False, ignore_case=False, from_line=1, limit=50, context=0):
+    """
+    Find the lines of a log matching a substring or a regex, one hit per line.
+
+    :param from_line: first line to search, pass next_line of the previous page to continue
+    :param limit: maximum number of matching lines returned
+    :param context: lines of context before and after each match
+    :return: dictionary with the matches and next_line (None when the log has no more matches)
+    :raises re.error: if the regex is invalid
+    """
+    pattern = compile_query(query, regex, ignore_case)
+    index = get_index(log_path)
+    mapped = _open_map(log_path)
+    result = {"file": os.path.basename(log_path), "query": query, "matches": [], "next_line": None}
+    if mapped is None:
+        return result
+    with mapped:
+        offset, line_number = index.line_start_hint(from_line)
+        offset = _skip_lines(mapped, offset, from_line - line_number)
+        # line numbers are counted from the nearest indexed line of each hit
+        for position in _matches(mapped, pattern, offset):
+            line_start = mapped.rfind(b"\n", 0, position) + 1
+            hint_offset, hint_line = index.line_of_offset_hint(line_start)
+            match_line = hint_line + mapped[hint_offset:line_start].count(b"\n")
+            if len(result["matches"]) == limit:
+                result["next_line"] = match_line
+                break
+            line_end = _line_end(mapped, line_start)
+            result["matches"].append({
+                "line_number": match_line,
+                "line": _decode(mapped, line_start, line_end),
+                "before": _context_before(mapped, line_start, context),
+                "after": _read_lines(mapped, line_end + 1, context),
+            })
+    return result
@@ -0,0 +1,182 @@
+import glob
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from load_config import ROOT_DIR
+from test_data.read_settings_file import get_common_settings
+
+"""
+Opt-in timing spans for the framework's own pipeline.
+
+Enable with PROFILE_SPANS=true in .env. Each pytest process records its spans in memory; at the end
+of the session every xdist worker dumps them to $LOG_DIR/profile (logs/profile without it) and the
+controller merges them into one Chrome trace (open in chrome://tracing or ui.perfetto.dev) and logs
+a top-N table.
+When disabled, span() returns a shared no-op context manager.
+"""
+
+PROFILE_DIR = os.path.join(os.getenv("LOG_DIR") or os.path.join(ROOT_DIR, "logs"), "profile")
+ENABLED = False
+TOP_N = 15
+
+_events = []
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class _Span:
+    __slots__ = ("name", "category", "start")
+
+    def __init__(self, name, category):
+        self.name = name
+        self.category = category
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        _events.append((self.name, self.category, self.start, end - self.start, threading.get_ident()))
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name, category="pipeline"):
+    """
+    Time the enclosed block as a span named 'name'.
+
+    :param name: span name shown in the trace and the summary table
+    :param category: trace category, e.g. 'network', 'fixture', 'allure', 'logging'
+    :return: a context manager
+    """
+    if not ENABLED:
+        return _NULL_SPAN
+    return _Span(name, category)
+
+
+def _worker_name():
+    return os.getenv("PYTEST_XDIST_WORKER") or os.getenv("RUNNER_ID", "main")
+
+
+def _chrome_events(events, pid, process_name):
+    """
+    Convert recorded spans to Chrome trace 'complete' events (timestamps in microseconds).
+    """
+    trace_events = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": process_name}}]
+    for name, category, start, duration, thread_id in events:
+        trace_events.append({
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": start / 1000,
+            "dur": duration / 1000,
+            "pid": pid,
+            "tid": thread_id,
+        })
+    return trace_events
+
+
+def summarize(trace_events, top_n=None):
+    """
+    Aggregate complete events by name.
+
+    :param trace_events: Chrome trace events
+    :param top_n: number of rows to keep
+    :return: list of (name, category, count, total_ms, mean_ms, max_ms) sorted by total time
+    """
+    totals = {}
+    for event in trace_events:
+        if event.get("ph") != "X":
+            continue
+        key = (event["name"], event["cat"])
+        count, total, longest = totals.get(key, (0, 0.0, 0.0))
+        totals[key] = (count + 1, total + event["dur"], max(longest, event["dur"]))
+
+    rows = [
+        (name, category, count, total / 1000, total / count / 1000, longest / 1000)
+        for (name, category), (count, total, longest) in totals.items()
+    ]
+    rows.sort(key=lambda row: row[3], reverse=True)
+    return rows[:top_n or TOP_N]
+
+
+def format_summary(rows):
+    lines = [f"{'span':<40} {'category':<10} {'count':>7} {'total ms':>11} {'mean ms':>9} {'max ms':>9}"]
+    for name, category, count, total_ms, mean_ms, max_ms in rows:
+        lines.append(f"{name:<40} {category:<10} {count:>7} {total_ms:>11.2f} {mean_ms:>9.3f} {max_ms:>9.3f}")
+    return "\n".join(lines)
+
+
+def configure():
+    """
+    Read the profiler settings. Called once per pytest process from conftest.
+    """
+    global ENABLED, TOP_N
+    ENABLED = str(get_common_settings("profile_spans")).lower() in ("1", "true", "yes")
+    TOP_N = int(get_common_settings("profile_top_n") or 15)
+
+
+def start_run():
+    """
+    Called by the controller before workers start, so they inherit the run id.
+    """
+    if ENABLED:
+        os.environ.setdefault("PROFILE_RUN_ID", datetime.now().strftime("%Y%m%d_%H%M%S"))
+
+
+def dump_process_spans():
+    """
+    Write this process's spans to logs/profile/spans-<run_id>-<worker>.json.
+
+    :return: path of the written file, or None when profiling is disabled
+    """
+    if not ENABLED:
+        return None
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    run_id = os.getenv("PROFILE_RUN_ID", "run")
+    worker = _worker_name()
+    file_path = os.path.join(PROFILE_DIR, f"spans-{run_id}-{worker}.json")
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump(_chrome_events(_events, os.getpid(), worker), f)
+    _events.clear()
+    return file_path
+
+
+def finish_run(logger):
+    """
+    Merge the span files of this run into trace-<run_id>.json and log the top-N table.
+
+    :param logger: logger used for the summary table
+    :return: path of the merged trace, or None when profiling is disabled
+    """
+    if not ENABLED:
+        return None
+    dump_process_spans()
+    run_id = os.getenv("PROFILE_RUN_ID", "run")
+    trace_events = []
+    for file_path in sorted(glob.glob(os.path.join(PROFILE_DIR, f"spans-{run_id}-*.json"))):
+        with open(file_path, "r", encoding="utf-8") as f:
+            trace_events.extend(json.load(f))
+        os.remove(file_path)
+
+    trace_path = os.path.join(PROFILE_DIR, f"trace-{run_id}.json")
+    with open(trace_path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+
+    logger.info(f"Framework overhead trace written to {trace_path}")
+    logger.info("Top framework spans:\n" + format_summary(summarize(trace_events)))
+    return trace_path
@@ -0,0 +1,403 @@
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+import allure
+import allure_commons
+from allure_commons.logger import AllureFileLogger
+
+from load_config import ROOT_DIR
+from test_data.read_settings_file import get_common_settings
+
+"""
+Native results sink, always on and independent of Allure.
+
+Every pytest process buffers the records of the test it is running (steps, attachments,
+checkpoints) and appends them to results/<run_id>.jsonl in one locked write when the test ends,
+followed by the test record itself. attach(), step() and set_title() forward to Allure as well,
+so a run with --alluredir still gets the usual report. Without --alluredir Allure does nothing,
+and export_allure() can write allure-results from the JSONL file later. Allure attachment files
+are named by the hash of their content and written once per run, however many steps attach them:
+
+    python -m utilities.reporting export --run-id <run_id> --alluredir <dir>
+"""
+
+DEFAULT_RESULTS_DIR = os.path.join(ROOT_DIR, "results")
+BODY_CAP_BYTES = 64 * 1024
+
+_lock = threading.Lock()
+_local = threading.local()  # step stack of the thread, DAG steps run in worker threads
+_test = None  # record of the running test
+_records = []  # records of the running test, written when it finishes
+_written_attachments = set()  # paths of the content-addressed attachment files this process wrote
+
+
+def configure():
+    """
+    Read the sink settings. Called once per pytest process from conftest.
+    """
+    global BODY_CAP_BYTES
+    BODY_CAP_BYTES = int(float(get_common_settings("results_body_cap_kb") or 64) * 1024)
+
+
+def start_run():
+    """
+    Called by the controller before workers start, so they inherit RUN_ID and write to the same file.
+    """
+    os.environ.setdefault("RUN_ID", datetime.now().strftime("%Y%m%d_%H%M%S"))
+    _append([{"type": "run", "run_id": get_run_id(), "start": _now_ms(), "pid": os.getpid()}])
+
+
+def get_run_id():
+    return os.getenv("RUN_ID", "run")
+
+
+def get_results_dir():
+    return get_common_settings("results_dir") or DEFAULT_RESULTS_DIR
+
+
+def results_path(run_id=None):
+    return os.path.join(get_results_dir(), f"{run_id or get_run_id()}.jsonl")
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+def _append(records):
+    os.makedirs(get_results_dir(), exist_ok=True)
+    data = "".join(json.dumps(record, default=str) + "\n" for record in records)
+    # one write per test under an exclusive lock, so lines of parallel workers never interleave
+    with open(results_path(), "a", encoding="utf-8") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            f.write(data)
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _record(record):
+    with _lock:
+        if _test is None:
+            return
+        record["test"] = _test["id"]
+        stack = getattr(_local, "steps", None)
+        record.setdefault("step", stack[-1] if stack else None)
+        _records.append(record)
+
+
+def start_test(nodeid):
+    """
+    Start buffering the records of a test. Called from pytest_runtest_protocol.
+    """
+    global _test
+    with _lock:
+        _test = {"type": "test", "id": uuid.uuid4().hex, "run_id": get_run_id(), "nodeid": nodeid,
+                 "title": None, "outcome": "passed", "message": None, "start": _now_ms(),
+                 "worker": os.getenv("PYTEST_XDIST_WORKER") or os.getenv("RUNNER_ID", "main")}
+        _records.clear()
+
+
+def record_phase(report):
+    """
+    Fold the report of a setup/call/teardown phase into the test outcome.
+    """
+    with _lock:
+        if _test is None:
+            return
+        _test.setdefault("durations", {})[report.when] = round(report.duration, 4)
+        if report.outcome == "passed" or _test["outcome"] == "failed":
+            return
+        _test["outcome"] = report.outcome
+        if report.outcome == "skipped" and isinstance(report.longrepr, tuple):
+            _test["message"] = report.longrepr[2]
+        else:
+            crash = getattr(report.longrepr, "reprcrash", None)
+            _test["message"] = crash.message if crash else str(report.longrepr)[-2000:]
+
+
+def finish_test():
+    """
+    Write the buffered records and the test record to the run file.
+    """
+    global _test
+    with _lock:
+        if _test is None:
+            return
+        _test["stop"] = _now_ms()
+        records = _records + [_test]
+        _test = None
+        _records.clear()
+    _append(records)
+
+
+def set_title(title):
+    """
+    Title of the running test, shown instead of its node id (also sets the Allure title).
+    """
+    allure.dynamic.title(title)
+    with _lock:
+        if _test is not None:
+            _test["title"] = title
+
+
+@contextmanager
+def step(name):
+    """
+    Record a step around the enclosed block, nested steps of the same thread get it as parent.
+    Wraps allure.step.
+    """
+    record = {"type": "step", "id": uuid.uuid4().hex, "name": name, "start": _now_ms(), "status": "passed"}
+    _record(record)
+    stack = _local.__dict__.setdefault("steps", [])
+    stack.append(record["id"])
+    try:
+        with allure.step(name):
+            yield
+    except BaseException as e:
+        record["status"] = "skipped" if type(e).__name__ == "Skipped" else "failed"
+        raise
+    finally:
+        stack.pop()
+        record["stop"] = _now_ms()
+
+
+def attachment_prefix(data):
+    """
+    Hash of an attachment body, used where Allure puts a uuid in <prefix>-attachment.<extension>,
+    so identical bodies share one file in allure-results.
+    """
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _write_once(results_dir, file_name, data):
+    # workers may write the same file at the same time, the content is identical either way
+    path = os.path.join(results_dir, file_name)
+    if path in _written_attachments:
+        return
+    if not os.path.exists(path):
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    _written_attachments.add(path)
+
+
+def _report_once(results_dir, file_name, data):
+    # through report_attached_data, as allure.attach does: the Allure file logger writes the file
+    path = os.path.join(results_dir, file_name)
+    if path in _written_attachments:
+        return
+    if not os.path.exists(path):
+        allure_commons.plugin_manager.hook.report_attached_data(body=data, file_name=file_name)
+    _written_attachments.add(path)
+
+
+def _allure_attach(body, name, attachment_type):
+    """
+    allure.attach, except that the file is named by the hash of its content and written once:
+    steps attaching the same schema, expected outcome or checkpoint text all reference one file.
+    This relies on attributes of allure-pytest that are not public API; without them (Allure off,
+    not writing files, or a version that changed them) the body goes through allure.attach.
+    """
+    reporter = results_dir = None
+    for plugin in allure_commons.plugin_manager.get_plugins():
+        if isinstance(plugin, AllureFileLogger):
+            results_dir = getattr(plugin, "_report_dir", None)
+        elif getattr(plugin, "allure_logger", None) is not None:
+            reporter = plugin.allure_logger
+    add_attachment = getattr(reporter, "_attach", None)
+    if add_attachment is None or results_dir is None:
+        allure.attach(body, name=name, attachment_type=attachment_type)
+        return
+    data = body if isinstance(body, bytes) else str(body).encode("utf-8")
+    # only adds the reference to the current step or test, the file is reported here
+    file_name = add_attachment(attachment_prefix(data), name=name, attachment_type=attachment_type)
+    _report_once(results_dir, file_name, data)
+
+
+def attach(body, name, attachment_type=allure.attachment_type.TEXT):
+    """
+    Attach a text/JSON body to the current step, capped at RESULTS_BODY_CAP_KB in the sink.
+    Same signature as allure.attach.
+    """
+    _allure_attach(body, name, attachment_type)
+    body = body if isinstance(body, str) else str(body)
+    size = len(body.encode("utf-8", errors="replace"))
+    truncated = size > BODY_CAP_BYTES
+    if truncated:
+        body = body.encode("utf-8", errors="replace")[:BODY_CAP_BYTES].decode("utf-8", errors="ignore")
+    _record({"type": "attachment", "name": name, "mime": attachment_type.mime_type,
+             "extension": attachment_type.extension, "size": size, "truncated": truncated, "body": body})
+
+
+def checkpoint(name, passed, message):
+    """
+    Record an ApiTestStatus checkpoint, attached to Allure as 'Checkpoint Passed/Failed -> name'.
+    """
+    _allure_attach(message, f"Checkpoint {'Passed' if passed else 'Failed'} -> {name}", allure.attachment_type.TEXT)
+    _record({"type": "checkpoint", "name": name, "passed": bool(passed), "message": message})
+
+
+def record_request(method, endpoint, url, status_code, elapsed_sec):
+    """
+    Record the status code (None when no response came back) and latency of an API request,
+    for the run history.
+    """
+    _record({"type": "request", "method": method, "endpoint": endpoint, "url": url,
+             "status_code": status_code, "latency_ms": round(elapsed_sec * 1000, 3)})
+
+
+def read_run(run_id):
+    """
+    :return: the records of a run; a torn last line of a killed run is ignored
+    """
+    records = []
+    with open(results_path(run_id), encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def list_runs():
+    """
+    :return: run ids with a results file, newest first
+    """
+    results_dir = get_results_dir()
+    if not os.path.isdir(results_dir):
+        return []
+    runs = [name[:-len(".jsonl")] for name in os.listdir(results_dir) if name.endswith(".jsonl")]
+    return sorted(runs, reverse=True)
+
+
+def summarize_run(run_id):
+    """
+    :return: totals and one row per test (title, outcome, duration, message, failed checkpoints)
+    """
+    records = read_run(run_id)
+    failed_checkpoints = {}
+    for record in records:
+        if record["type"] == "checkpoint" and not record["passed"]:
+            failed_checkpoints.setdefault(record["test"], []).append(record["name"])
+
+    tests = []
+    totals = {"total": 0, "passed": 0, "failed": 0, "skipped": 0}
+    start = stop = None
+    for record in records:
+        if record["type"] == "run":
+            # every queue runner of a distributed run starts its own session
+            start = record["start"] if start is None else min(start, record["start"])
+        if record["type"] != "test":
+            continue
+        totals["total"] += 1
+        totals[record["outcome"]] = totals.get(record["outcome"], 0) + 1
+        stop = max(stop or 0, record["stop"])
+        tests.append({
+            "nodeid": record["nodeid"],
+            "title": record["title"] or record["nodeid"],
+            "outcome": record["outcome"],
+            "duration_sec": round((record["stop"] - record["start"]) / 1000, 3),
+            "message": record["message"],
+            "failed_checkpoints": failed_checkpoints.get(record["id"], []),
+            "worker": record["worker"],
+        })
+    return {
+        "run_id": run_id,
+        "totals": totals,
+        "duration_sec": round((stop - start) / 1000, 3) if start and stop else None,
+        "tests": tests,
+    }
+
+
+def export_allure(run_id, alluredir):
+    """
+    Write allure-results for a stored run, so `allure generate` can build the usual report later.
+
+    :return: number of exported tests
+    """
+    os.makedirs(alluredir, exist_ok=True)
+    records = read_run(run_id)
+    steps, test_items = {}, {}
+    for record in records:
+        if record["type"] == "step":
+            steps[record["id"]] = dict(record, steps=[], attachments=[])
+
+    def allure_attachment(record):
+        data = record["body"].encode("utf-8")
+        source = f"{attachment_prefix(data)}-attachment.{record['extension']}"
+        _write_once(alluredir, source, data)
+        return {"name": record["name"], "source": source, "type": record["mime"]}
+
+    for record in records:
+        if record["type"] == "checkpoint":
+            record = {"type": "attachment", "test": record["test"], "step": record["step"], "extension": "txt",
+                      "mime": "text/plain", "body": record["message"],
+                      "name": f"Checkpoint {'Passed' if record['passed'] else 'Failed'} -> {record['name']}"}
+        if record["type"] == "attachment":
+            parent = steps.get(record["step"])
+            target = parent["attachments"] if parent else test_items.setdefault(record["test"], {}).setdefault("attachments", [])
+            target.append(allure_attachment(record))
+        elif record["type"] == "step":
+            parent = steps.get(record["step"])
+            target = parent["steps"] if parent else test_items.setdefault(record["test"], {}).setdefault("steps", [])
+            target.append(steps[record["id"]])
+
+    def allure_step(step_record):
+        return {"name": step_record["name"], "status": step_record["status"], "stage": "finished",
+                "start": step_record["start"], "stop": step_record.get("stop", step_record["start"]),
+                "steps": [allure_step(child) for child in step_record["steps"]],
+                "attachments": step_record["attachments"]}
+
+    exported = 0
+    for record in records:
+        if record["type"] != "test":
+            continue
+        test_children = test_items.get(record["id"], {})
+        result = {
+            "uuid": str(uuid.uuid4()),
+            "historyId": hashlib.md5(record["nodeid"].encode()).hexdigest(),
+            "testCaseId": hashlib.md5(record["nodeid"].split("[")[0].encode()).hexdigest(),
+            "name": record["title"] or record["nodeid"],
+            "fullName": record["nodeid"],
+            "status": record["outcome"],
+            "statusDetails": {"message": record["message"]} if record["message"] else {},
+            "stage": "finished",
+            "start": record["start"],
+            "stop": record["stop"],
+            "steps": [allure_step(child) for child in test_children.get("steps", [])],
+            "attachments": test_children.get("attachments", []),
+            "labels": [{"name": "framework", "value": "pytest"}, {"name": "thread", "value": record["worker"]}],
+        }
+        with open(os.path.join(alluredir, f"{result['uuid']}-result.json"), "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        exported += 1
+    return exported
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Native results sink")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export", help="write allure-results from a stored run")
+    export_parser.add_argument("--run-id", type=str, default=None, help="run to export, the latest by default")
+    export_parser.add_argument("--alluredir", type=str, required=True, help="allure-results directory to write")
+    summary_parser = subparsers.add_parser("summary", help="print the summary of a stored run as JSON")
+    summary_parser.add_argument("--run-id", type=str, default=None, help="run to summarize, the latest by default")
+
+    args = parser.parse_args()
+    run_id = args.run_id or next(iter(list_runs()), None)
+    if run_id is None:
+        parser.error(f"No stored runs in {get_results_dir()}")
+    if args.command == "export":
+        print(f"Exported {export_allure(run_id, args.alluredir)} tests of run {run_id} to {args.alluredir}")
+    else:
+        print(json.dumps(summarize_run(run_id), indent=4))
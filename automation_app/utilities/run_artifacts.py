@@ -0,0 +1,302 @@
+import argparse
+import fcntl
+import json
+import os
+import shutil
+import tarfile
+import time
+from datetime import datetime
+
+from load_config import ROOT_DIR
+from test_data.read_settings_file import get_common_settings
+
+"""
+Run-scoped artifact directories.
+
+Every run gets artifacts/<run_id>/ with its logs, Allure results and report, single-file report
+and test summary, so concurrent REST and GraphQL runs never touch each other's files. The
+latest-<testtype> symlink points at the last run whose Allure report was generated; the next run
+of that type hardlinks the report's history into its allure-results instead of copying it.
+
+maintain() runs in the background after each run. It deletes runs older than
+ARTIFACTS_MAX_AGE_DAYS, packs finished runs beyond the newest ARTIFACTS_KEEP_UNCOMPRESSED into
+<run_id>.tar.gz, then deletes runs, oldest first, while the total is over ARTIFACTS_MAX_TOTAL_MB.
+The runs that latest-* points at are never packed or deleted. Each run is packed once, so the disk work of a
+run is proportional to its own artifacts and not to the kept history.
+
+The native results (results/<run_id>.jsonl) of a deleted run are deleted with it, and those of
+runs without artifacts once they are older than ARTIFACTS_MAX_AGE_DAYS. The run history drops
+the runs older than RUN_HISTORY_MAX_AGE_DAYS.
+"""
+
+MANIFEST = "run.json"
+ARCHIVE_SUFFIX = ".tar.gz"
+LATEST_PREFIX = "latest-"
+LOCK_FILE = ".maintain.lock"
+
+
+def get_artifacts_dir():
+    return get_common_settings("artifacts_dir") or os.path.join(ROOT_DIR, "artifacts")
+
+
+def get_retention_settings():
+    return {
+        "keep_uncompressed": int(get_common_settings("artifacts_keep_uncompressed") or 3),
+        "max_age_days": float(get_common_settings("artifacts_max_age_days") or 30),
+        "max_total_mb": float(get_common_settings("artifacts_max_total_mb") or 2048),
+        "history_max_age_days": float(get_common_settings("run_history_max_age_days") or 180),
+    }
+
+
+def run_dir(run_id):
+    return os.path.join(get_artifacts_dir(), run_id)
+
+
+def new_run_id(testtype):
+    """
+    :return: <timestamp>_<testtype>, unique among the runs in the artifacts directory
+    """
+    run_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{testtype}"
+    candidate, suffix = run_id, 1
+    while os.path.exists(run_dir(candidate)) or os.path.exists(run_dir(candidate) + ARCHIVE_SUFFIX):
+        suffix += 1
+        candidate = f"{run_id}_{suffix}"
+    return candidate
+
+
+def create_run(run_id, testtype):
+    """
+    Create artifacts/<run_id>/logs and the run manifest. A run created earlier (by the Flask app
+    before it starts the entrypoint) is reused.
+
+    :return: the run directory
+    """
+    path = run_dir(run_id)
+    os.makedirs(os.path.join(path, "logs"), exist_ok=True)
+    if not os.path.exists(os.path.join(path, MANIFEST)):
+        _write_manifest(path, {"run_id": run_id, "testtype": testtype, "started": time.time(), "finished": None})
+    return path
+
+
+def finish_run(path, **fields):
+    """
+    Mark a run finished, only finished runs are packed.
+    """
+    manifest = read_manifest(path)
+    manifest.update(fields, finished=time.time())
+    _write_manifest(path, manifest)
+
+
+def read_manifest(path):
+    try:
+        with open(os.path.join(path, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(path, manifest):
+    manifest_path = os.path.join(path, MANIFEST)
+    with open(f"{manifest_path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=4)
+    os.replace(f"{manifest_path}.tmp", manifest_path)
+
+
+def latest_run(testtype):
+    """
+    :return: the directory of the last run of testtype with a generated report, or None
+    """
+    path = os.path.join(get_artifacts_dir(), f"{LATEST_PREFIX}{testtype}")
+    return os.path.realpath(path) if os.path.isdir(path) else None
+
+
+def set_latest(testtype, run_id):
+    # a new symlink renamed over the old one, readers always see a complete run
+    path = os.path.join(get_artifacts_dir(), f"{LATEST_PREFIX}{testtype}")
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    os.symlink(run_id, temp_path)
+    os.replace(temp_path, path)
+
+
+def link_tree(src_dir, dst_dir):
+    """
+    Hardlink the files of src_dir into dst_dir, copying only where hardlinks are not possible
+    (another filesystem). Allure writes a new history into the report, it never edits these files.
+
+    :return: number of files linked or copied
+    """
+    count = 0
+    for current_dir, _, files in os.walk(src_dir):
+        target_dir = os.path.join(dst_dir, os.path.relpath(current_dir, src_dir))
+        os.makedirs(target_dir, exist_ok=True)
+        for name in files:
+            source, target = os.path.join(current_dir, name), os.path.join(target_dir, name)
+            if os.path.exists(target):
+                os.remove(target)
+            try:
+                os.link(source, target)
+            except OSError:
+                shutil.copy2(source, target)
+            count += 1
+    return count
+
+
+def _tree_size(path):
+    size = 0
+    for current_dir, _, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.lstat(os.path.join(current_dir, name)).st_size
+            except OSError:
+                continue
+    return size
+
+
+def list_runs():
+    """
+    :return: the stored runs, newest first, as dictionaries with run_id, path, compressed,
+             started, finished, size_bytes (of archives only) and latest (testtypes it is
+             the latest run of)
+    """
+    base_dir = get_artifacts_dir()
+    if not os.path.isdir(base_dir):
+        return []
+    latest = {}
+    runs = []
+    for name in os.listdir(base_dir):
+        path = os.path.join(base_dir, name)
+        if name.startswith(LATEST_PREFIX) and os.path.islink(path):
+            latest.setdefault(os.readlink(path), []).append(name[len(LATEST_PREFIX):])
+        elif name.endswith(ARCHIVE_SUFFIX) and os.path.isfile(path):
+            stat = os.stat(path)
+            runs.append({"run_id": name[:-len(ARCHIVE_SUFFIX)], "path": path, "compressed": True,
+                         "started": stat.st_mtime, "finished": stat.st_mtime, "size_bytes": stat.st_size})
+        elif os.path.isdir(path) and not os.path.islink(path) and os.path.exists(os.path.join(path, MANIFEST)):
+            manifest = read_manifest(path)
+            runs.append({"run_id": name, "path": path, "compressed": False,
+                         "started": manifest.get("started") or os.path.getmtime(path),
+                         "finished": manifest.get("finished"), "size_bytes": None})
+    for run in runs:
+        run["latest"] = latest.get(run["run_id"], [])
+    return sorted(runs, key=lambda run: run["started"], reverse=True)
+
+
+def compress_run(path):
+    """
+    Pack a run directory into <run_id>.tar.gz next to it and remove the directory.
+
+    :return: path of the archive
+    """
+    archive_path = path + ARCHIVE_SUFFIX
+    with tarfile.open(f"{archive_path}.tmp", "w:gz", compresslevel=6) as archive:
+        archive.add(path, arcname=os.path.basename(path))
+    os.replace(f"{archive_path}.tmp", archive_path)
+    # the archive keeps the run's end time, retention ages runs by it
+    finished = read_manifest(path).get("finished")
+    if finished:
+        os.utime(archive_path, (finished, finished))
+    shutil.rmtree(path)
+    return archive_path
+
+
+def _delete(run):
+    if run["compressed"]:
+        os.remove(run["path"])
+    else:
+        shutil.rmtree(run["path"])
+
+
+def _prune_results(deleted_ids, kept_ids, max_age_days):
+    """
+    Delete the native results files of the deleted runs, and of runs without artifacts that are
+    older than max_age_days. Runs whose artifacts are kept keep their results.
+
+    :return: the run ids whose results were deleted
+    """
+    from utilities import reporting
+
+    deleted = []
+    now = time.time()
+    for run_id in reporting.list_runs():
+        path = reporting.results_path(run_id)
+        try:
+            expired = run_id not in kept_ids and (now - os.path.getmtime(path)) / 86400 > max_age_days
+            if run_id in deleted_ids or expired:
+                os.remove(path)
+                deleted.append(run_id)
+        except FileNotFoundError:
+            continue
+    return deleted
+
+
+def maintain():
+    """
+    Pack old runs and apply the retention policy. Returns None without doing anything when
+    another process is already maintaining the artifacts directory.
+
+    :return: dictionary with the packed and deleted run ids, the deleted native results files and
+             the run ids dropped from the run history
+    """
+    base_dir = get_artifacts_dir()
+    os.makedirs(base_dir, exist_ok=True)
+    settings = get_retention_settings()
+    with open(os.path.join(base_dir, LOCK_FILE), "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+
+        result = {"compressed": [], "deleted": []}
+        now = time.time()
+        kept = []
+        for run in list_runs():
+            # a run that never finished is kept until it is past the age limit (a crashed run)
+            age_days = (now - (run["finished"] or run["started"])) / 86400
+            if not run["latest"] and age_days > settings["max_age_days"]:
+                _delete(run)
+                result["deleted"].append(run["run_id"])
+            else:
+                kept.append(run)
+
+        for position, run in enumerate(kept):
+            if (position >= settings["keep_uncompressed"] and not run["compressed"]
+                    and run["finished"] and not run["latest"]):
+                run["path"] = compress_run(run["path"])
+                run["compressed"] = True
+                run["size_bytes"] = os.path.getsize(run["path"])
+                result["compressed"].append(run["run_id"])
+
+        total = 0
+        for run in kept:
+            if run["size_bytes"] is None:
+                run["size_bytes"] = _tree_size(run["path"])
+            total += run["size_bytes"]
+        max_total = settings["max_total_mb"] * 1024 * 1024
+        for run in reversed(kept):
+            if total <= max_total:
+                break
+            if run["latest"] or not run["finished"]:
+                continue
+            _delete(run)
+            total -= run["size_bytes"]
+            result["deleted"].append(run["run_id"])
+
+        kept_ids = {run["run_id"] for run in kept} - set(result["deleted"])
+        result["results_deleted"] = _prune_results(set(result["deleted"]), kept_ids, settings["max_age_days"])
+        # imported here, the artifacts helpers are used by the launchers before any test runs
+        from utilities import run_history
+        result["history_deleted"] = run_history.prune(settings["history_max_age_days"])
+        return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run-scoped artifact directories")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("maintain", help="pack old runs and apply the retention policy")
+    subparsers.add_parser("list", help="print the stored runs as JSON")
+
+    args = parser.parse_args()
+    if args.command == "maintain":
+        print(json.dumps(maintain(), indent=4))
+    else:
+        print(json.dumps(list_runs(), indent=4))
@@ -0,0 +1,266 @@
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import time
+from contextlib import closing
+
+from test_data.read_settings_file import get_common_settings
+from utilities import reporting
+
+"""
+Run history in an indexed SQLite database, fed from the native results of every run.
+
+sequences and steps keep one row per test and per API request of each run. The rollups
+endpoint_runs (per run and endpoint) and slowest_steps (the SLOWEST_PER_RUN slowest requests of
+each run) are filled at ingest time, so the trend, flakiness and slowest-step queries over the
+last N runs read a few rows per run instead of scanning millions of step rows.
+"""
+
+DB_FILE_NAME = "history.sqlite"
+SLOWEST_PER_RUN = 50
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT UNIQUE NOT NULL,
+    start INTEGER, stop INTEGER,
+    total INTEGER, passed INTEGER, failed INTEGER, skipped INTEGER
+);
+CREATE TABLE IF NOT EXISTS sequences (
+    run_seq INTEGER NOT NULL, nodeid TEXT NOT NULL, title TEXT, outcome TEXT,
+    duration_ms INTEGER, start INTEGER
+);
+CREATE INDEX IF NOT EXISTS sequences_nodeid ON sequences (nodeid, run_seq);
+CREATE INDEX IF NOT EXISTS sequences_run ON sequences (run_seq);
+CREATE TABLE IF NOT EXISTS steps (
+    run_seq INTEGER NOT NULL, nodeid TEXT NOT NULL, step_name TEXT, method TEXT, endpoint TEXT,
+    status_code INTEGER, latency_ms REAL, outcome TEXT
+);
+CREATE INDEX IF NOT EXISTS steps_endpoint ON steps (endpoint, method, run_seq);
+CREATE INDEX IF NOT EXISTS steps_run ON steps (run_seq);
+CREATE TABLE IF NOT EXISTS endpoint_runs (
+    run_seq INTEGER NOT NULL, endpoint TEXT NOT NULL, method TEXT NOT NULL,
+    requests INTEGER, failures INTEGER, total_latency_ms REAL, max_latency_ms REAL, median_latency_ms REAL,
+    PRIMARY KEY (endpoint, method, run_seq)
+);
+CREATE INDEX IF NOT EXISTS endpoint_runs_run ON endpoint_runs (run_seq);
+CREATE TABLE IF NOT EXISTS slowest_steps (
+    run_seq INTEGER NOT NULL, nodeid TEXT, step_name TEXT, method TEXT, endpoint TEXT,
+    status_code INTEGER, latency_ms REAL
+);
+CREATE INDEX IF NOT EXISTS slowest_steps_run ON slowest_steps (run_seq, latency_ms);
+CREATE TABLE IF NOT EXISTS latency_regressions (
+    run_seq INTEGER NOT NULL, endpoint TEXT NOT NULL, method TEXT NOT NULL,
+    median_latency_ms REAL, baseline_median_ms REAL, baseline_mad_ms REAL, threshold_ms REAL,
+    ratio REAL, baseline_runs INTEGER
+);
+CREATE INDEX IF NOT EXISTS latency_regressions_run ON latency_regressions (run_seq);
+"""
+
+# columns added after the first version of a table, for databases created before them
+ADDED_COLUMNS = {"endpoint_runs": {"median_latency_ms": "REAL"}}
+
+RUN_TABLES = ("sequences", "steps", "endpoint_runs", "slowest_steps", "latency_regressions")
+
+
+def get_db_path():
+    return get_common_settings("run_history_db") or os.path.join(reporting.get_results_dir(), DB_FILE_NAME)
+
+
+def connect(db_path=None):
+    """
+    Open the history database, creating the schema on first use.
+    """
+    db_path = db_path or get_db_path()
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    connection = sqlite3.connect(db_path, timeout=30)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.executescript(SCHEMA)
+    for table, columns in ADDED_COLUMNS.items():
+        existing = {row["name"] for row in connection.execute(f"PRAGMA table_info({table})")}
+        for column, column_type in columns.items():
+            if column not in existing:
+                connection.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+    return connection
+
+
+def _request_rows(records):
+    """
+    One row per API request, with the step it ran in and the outcome of that step.
+    """
+    steps = {record["id"]: record for record in records if record["type"] == "step"}
+    tests = {record["id"]: record for record in records if record["type"] == "test"}
+    for record in records:
+        if record["type"] != "request" or record["test"] not in tests:
+            continue
+        step = steps.get(record["step"]) or {}
+        failed = record["status_code"] is None or step.get("status") == "failed"
+        yield (tests[record["test"]]["nodeid"], step.get("name"), record["method"], record["endpoint"],
+               record["status_code"], record["latency_ms"], "failed" if failed else "passed")
+
+
+def ingest_run(run_id, db_path=None):
+    """
+    Store a run from its native results. Ingesting a run again replaces it.
+
+    :return: sequence number of the run in the history
+    """
+    records = reporting.read_run(run_id)
+    tests = [record for record in records if record["type"] == "test"]
+    steps = list(_request_rows(records))
+    outcomes = [test["outcome"] for test in tests]
+    run_row = (min((test["start"] for test in tests), default=None), max((test["stop"] for test in tests), default=None),
+               len(tests), outcomes.count("passed"), outcomes.count("failed"), outcomes.count("skipped"))
+
+    with closing(connect(db_path)) as connection, connection:
+        row = connection.execute("SELECT seq FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        if row:
+            # keep the run's place in the history, replace its rows
+            run_seq = row["seq"]
+            for table in RUN_TABLES:
+                connection.execute(f"DELETE FROM {table} WHERE run_seq = ?", (run_seq,))
+            connection.execute("UPDATE runs SET start = ?, stop = ?, total = ?, passed = ?, failed = ?, skipped = ? "
+                               "WHERE seq = ?", (*run_row, run_seq))
+        else:
+            run_seq = connection.execute(
+                "INSERT INTO runs (run_id, start, stop, total, passed, failed, skipped) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (run_id, *run_row)).lastrowid
+        connection.executemany(
+            "INSERT INTO sequences VALUES (?, ?, ?, ?, ?, ?)",
+            [(run_seq, test["nodeid"], test["title"], test["outcome"], test["stop"] - test["start"], test["start"])
+             for test in tests])
+        connection.executemany("INSERT INTO steps VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [(run_seq, *step) for step in steps])
+
+        # rollups, built from this run's rows only
+        connection.execute("""
+            INSERT INTO endpoint_runs
+            SELECT run_seq, endpoint, method, COUNT(*), SUM(outcome = 'failed'), SUM(latency_ms), MAX(latency_ms), NULL
+            FROM steps WHERE run_seq = ? AND endpoint IS NOT NULL GROUP BY endpoint, method
+        """, (run_seq,))
+        # SQLite has no median, the latency-regression baseline is built from these
+        latencies = {}
+        for nodeid, step_name, method, endpoint, status_code, latency_ms, outcome in steps:
+            if endpoint is not None:
+                latencies.setdefault((endpoint, method), []).append(latency_ms)
+        connection.executemany(
+            "UPDATE endpoint_runs SET median_latency_ms = ? WHERE run_seq = ? AND endpoint = ? AND method = ?",
+            [(statistics.median(values), run_seq, endpoint, method) for (endpoint, method), values in latencies.items()])
+        connection.execute("""
+            INSERT INTO slowest_steps
+            SELECT run_seq, nodeid, step_name, method, endpoint, status_code, latency_ms
+            FROM steps WHERE run_seq = ? ORDER BY latency_ms DESC LIMIT ?
+        """, (run_seq, SLOWEST_PER_RUN))
+    return run_seq
+
+
+def prune(max_age_days, db_path=None):
+    """
+    Delete the runs that finished more than max_age_days ago, with all their rows.
+
+    :return: the deleted run ids
+    """
+    cutoff_ms = (time.time() - max_age_days * 86400) * 1000
+    with closing(connect(db_path)) as connection, connection:
+        rows = connection.execute("SELECT seq, run_id FROM runs WHERE COALESCE(stop, start) < ?",
+                                  (cutoff_ms,)).fetchall()
+        for table in RUN_TABLES:
+            connection.executemany(f"DELETE FROM {table} WHERE run_seq = ?", [(row["seq"],) for row in rows])
+        connection.executemany("DELETE FROM runs WHERE seq = ?", [(row["seq"],) for row in rows])
+    return [row["run_id"] for row in rows]
+
+
+def _first_run_seq(connection, last_runs):
+    row = connection.execute("SELECT seq FROM runs ORDER BY seq DESC LIMIT 1 OFFSET ?", (max(last_runs, 1) - 1,)).fetchone()
+    return row["seq"] if row else 0
+
+
+def list_runs(last_runs=20, db_path=None):
+    with closing(connect(db_path)) as connection:
+        rows = connection.execute("SELECT * FROM runs ORDER BY seq DESC LIMIT ?", (last_runs,)).fetchall()
+    return [dict(row) for row in rows]
+
+
+def endpoint_trends(last_runs=20, endpoint=None, db_path=None):
+    """
+    Requests, failure rate and mean/max latency per endpoint and run over the last N runs.
+    """
+    query = """
+        SELECT r.run_id, e.endpoint, e.method, e.requests, e.failures,
+               ROUND(1.0 * e.failures / e.requests, 4) AS failure_rate,
+               ROUND(e.total_latency_ms / e.requests, 3) AS mean_latency_ms, e.max_latency_ms
+        FROM endpoint_runs e JOIN runs r ON r.seq = e.run_seq
+        WHERE e.run_seq >= ?{endpoint_filter}
+        ORDER BY e.endpoint, e.method, e.run_seq
+    """
+    with closing(connect(db_path)) as connection:
+        params = [_first_run_seq(connection, last_runs)]
+        if endpoint is not None:
+            params.append(endpoint)
+        rows = connection.execute(
+            query.format(endpoint_filter=" AND e.endpoint = ?" if endpoint is not None else ""), params).fetchall()
+    trends = {}
+    for row in rows:
+        trends.setdefault(f"{row['method']} {row['endpoint']}", []).append(
+            {key: row[key] for key in ("run_id", "requests", "failures", "failure_rate", "mean_latency_ms", "max_latency_ms")})
+    return trends
+
+
+def flaky_sequences(last_runs=20, db_path=None):
+    """
+    Per sequence over the last N runs: pass/fail counts and the flakiness rate, i.e. the share of
+    consecutive runs in which the outcome flipped between passed and failed. Most flaky first.
+    """
+    with closing(connect(db_path)) as connection:
+        rows = connection.execute("""
+            SELECT nodeid, MAX(title) AS title, COUNT(*) AS runs,
+                   SUM(outcome = 'passed') AS passed, SUM(outcome = 'failed') AS failed,
+                   SUM(flipped) AS flips
+            FROM (
+                SELECT nodeid, title, outcome,
+                       outcome != LAG(outcome) OVER (PARTITION BY nodeid ORDER BY run_seq) AS flipped
+                FROM sequences WHERE run_seq >= ? AND outcome IN ('passed', 'failed')
+            )
+            GROUP BY nodeid
+        """, (_first_run_seq(connection, last_runs),)).fetchall()
+    result = []
+    for row in rows:
+        row = dict(row)
+        row["flips"] = row["flips"] or 0
+        row["flakiness"] = round(row["flips"] / (row["runs"] - 1), 4) if row["runs"] > 1 else 0.0
+        result.append(row)
+    result.sort(key=lambda row: (row["flakiness"], row["failed"]), reverse=True)
+    return result
+
+
+def slowest_steps(last_runs=20, limit=20, db_path=None):
+    """
+    The slowest requests over the last N runs, read from the per-run slowest_steps rollup.
+    """
+    with closing(connect(db_path)) as connection:
+        rows = connection.execute("""
+            SELECT r.run_id, s.nodeid, s.step_name, s.method, s.endpoint, s.status_code, s.latency_ms
+            FROM slowest_steps s JOIN runs r ON r.seq = s.run_seq
+            WHERE s.run_seq >= ? ORDER BY s.latency_ms DESC LIMIT ?
+        """, (_first_run_seq(connection, last_runs), min(limit, SLOWEST_PER_RUN))).fetchall()
+    return [dict(row) for row in rows]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run history database")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = subparsers.add_parser("ingest", help="store runs from their native results")
+    ingest_parser.add_argument("--run-id", type=str, default=None, help="run to store, all stored runs by default")
+    for name in ("trends", "flaky", "slowest"):
+        query_parser = subparsers.add_parser(name, help=f"print the {name} query as JSON")
+        query_parser.add_argument("--runs", type=int, default=20, help="number of most recent runs")
+
+    args = parser.parse_args()
+    if args.command == "ingest":
+        for run_id in [args.run_id] if args.run_id else sorted(reporting.list_runs()):
+            print(f"Stored run {run_id} as #{ingest_run(run_id)}")
+    else:
+        query = {"trends": endpoint_trends, "flaky": flaky_sequences, "slowest": slowest_steps}[args.command]
+        print(json.dumps(query(args.runs), indent=4))
@@ -0,0 +1,70 @@
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+
+from load_config import ROOT_DIR
+
+STATE_DIR = os.path.join(ROOT_DIR, ".state")
+
+
+class SharedJsonStore:
+    """
+    A small JSON document shared by every process on the machine (pytest-xdist workers,
+    runner processes), guarded by an advisory file lock.
+
+    Usage:
+        store = SharedJsonStore("rest_auth_token")
+        with store.transaction() as state:
+            state["key"] = "value"   # written back when the block exits
+    """
+
+    def __init__(self, name, state_dir=STATE_DIR, mode=None):
+        """
+        :param mode: permissions of the document, e.g. 0o600 for secrets; None leaves them to the umask
+        """
+        os.makedirs(state_dir, exist_ok=True)
+        self.path = os.path.join(state_dir, f"{name}.json")
+        self.lock_path = os.path.join(state_dir, f"{name}.lock")
+        self.mode = mode
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    @contextmanager
+    def _locked(self, lock_type):
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, lock_type)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def read(self):
+        """
+        Return a snapshot of the document under a shared lock.
+        """
+        with self._locked(fcntl.LOCK_SH):
+            return self._load()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Hold the exclusive lock, yield the document and write it back atomically on success.
+        """
+        with self._locked(fcntl.LOCK_EX):
+            state = self._load()
+            yield state
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            if self.mode is None:
+                f = open(tmp_path, "w", encoding="utf-8")
+            else:
+                # created with the mode, the document is never readable by others, not even briefly
+                f = os.fdopen(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, self.mode), "w", encoding="utf-8")
+            with f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.path)
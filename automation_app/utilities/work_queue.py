@@ -0,0 +1,430 @@
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import closing
+
+from load_config import ROOT_DIR
+from test_data.read_settings_file import get_common_settings
+from utilities import custom_logger
+
+"""
+Pull-based work queue that spreads the sequences of one run over several runner processes,
+on one host or in several containers.
+
+The coordinator (entrypoint_docker.py --runners, started by the Flask app) puts one task per
+sequence in the queue. Each runner is a pytest process that collects the plan once and then,
+instead of running its items in order, leases a few tasks at a time, claims each one when it
+starts it and reports its outcome. A runner with nothing left to lease steals the tasks another
+runner leased but has not started. Runners renew their leases with a heartbeat; the tasks of a
+runner that stops sending them go back to the queue when the lease expires, and a task that
+outlived QUEUE_MAX_ATTEMPTS runners is given up as failed.
+
+All runners write to the allure-results directory of the run, so the results merge into one
+report. The queue lives in SQLite (.state/work_queue.sqlite): local runners open it directly,
+remote runners set COORDINATOR_URL and reach it through the Flask app's /queue routes.
+"""
+
+log = custom_logger.customlogger(logging.DEBUG)
+
+DEFAULT_DB_PATH = os.path.join(ROOT_DIR, ".state", "work_queue.sqlite")
+POLL_SEC = 1.0  # how often an idle runner or the coordinator looks at the queue again
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS queue_runs (
+    run_id TEXT PRIMARY KEY, testtype TEXT, created REAL, deadline REAL, closed INTEGER DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    run_id TEXT NOT NULL, task_id TEXT NOT NULL, position INTEGER NOT NULL,
+    state TEXT NOT NULL, runner TEXT, lease_expires REAL, attempts INTEGER DEFAULT 0,
+    outcome TEXT, duration_sec REAL,
+    PRIMARY KEY (run_id, task_id)
+);
+CREATE INDEX IF NOT EXISTS tasks_state ON tasks (run_id, state, position);
+CREATE TABLE IF NOT EXISTS runners (
+    run_id TEXT NOT NULL, runner TEXT NOT NULL, last_seen REAL, completed INTEGER DEFAULT 0,
+    PRIMARY KEY (run_id, runner)
+);
+"""
+
+# task states: pending -> leased (in a runner's batch) -> running -> done
+OPEN_STATES = ("pending", "leased", "running")
+
+
+def get_queue_settings():
+    return {
+        "lease_sec": float(get_common_settings("queue_lease_sec") or 30),
+        "heartbeat_sec": float(get_common_settings("queue_heartbeat_sec") or 5),
+        "batch_size": int(get_common_settings("queue_batch_size") or 2),
+        "max_attempts": int(get_common_settings("queue_max_attempts") or 3),
+    }
+
+
+def sequence_key(sequence):
+    """
+    :return: the task id of a sequence, the test number of its first step
+    """
+    return str(sequence[0])
+
+
+class WorkQueue:
+    """
+    The queue in a local SQLite database, shared by every process on the host.
+    Every change runs in one IMMEDIATE transaction, so two runners never lease the same task.
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or get_common_settings("work_queue_db") or DEFAULT_DB_PATH
+        self.settings = get_queue_settings()
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        with closing(self._connect()) as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+
+    def _connect(self):
+        connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def _transaction(self, work):
+        with closing(self._connect()) as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(connection)
+                connection.execute("COMMIT")
+                return result
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+
+    def create_run(self, run_id, task_ids, testtype=None, deadline=None):
+        def work(connection):
+            connection.execute("INSERT OR REPLACE INTO queue_runs (run_id, testtype, created, deadline, closed) "
+                               "VALUES (?, ?, ?, ?, 0)", (run_id, testtype, time.time(), deadline))
+            connection.execute("DELETE FROM tasks WHERE run_id = ?", (run_id,))
+            connection.execute("DELETE FROM runners WHERE run_id = ?", (run_id,))
+            connection.executemany("INSERT INTO tasks (run_id, task_id, position, state) VALUES (?, ?, ?, 'pending')",
+                                   [(run_id, task_id, position) for position, task_id in enumerate(task_ids)])
+        self._transaction(work)
+
+    def close_run(self, run_id):
+        self._transaction(lambda connection: connection.execute(
+            "UPDATE queue_runs SET closed = 1 WHERE run_id = ?", (run_id,)))
+
+    def get_run(self, run_id):
+        with closing(self._connect()) as connection:
+            row = connection.execute("SELECT * FROM queue_runs WHERE run_id = ?", (run_id,)).fetchone()
+        return dict(row) if row else None
+
+    def active_runs(self):
+        """
+        :return: the open runs that still have tasks, oldest first
+        """
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                "SELECT * FROM queue_runs r WHERE closed = 0 AND EXISTS "
+                "(SELECT 1 FROM tasks t WHERE t.run_id = r.run_id AND t.state IN ('pending', 'leased', 'running')) "
+                "ORDER BY created").fetchall()
+        return [dict(row) for row in rows]
+
+    def _requeue_expired(self, connection, run_id, now):
+        # the tasks of a runner that stopped sending heartbeats go back to the queue
+        connection.execute(
+            "UPDATE tasks SET state = 'pending', runner = NULL, lease_expires = NULL, attempts = attempts + 1 "
+            "WHERE run_id = ? AND state IN ('leased', 'running') AND lease_expires < ?", (run_id, now))
+        connection.execute(
+            "UPDATE tasks SET state = 'done', outcome = 'failed', runner = NULL "
+            "WHERE run_id = ? AND state = 'pending' AND attempts >= ?", (run_id, self.settings["max_attempts"]))
+
+    def lease(self, run_id, runner, max_tasks=None):
+        """
+        Lease up to max_tasks pending tasks, in plan order. With none left, steal half of the
+        leased but not started tasks of the runner with the most of them.
+
+        :return: the leased task ids
+        """
+        max_tasks = max_tasks or self.settings["batch_size"]
+
+        def work(connection):
+            now = time.time()
+            self._touch(connection, run_id, runner, now)
+            self._requeue_expired(connection, run_id, now)
+            rows = connection.execute("SELECT task_id FROM tasks WHERE run_id = ? AND state = 'pending' "
+                                      "ORDER BY position LIMIT ?", (run_id, max_tasks)).fetchall()
+            if not rows:
+                victim = connection.execute(
+                    "SELECT runner, COUNT(*) AS backlog FROM tasks WHERE run_id = ? AND state = 'leased' "
+                    "AND runner != ? GROUP BY runner ORDER BY backlog DESC LIMIT 1", (run_id, runner)).fetchone()
+                if victim is None:
+                    return []
+                # the end of the victim's batch, it starts its tasks from the front
+                rows = connection.execute(
+                    "SELECT task_id FROM tasks WHERE run_id = ? AND state = 'leased' AND runner = ? "
+                    "ORDER BY position DESC LIMIT ?",
+                    (run_id, victim["runner"], min(max_tasks, (victim["backlog"] + 1) // 2))).fetchall()
+                log.info(f"Runner {runner} steals {len(rows)} task(s) from {victim['runner']}")
+            task_ids = [row["task_id"] for row in rows]
+            connection.executemany(
+                "UPDATE tasks SET state = 'leased', runner = ?, lease_expires = ? WHERE run_id = ? AND task_id = ?",
+                [(runner, now + self.settings["lease_sec"], run_id, task_id) for task_id in task_ids])
+            return task_ids
+        return self._transaction(work)
+
+    def start(self, run_id, runner, task_id):
+        """
+        Claim a leased task before running it.
+
+        :return: False when the task was stolen or given to another runner meanwhile
+        """
+        def work(connection):
+            return connection.execute(
+                "UPDATE tasks SET state = 'running', lease_expires = ? "
+                "WHERE run_id = ? AND task_id = ? AND runner = ? AND state = 'leased'",
+                (time.time() + self.settings["lease_sec"], run_id, task_id, runner)).rowcount == 1
+        return self._transaction(work)
+
+    def complete(self, run_id, runner, task_id, outcome, duration_sec=None):
+        """
+        Store the outcome of a task. A runner that was presumed dead but still finished its task
+        counts, the first outcome of a task wins.
+
+        :return: False when the task already had an outcome
+        """
+        def work(connection):
+            updated = connection.execute(
+                "UPDATE tasks SET state = 'done', runner = ?, outcome = ?, duration_sec = ?, lease_expires = NULL "
+                "WHERE run_id = ? AND task_id = ? AND state != 'done'",
+                (runner, outcome, duration_sec, run_id, task_id)).rowcount == 1
+            if updated:
+                connection.execute("UPDATE runners SET completed = completed + 1 WHERE run_id = ? AND runner = ?",
+                                   (run_id, runner))
+            return updated
+        return self._transaction(work)
+
+    def _touch(self, connection, run_id, runner, now):
+        connection.execute("INSERT INTO runners (run_id, runner, last_seen) VALUES (?, ?, ?) "
+                           "ON CONFLICT (run_id, runner) DO UPDATE SET last_seen = excluded.last_seen",
+                           (run_id, runner, now))
+
+    def heartbeat(self, run_id, runner):
+        """
+        Renew the leases of a runner's tasks.
+
+        :return: number of tasks the runner still holds
+        """
+        def work(connection):
+            now = time.time()
+            self._touch(connection, run_id, runner, now)
+            return connection.execute(
+                "UPDATE tasks SET lease_expires = ? WHERE run_id = ? AND runner = ? AND state IN ('leased', 'running')",
+                (now + self.settings["lease_sec"], run_id, runner)).rowcount
+        return self._transaction(work)
+
+    def status(self, run_id):
+        """
+        :return: task counts per state, outcome counts, the runners with their last heartbeat and
+                 whether the run is drained (no task left to run)
+        """
+        with closing(self._connect()) as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            self._requeue_expired(connection, run_id, time.time())
+            connection.execute("COMMIT")
+            states = {row["state"]: row["count"] for row in connection.execute(
+                "SELECT state, COUNT(*) AS count FROM tasks WHERE run_id = ? GROUP BY state", (run_id,))}
+            outcomes = {row["outcome"]: row["count"] for row in connection.execute(
+                "SELECT outcome, COUNT(*) AS count FROM tasks WHERE run_id = ? AND state = 'done' GROUP BY outcome",
+                (run_id,))}
+            runners = [dict(row) for row in connection.execute(
+                "SELECT runner, last_seen, completed FROM runners WHERE run_id = ? ORDER BY runner", (run_id,))]
+        return {
+            "run_id": run_id,
+            "states": states,
+            "outcomes": outcomes,
+            "runners": runners,
+            "drained": not any(states.get(state) for state in OPEN_STATES),
+        }
+
+
+class QueueClient:
+    """
+    The queue of a coordinator reached over HTTP (COORDINATOR_URL), with the methods of WorkQueue
+    that runners use.
+    """
+
+    def __init__(self, base_url):
+        import requests
+
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+
+    def _post(self, path, **body):
+        response = self.session.post(f"{self.base_url}/queue{path}", json=body, timeout=30)
+        response.raise_for_status()
+        return response.json()
+
+    def active_runs(self):
+        response = self.session.get(f"{self.base_url}/queue/runs", timeout=30)
+        response.raise_for_status()
+        return response.json()
+
+    def get_run(self, run_id):
+        response = self.session.get(f"{self.base_url}/queue/{run_id}/run", timeout=30)
+        return response.json() if response.status_code == 200 else None
+
+    def lease(self, run_id, runner, max_tasks=None):
+        return self._post(f"/{run_id}/lease", runner=runner, max_tasks=max_tasks)["tasks"]
+
+    def start(self, run_id, runner, task_id):
+        return self._post(f"/{run_id}/start", runner=runner, task_id=task_id)["started"]
+
+    def complete(self, run_id, runner, task_id, outcome, duration_sec=None):
+        return self._post(f"/{run_id}/complete", runner=runner, task_id=task_id, outcome=outcome,
+                          duration_sec=duration_sec)["completed"]
+
+    def heartbeat(self, run_id, runner):
+        return self._post(f"/{run_id}/heartbeat", runner=runner)["tasks"]
+
+    def status(self, run_id):
+        response = self.session.get(f"{self.base_url}/queue/{run_id}", timeout=30)
+        response.raise_for_status()
+        return response.json()
+
+
+def get_queue():
+    """
+    :return: a QueueClient when COORDINATOR_URL is set, the local WorkQueue otherwise
+    """
+    coordinator_url = get_common_settings("coordinator_url")
+    return QueueClient(coordinator_url) if coordinator_url else WorkQueue()
+
+
+def default_runner_id(index=0):
+    return f"{socket.gethostname()}-{os.getpid()}-{index}"
+
+
+class _OutcomeTracker:
+    """
+    pytest plugin folding the setup/call/teardown reports of the running item into one outcome.
+    """
+
+    def __init__(self):
+        self.outcome = "passed"
+
+    def pytest_runtest_logreport(self, report):
+        if report.outcome == "failed" or (report.outcome == "skipped" and self.outcome == "passed"):
+            self.outcome = report.outcome
+
+
+class _Heartbeat(threading.Thread):
+
+    def __init__(self, queue, run_id, runner, interval):
+        super().__init__(name="queue-heartbeat", daemon=True)
+        self.queue, self.run_id, self.runner, self.interval = queue, run_id, runner, interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.queue.heartbeat(self.run_id, self.runner)
+            except Exception as e:
+                # a coordinator restart must not kill the runner, the lease covers a few missed beats
+                log.error(f"Heartbeat of runner {self.runner} failed: {e}")
+
+
+def _item_key(item):
+    callspec = getattr(item, "callspec", None)
+    sequence = callspec.params.get("generate_test_sequence") if callspec else None
+    return sequence_key(sequence) if sequence else None
+
+
+def run_pulled(session, run_id, runner=None, queue=None):
+    """
+    pytest_runtestloop of a runner: run the collected items in the order the queue hands them out.
+    Items are matched to tasks by sequence_key; items without a sequence are not distributed.
+
+    :return: True, the loop of the session is done
+    """
+    queue = queue or get_queue()
+    runner = runner or os.getenv("RUNNER_ID") or default_runner_id()
+    settings = get_queue_settings()
+    items = {}
+    for item in session.items:
+        key = _item_key(item)
+        if key is not None:
+            items[key] = item
+    log.info(f"Runner {runner} pulls run {run_id}, {len(items)} sequence(s) collected")
+
+    heartbeat = _Heartbeat(queue, run_id, runner, settings["heartbeat_sec"])
+    heartbeat.start()
+    backlog = deque()
+
+    def next_task(wait):
+        while True:
+            while backlog:
+                task_id = backlog.popleft()
+                if queue.start(run_id, runner, task_id):
+                    return task_id
+            backlog.extend(queue.lease(run_id, runner, settings["batch_size"]))
+            if backlog:
+                continue
+            # nothing to lease or steal; tasks still running elsewhere come back if their runner dies
+            if not wait or session.shouldstop or queue.status(run_id)["drained"]:
+                return None
+            time.sleep(POLL_SEC)
+
+    try:
+        task_id = next_task(wait=True)
+        while task_id is not None:
+            item = items.get(task_id)
+            if item is None:
+                log.error(f"Task {task_id} of run {run_id} is not a collected sequence of runner {runner}")
+                queue.complete(run_id, runner, task_id, "failed")
+                task_id = next_task(wait=True)
+                continue
+
+            # claiming the next task first keeps the fixtures it shares with this one set up
+            next_task_id = next_task(wait=False)
+            tracker = _OutcomeTracker()
+            session.config.pluginmanager.register(tracker)
+            start = time.time()
+            try:
+                item.config.hook.pytest_runtest_protocol(item=item, nextitem=items.get(next_task_id))
+            finally:
+                session.config.pluginmanager.unregister(tracker)
+            queue.complete(run_id, runner, task_id, tracker.outcome, round(time.time() - start, 3))
+
+            if session.shouldfail:
+                raise session.Failed(session.shouldfail)
+            if session.shouldstop:
+                raise session.Interrupted(session.shouldstop)
+            task_id = next_task_id if next_task_id is not None else next_task(wait=True)
+    finally:
+        heartbeat.stopped.set()
+    return True
+
+
+def wait_until_drained(queue, run_id, deadline=None, local_runners=()):
+    """
+    Wait for the runners to finish a run. Gives up at the deadline, or when every local runner
+    process exited and no other runner sent a heartbeat within the lease time.
+
+    :param local_runners: Popen objects of the runners started by the coordinator
+    :return: the final status of the run
+    """
+    lease_sec = get_queue_settings()["lease_sec"]
+    while True:
+        status = queue.status(run_id)
+        if status["drained"]:
+            return status
+        now = time.time()
+        if deadline is not None and now > deadline:
+            log.error(f"Run {run_id} reached its deadline with tasks left: {status['states']}")
+            return status
+        if local_runners and all(process.poll() is not None for process in local_runners):
+            if not any(runner["last_seen"] and now - runner["last_seen"] < lease_sec for runner in status["runners"]):
+                log.error(f"All runners of run {run_id} are gone with tasks left: {status['states']}")
+                return status
+        time.sleep(POLL_SEC)